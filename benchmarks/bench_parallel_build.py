@@ -0,0 +1,65 @@
+"""
+Mesure le temps de construction de l'index en série et avec `Index.build_parallel`
+sur une version agrandie de `products.jsonl` (chaque produit est dupliqué avec une
+URL distincte et une description mélangée).
+
+Usage :
+    python benchmarks/bench_parallel_build.py [--scale 50] [--workers 1,2,4] [--shard-size 2000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from index import Index  # noqa: E402
+
+
+def write_enlarged_catalog(source, scale, path, seed=0):
+    """Écrit `scale` copies modifiées de chaque produit dans un fichier JSONL."""
+    rng = random.Random(seed)
+    docs = Index.load_jsonl(source)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for copy in range(scale):
+            for doc in docs:
+                words = doc.get("description", "").split()
+                rng.shuffle(words)
+                enlarged = dict(doc, url=f"{doc['url']}#copy-{copy}", description=" ".join(words))
+                f.write(json.dumps(enlarged, ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--scale", type=int, default=50)
+    arg_parser.add_argument("--workers", default="1,2,4")
+    arg_parser.add_argument("--shard-size", type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "products.jsonl")
+        count = write_enlarged_catalog(os.path.join(ROOT, "products.jsonl"), args.scale, path)
+        print(f"{count} documents, {os.cpu_count()} coeurs")
+
+        start = time.perf_counter()
+        index = Index()
+        index.add_documents(Index.iter_jsonl(path))
+        serial = time.perf_counter() - start
+        print(f"série              : {serial:7.2f} s")
+
+        for workers in (int(w) for w in args.workers.split(",")):
+            start = time.perf_counter()
+            Index.build_parallel(Index.iter_jsonl(path), workers=workers, shard_size=args.shard_size)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:2d} processus       : {elapsed:7.2f} s  (x{serial / elapsed:.2f})")
+
+
+if __name__ == "__main__":
+    main()
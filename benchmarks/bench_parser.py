@@ -0,0 +1,88 @@
+"""
+Compare le débit (pages/s) des backends d'analyse HTML du crawler.
+
+Usage :
+    python benchmarks/bench_parser.py [dossier_de_pages_html] [--repeat N]
+
+Sans dossier, les pages sont reconstruites à partir de `products.jsonl`
+(titre, description, liens) pour obtenir un corpus proche des pages crawlées.
+"""
+import argparse
+import html
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from parser import parse_page, PARSER_BACKENDS, lxml  # noqa: E402
+
+
+def load_saved_pages(directory):
+    """Charge toutes les pages .html d'un dossier."""
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(directory, name), "r", encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+    return pages
+
+
+def build_pages_from_products(path):
+    """Reconstruit une page HTML par produit à partir du fichier JSONL."""
+    pages = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            doc = json.loads(line)
+            features = "".join(
+                f"<tr><td>{html.escape(key)}</td><td>{html.escape(value)}</td></tr>"
+                for key, value in doc.get("product_features", {}).items()
+            )
+            reviews = "".join(
+                f"<div class='review'><span>{review['rating']}</span><p>{html.escape(review['text'])}</p></div>"
+                for review in doc.get("product_reviews", [])
+            )
+            links = "".join(f"<li><a href='{html.escape(link)}'>{html.escape(link)}</a></li>"
+                            for link in doc.get("links", []))
+            pages.append(
+                f"<html><head><title>{html.escape(doc['title'])}</title></head><body>"
+                f"<nav><ul>{links}</ul></nav><p>{html.escape(doc.get('description', ''))}</p>"
+                f"<table>{features}</table>{reviews}</body></html>"
+            )
+    return pages
+
+
+def bench(pages, backend, repeat):
+    """Retourne le nombre de pages analysées par seconde (meilleur des `repeat` essais)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            parse_page(page, backend)
+        best = min(best, time.perf_counter() - start)
+    return len(pages) / best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("pages_dir", nargs="?", help="Dossier contenant les pages HTML sauvegardées")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    if args.pages_dir:
+        pages = load_saved_pages(args.pages_dir)
+    else:
+        pages = build_pages_from_products(os.path.join(ROOT, "products.jsonl"))
+    print(f"{len(pages)} pages, {sum(len(p) for p in pages) / 1024:.0f} Ko")
+
+    for backend in PARSER_BACKENDS:
+        if backend == "lxml" and lxml is None:
+            print(f"{backend:>6} : ignoré (lxml non installé)")
+            continue
+        print(f"{backend:>6} : {bench(pages, backend, args.repeat):8.1f} pages/s")
+
+
+if __name__ == "__main__":
+    main()
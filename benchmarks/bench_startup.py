@@ -0,0 +1,82 @@
+"""
+Mesure le démarrage à froid d'une requête en ligne de commande : chaque essai
+lance un nouvel interpréteur qui importe navweb, ouvre l'index (segments en mmap,
+index JSON déclarés dans indexes.json mais non lus) et exécute une requête,
+comme le mode `nav` de main.py. Le script échoue si la médiane dépasse le budget.
+L'index ouvert est `--index` (relatif au dossier), par défaut index/ s'il existe,
+sinon index.seg ; il est passé explicitement à `Ranking`.
+
+Usage :
+    python benchmarks/bench_startup.py [dossier_index] [--index index] [--budget-ms 300] [--repeat 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Temps (ms) mesurés dans le processus enfant, à partir de son lancement
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import navweb
+imported = time.perf_counter()
+ranking = navweb.Ranking(index_path={index_path!r})
+loaded = time.perf_counter()
+ranking.search({query!r}, save=False)
+done = time.perf_counter()
+print(json.dumps({{"import": (imported - start) * 1000, "load": (loaded - imported) * 1000,
+                  "query": (done - loaded) * 1000,
+                  "heavy_modules": sorted(name for name in ("pandas", "nltk", "requests", "bs4", "charset_normalizer")
+                                          if name in sys.modules)}}))
+"""
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("directory", nargs="?", default=os.getcwd(),
+                            help="dossier contenant index/ ou index.seg")
+    arg_parser.add_argument("--index", help="index/ (incrémental) ou index.seg, relatif au dossier")
+    arg_parser.add_argument("--query", default="Leather Sneakers versatile for any occasion")
+    arg_parser.add_argument("--budget-ms", type=float, default=300.0)
+    arg_parser.add_argument("--repeat", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    index_path = args.index
+    if index_path is None:
+        has_directory = os.path.exists(os.path.join(args.directory, "index", "segments.json"))
+        index_path = "index" if has_directory else "index.seg"
+    code = CHILD.format(root=ROOT, query=args.query, index_path=index_path)
+    runs = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", code], cwd=args.directory,
+                                capture_output=True, text=True, check=True)
+        run = json.loads(output.stdout)
+        # temps total vu de l'extérieur, démarrage de l'interpréteur compris
+        run["total"] = (time.perf_counter() - start) * 1000
+        runs.append(run)
+
+    print(f"{args.repeat} démarrages à froid dans {args.directory} ({index_path})")
+    for step in ("import", "load", "query", "total"):
+        print(f"  {step:<7}: médiane {median([run[step] for run in runs]):8.2f} ms")
+    heavy = runs[-1]["heavy_modules"]
+    print(f"  modules lourds importés : {', '.join(heavy) if heavy else 'aucun'}")
+    total = median([run["total"] for run in runs])
+    if total > args.budget_ms or heavy:
+        print(f"Budget dépassé : {total:.2f} ms (budget {args.budget_ms:.0f} ms)")
+        sys.exit(1)
+    print(f"Budget respecté : {total:.2f} ms (budget {args.budget_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Suite de benchmarks reproductible du crawler, de l'indexation et des requêtes,
+sur des données synthétiques déterministes (`synthetic.py`). Les mesures sont
+écrites en JSON (avec le commit git) pour comparer deux versions :
+
+    python benchmarks/bench_suite.py --docs 10000 --output bench-avant.json
+    python benchmarks/bench_suite.py --docs 10000 --output bench-apres.json --compare bench-avant.json
+
+Étapes : génération du catalogue, crawl d'un site statique local
+(`WebCrawler.crawl`), chaque étape `Index.build_*` (plus `add_documents` et
+`build_parallel`), `save_indexes` / relecture des index JSON, `save_segment` /
+ouverture de `Ranking`, et chaque `Ranking.requete_*` (p50 / p99).
+
+Usage :
+    python benchmarks/bench_suite.py [--docs 10000] [--crawl-pages 500] [--queries 50]
+                                     [--seed 0] [--skip crawl,legacy] [--output FICHIER] [--compare FICHIER]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import REGIONS, Vocabulary, draw, serve_site, write_catalog, write_site  # noqa: E402
+from index import Index  # noqa: E402
+from tokenizer import get_tokenizer  # noqa: E402
+
+LEGACY_STAGES = ["build_index", "build_index_text", "build_index_review", "build_index_features",
+                 "create_sub_indices", "build_index_position"]
+QUERY_ENTRY_POINTS = ["requete_title", "requete_description", "requete_title_description", "requete_bm25",
+                      "requete_title_region", "requete_description_region"]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+@contextlib.contextmanager
+def timed(results, name, **extra):
+    """
+    Enregistre dans `results[name]` la durée (s) du bloc et les valeurs de `extra`.
+    """
+    start = time.perf_counter()
+    yield
+    results[name] = dict(seconds=time.perf_counter() - start, **extra)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_queries(count, seed):
+    """
+    Requêtes déterministes : 1 à 3 mots de titre (loi de Zipf) et une région.
+    """
+    rng = random.Random(seed)
+    vocabulary = Vocabulary()
+    return [(" ".join(draw(rng, vocabulary.titles, rng.randint(1, 3))), rng.choice(REGIONS).lower())
+            for _ in range(count)]
+
+
+def bench_crawl(results, tmp, pages, seed):
+    from crawler import WebCrawler
+    site = os.path.join(tmp, "site")
+    page_count = write_site(site, pages, seed)
+    server, start_url = serve_site(site)
+    try:
+        crawler = WebCrawler(start_url, max_depth=page_count, max_pages=page_count, delay=0, concurrency=8)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            crawler.crawl()
+            elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+    results["crawl"] = {"seconds": elapsed, "pages": crawler.pages_visited_count,
+                        "pages_per_second": crawler.pages_visited_count / elapsed}
+
+
+def bench_index(results, path, skip):
+    if "legacy" not in skip:
+        # étapes historiques : documents chargés en mémoire dans Index.data
+        data = Index.load_jsonl(path)
+        index = Index(data)
+        for stage in LEGACY_STAGES:
+            if stage == "build_index_text":
+                index = Index(data)  # build_index_text refait build_index avec les positions
+            with timed(results, f"index.{stage}"):
+                getattr(index, stage)()
+    with timed(results, "index.add_documents"):
+        index = Index()
+        index.add_documents(Index.iter_jsonl(path))
+    with timed(results, "index.build_parallel", workers=os.cpu_count()):
+        Index.build_parallel(Index.iter_jsonl(path))
+    return index
+
+
+def bench_storage(results, index, tmp):
+    index.create_sub_indices()
+    with timed(results, "storage.save_indexes"):
+        index.save_indexes()
+    with timed(results, "storage.load_indexes"):
+        with open("indexes.json", "r", encoding="utf-8") as f:
+            for name in json.load(f).values():
+                with open(name, "r", encoding="utf-8") as index_file:
+                    json.load(index_file)
+    with timed(results, "storage.save_segment"):
+        index.save_segment("index.seg")
+    results["storage.save_segment"]["bytes"] = os.path.getsize("index.seg")
+    results["storage.save_indexes"]["bytes"] = sum(os.path.getsize(name) for name in os.listdir(tmp)
+                                                   if name.startswith("index_") and name.endswith(".json"))
+
+
+def bench_queries(results, queries):
+    from navweb import Ranking
+    with timed(results, "query.load_ranking"):
+        ranking = Ranking()
+    for entry_point in QUERY_ENTRY_POINTS:
+        method = getattr(ranking, entry_point)
+        latencies = []
+        for text, region in queries:
+            start = time.perf_counter()
+            if entry_point.endswith("_region"):
+                method(text, region, k=5, save=False)
+            else:
+                method(text, k=5, save=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[f"query.{entry_point}"] = {"p50_ms": percentile(latencies, 50),
+                                           "p99_ms": percentile(latencies, 99), "queries": len(latencies)}
+    ranking.navweb.segment.close()
+
+
+def compare(results, previous_path):
+    """
+    Affiche l'évolution de chaque mesure par rapport à un fichier de résultats précédent.
+    """
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"Comparaison avec {previous_path} (commit {previous['metadata'].get('commit')})")
+    for name, values in results.items():
+        before = previous["results"].get(name, {})
+        for metric in ("seconds", "p50_ms", "p99_ms", "pages_per_second"):
+            if metric in values and before.get(metric):
+                change = (values[metric] - before[metric]) / before[metric] * 100
+                print(f"  {name:<36} {metric:<16} {before[metric]:10.4f} -> {values[metric]:10.4f}  ({change:+.1f} %)")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--docs", type=int, default=10000)
+    arg_parser.add_argument("--crawl-pages", type=int, default=500)
+    arg_parser.add_argument("--queries", type=int, default=50)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--skip", default="", help="étapes à ignorer : crawl, legacy (build_* en mémoire)")
+    arg_parser.add_argument("--output", default="bench_results.json")
+    arg_parser.add_argument("--compare", help="fichier de résultats précédent")
+    args = arg_parser.parse_args()
+    skip = set(filter(None, args.skip.split(",")))
+    output = os.path.abspath(args.output)
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            get_tokenizer()
+            path = os.path.join(tmp, "products.jsonl")
+            with timed(results, "generate.catalog", docs=args.docs):
+                write_catalog(path, args.docs, args.seed)
+            if "crawl" not in skip:
+                bench_crawl(results, tmp, args.crawl_pages, args.seed)
+            index = bench_index(results, path, skip)
+            bench_storage(results, index, tmp)
+            bench_queries(results, make_queries(args.queries, args.seed))
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "metadata": {"commit": git_commit(), "docs": args.docs, "crawl_pages": args.crawl_pages,
+                     "queries": args.queries, "seed": args.seed, "python": platform.python_version(),
+                     "cpus": os.cpu_count(), "date": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    for name, values in results.items():
+        print(f"{name:<36} " + "  ".join(f"{key} {value:.4f}" if isinstance(value, float) else f"{key} {value}"
+                                         for key, value in values.items()))
+    print(f"Résultats écrits dans {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compare le temps de construction des index texte, features et positions sur
+`products.jsonl` avec l'ancienne tokenisation (stopwords relus à chaque appel)
+et avec le tokenizer partagé (`tokenizer.py`).
+
+Usage :
+    python benchmarks/bench_tokenizer.py [fichier.jsonl] [--repeat N]
+"""
+import argparse
+import json
+import os
+import string
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from index import Index  # noqa: E402
+from tokenizer import STOP_WORDS_PATH, get_tokenizer  # noqa: E402
+
+
+class LegacyIndex(Index):
+    """Reproduit la tokenisation d'origine : fichier de stopwords relu et table recréée à chaque appel."""
+
+    @staticmethod
+    def _legacy_stopwords():
+        with open(STOP_WORDS_PATH, "r", encoding="utf-8") as f:
+            words = [json.loads(line) for line in f]
+        return set(words[0] + list(string.punctuation))
+
+    def tokenize(self, text):
+        stopwords = self._legacy_stopwords()
+        tokens = text.lower().translate(str.maketrans("", "", string.punctuation)).split()
+        return [token for token in tokens if token not in stopwords]
+
+    def texte(self, text):
+        self._legacy_stopwords()
+        return text.lower().translate(str.maketrans("", "", string.punctuation))
+
+
+def build(index_class, data):
+    index = index_class(data)
+    index.build_index()
+    index.build_index_features()
+    index.build_index_position()
+    return index
+
+
+def bench(index_class, data, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build(index_class, data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("path", nargs="?", default=os.path.join(ROOT, "products.jsonl"))
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    data = Index.load_jsonl(args.path)
+    get_tokenizer()  # chargement unique, hors mesure
+
+    before = bench(LegacyIndex, data, args.repeat)
+    after = bench(Index, data, args.repeat)
+    print(f"{len(data)} documents")
+    print(f"avant  (stopwords relus à chaque appel) : {before * 1000:8.1f} ms")
+    print(f"après  (tokenizer partagé)              : {after * 1000:8.1f} ms  (x{before / after:.1f})")
+
+    texts = [doc["title"] for doc in data] + [doc["description"] for doc in data]
+    tokenizer = get_tokenizer()
+    start = time.perf_counter()
+    tokenizer.tokenize_many(texts)
+    print(f"tokenize_many sur {len(texts)} textes      : {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
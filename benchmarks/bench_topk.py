@@ -0,0 +1,99 @@
+"""
+Compare la latence des requêtes (p50 / p99) entre le parcours complet, qui score
+chaque document (`Ranking.full_scan`), un score exhaustif, qui décode une fois les
+postings de chaque terme et accumule les scores dans un tableau
+(`Ranking.exhaustive_top_k`), et l'évaluation top-k par WAND (`Ranking.top_k`),
+sur une version agrandie de `products.jsonl`. WAND et le score exhaustif doivent
+renvoyer les mêmes scores (à l'arrondi près : les copies d'un produit sont à
+égalité). Le parcours complet, dont le coût croît avec le nombre de documents
+multiplié par la taille des postings, n'est exécuté qu'une fois par requête
+(`--no-full-scan` pour l'ignorer sur les grands catalogues).
+
+Usage :
+    python benchmarks/bench_topk.py [--scale 5] [--k 5] [--repeat 5] [--no-full-scan]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_parallel_build import write_enlarged_catalog  # noqa: E402
+from index import Index  # noqa: E402
+from navweb import Ranking  # noqa: E402
+from tokenizer import get_tokenizer  # noqa: E402
+
+QUERIES = [
+    "Leather Sneakers versatile for any occasion",
+    "comfortable running shoes",
+    "dark red energy potion",
+    "box of chocolate candy",
+    "women sandals",
+    "cat ears beanie",
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def measure(run, queries, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for tokens in queries:
+            start = time.perf_counter()
+            run(tokens)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return percentile(latencies, 50), percentile(latencies, 99)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--scale", type=int, default=5)
+    arg_parser.add_argument("--k", type=int, default=5)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--no-full-scan", action="store_true", help="ne pas mesurer Ranking.full_scan")
+    args = arg_parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "products.jsonl")
+        count = write_enlarged_catalog(os.path.join(ROOT, "products.jsonl"), args.scale, path)
+        index = Index()
+        index.add_documents(Index.iter_jsonl(path))
+        index.save_segment(os.path.join(tmp, "index.seg"))
+        os.chdir(tmp)
+        try:
+            ranking = Ranking()
+            queries = [get_tokenizer().tokenize(query) for query in QUERIES]
+            print(f"{count} documents, {len(queries)} requêtes x {args.repeat}, k = {args.k}")
+            for name, fields in (("titre", [("title", 1)]),
+                                 ("titre + description", [("title", 2), ("description", 0.5)])):
+                for tokens in queries:
+                    exhaustive = ranking.exhaustive_top_k(tokens, fields, args.k)
+                    wand = ranking.top_k(tokens, fields, args.k)
+                    if [round(result["score"], 9) for result in wand] != \
+                            [round(result["score"], 9) for result in exhaustive]:
+                        print(f"  résultats différents pour {' '.join(tokens)}")
+                exhaustive = measure(lambda tokens: ranking.exhaustive_top_k(tokens, fields, args.k),
+                                     queries, args.repeat)
+                wand = measure(lambda tokens: ranking.top_k(tokens, fields, args.k), queries, args.repeat)
+                print(f"{name}")
+                if not args.no_full_scan:
+                    scan = measure(lambda tokens: ranking.full_scan(tokens, fields, ranking.docs)[:args.k],
+                                   queries, 1)
+                    print(f"  parcours complet : p50 {scan[0]:8.2f} ms  p99 {scan[1]:8.2f} ms")
+                print(f"  score exhaustif  : p50 {exhaustive[0]:8.2f} ms  p99 {exhaustive[1]:8.2f} ms")
+                print(f"  top-k WAND       : p50 {wand[0]:8.2f} ms  p99 {wand[1]:8.2f} ms")
+            ranking.navweb.segment.close()
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Générateurs de données synthétiques déterministes pour les benchmarks :
+
+- un catalogue au format de `products.jsonl` (titre, description, caractéristiques,
+  avis, liens) de n'importe quelle taille (10 k à 10 M documents), écrit en flux ;
+- un site HTML statique de pages produit, servi en local pour mesurer le crawler.
+
+Le vocabulaire vient de `products.jsonl` (mots tirés selon une loi de Zipf) et
+s'enrichit de mots rares pseudo-aléatoires, pour que le dictionnaire des termes
+grossisse avec le catalogue comme sur de vraies données. Une même graine donne
+toujours les mêmes documents.
+
+Usage :
+    python benchmarks/synthetic.py catalog products-100k.jsonl --docs 100000 [--seed 0]
+    python benchmarks/synthetic.py site site/ --pages 1000 [--seed 0]
+"""
+import argparse
+import html
+import json
+import os
+import random
+import re
+import threading
+from datetime import date, timedelta
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from itertools import accumulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASE_URL = "https://web-scraping.dev"
+REGIONS = ["Italy", "USA", "France", "Germany", "Japan", "Portugal", "Vietnam", "Mexico"]
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "zo", "vel", "tor", "gan", "pri", "sul", "dex", "mar", "qui"]
+RARE_WORD_RATE = 0.02  # part des mots de description remplacés par un mot rare
+FIRST_REVIEW_DAY = date(2022, 1, 1)
+WORD = re.compile(r"[A-Za-z][A-Za-z'-]*")
+
+
+class Vocabulary:
+    """
+    Réservoirs de mots et de valeurs extraits d'un catalogue réel, chacun avec ses
+    poids cumulés de Zipf (le mot de rang r a un poids 1 / r).
+    """
+
+    def __init__(self, source=os.path.join(ROOT, "products.jsonl")):
+        titles, descriptions, reviews = [], [], []
+        features = {}
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                doc = json.loads(line)
+                if "product page" in doc["title"]:
+                    continue
+                titles += WORD.findall(doc["title"])
+                descriptions += WORD.findall(doc.get("description", ""))
+                reviews += [review["text"] for review in doc.get("product_reviews", [])]
+                for key, value in doc.get("product_features", {}).items():
+                    features.setdefault(key, []).append(value)
+        features["made in"] = REGIONS
+        self.titles = self.pool(titles)
+        self.descriptions = self.pool(descriptions)
+        self.reviews = self.pool(reviews)
+        self.features = {key: self.pool(values) for key, values in sorted(features.items())}
+
+    @staticmethod
+    def pool(items):
+        """
+        (valeurs distinctes triées par fréquence décroissante, poids cumulés de Zipf).
+        """
+        counts = {}
+        for item in items:
+            counts[item] = counts.get(item, 0) + 1
+        values = sorted(counts, key=lambda item: (-counts[item], item))
+        return values, list(accumulate(1 / rank for rank in range(1, len(values) + 1)))
+
+
+def draw(rng, pool, k=1):
+    values, cum_weights = pool
+    return rng.choices(values, cum_weights=cum_weights, k=k)
+
+
+def rare_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def generate_products(count, seed=0, vocabulary=None):
+    """
+    Produits synthétiques au format de `products.jsonl`, générés en flux.
+    """
+    vocabulary = vocabulary or Vocabulary()
+    rng = random.Random(seed)
+    feature_keys = list(vocabulary.features)
+    for i in range(count):
+        url = f"{BASE_URL}/product/{i}"
+        title = " ".join(draw(rng, vocabulary.titles, rng.randint(2, 5))).title()
+        words = draw(rng, vocabulary.descriptions, rng.randint(20, 60))
+        words = [rare_word(rng) if rng.random() < RARE_WORD_RATE else word for word in words]
+        description = " ".join(words).capitalize() + "."
+        keys = rng.sample(feature_keys, rng.randint(0, min(6, len(feature_keys))))
+        features = {key: draw(rng, vocabulary.features[key])[0] for key in sorted(keys)}
+        reviews = []
+        for j in range(rng.choice((0, 0, 1, 2, 3, 5))):
+            day = FIRST_REVIEW_DAY + timedelta(days=rng.randrange(1000))
+            reviews.append({"date": day.isoformat(), "id": f"product-{i}-{j}",
+                            "rating": rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 2, 4, 6))[0],
+                            "text": draw(rng, vocabulary.reviews)[0]})
+        links = [f"{BASE_URL}/products", f"{BASE_URL}/product/{rng.randrange(count)}"]
+        yield {"url": url, "title": title, "description": description, "product_features": features,
+               "links": links, "product_reviews": reviews}
+
+
+def write_catalog(path, count, seed=0):
+    """
+    Écrit un catalogue synthétique de `count` produits en JSON Lines, retourne `count`.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for product in generate_products(count, seed):
+            f.write(json.dumps(product, ensure_ascii=False) + "\n")
+    return count
+
+
+def product_page(product, index, count):
+    features = "".join(f"<tr><td>{html.escape(key)}</td><td>{html.escape(value)}</td></tr>"
+                       for key, value in product["product_features"].items())
+    reviews = "".join(f"<div class='review'><span>{review['rating']}</span><p>{html.escape(review['text'])}</p></div>"
+                      for review in product["product_reviews"])
+    related = "".join(f"<li><a href='/product/{(index + step) % count}.html'>related</a></li>" for step in (1, 7, 31))
+    return (f"<html><head><title>{html.escape(product['title'])}</title></head><body>"
+            f"<nav><a href='/products/page-1.html'>products</a></nav>"
+            f"<p>{html.escape(product['description'])}</p><table>{features}</table>{reviews}"
+            f"<ul>{related}</ul></body></html>")
+
+
+def write_site(directory, count, seed=0, per_page=20):
+    """
+    Écrit un site statique : `robots.txt`, des pages de liste `products/page-N.html`
+    (`per_page` liens produit et un lien vers la page suivante) et une page par
+    produit `product/N.html`. Retourne le nombre de pages HTML.
+    """
+    os.makedirs(os.path.join(directory, "products"), exist_ok=True)
+    os.makedirs(os.path.join(directory, "product"), exist_ok=True)
+    with open(os.path.join(directory, "robots.txt"), "w", encoding="utf-8") as f:
+        f.write("User-agent: *\nAllow: /\n")
+    for i, product in enumerate(generate_products(count, seed)):
+        with open(os.path.join(directory, "product", f"{i}.html"), "w", encoding="utf-8") as f:
+            f.write(product_page(product, i, count))
+    list_pages = (count + per_page - 1) // per_page
+    for page in range(1, list_pages + 1):
+        links = "".join(f"<li><a href='/product/{i}.html'>product {i}</a></li>"
+                        for i in range((page - 1) * per_page, min(page * per_page, count)))
+        following = f"<a href='/products/page-{page + 1}.html'>next</a>" if page < list_pages else ""
+        with open(os.path.join(directory, "products", f"page-{page}.html"), "w", encoding="utf-8") as f:
+            f.write(f"<html><head><title>products page {page}</title></head><body>"
+                    f"<p>Page {page} of the catalog.</p><ul>{links}</ul>{following}</body></html>")
+    return count + list_pages
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_site(directory):
+    """
+    Sert un site statique sur un port libre de 127.0.0.1 dans un thread.
+    Retourne (serveur, URL de la première page de liste) ; arrêt : `server.shutdown()`.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/products/page-1.html"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    catalog = commands.add_parser("catalog", help="catalogue JSON Lines")
+    catalog.add_argument("path")
+    catalog.add_argument("--docs", type=int, default=10000)
+    catalog.add_argument("--seed", type=int, default=0)
+    site = commands.add_parser("site", help="site HTML statique")
+    site.add_argument("directory")
+    site.add_argument("--pages", type=int, default=1000)
+    site.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    if args.command == "catalog":
+        print(f"{write_catalog(args.path, args.docs, args.seed)} produits écrits dans {args.path}")
+    else:
+        print(f"{write_site(args.directory, args.pages, args.seed)} pages écrites dans {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
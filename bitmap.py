@@ -0,0 +1,178 @@
+from array import array
+from bisect import bisect_left
+from postings import difference, intersect, union_many
+
+
+ARRAY_MAX = 4096  # above this many values, a container is stored as a bitset
+CONTAINER_BYTES = 1 << 13  # 65536 bits
+
+
+def _to_bitset(values):
+    data = bytearray(CONTAINER_BYTES)
+    for value in values:
+        data[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(data, "little")
+
+
+def _to_array(bitset):
+    values = array("H")
+    for i, byte in enumerate(bitset.to_bytes(CONTAINER_BYTES, "little")):
+        if byte:
+            base = i << 3
+            for bit in range(8):
+                if byte >> bit & 1:
+                    values.append(base + bit)
+    return values
+
+
+def _cardinality(container):
+    return container.bit_count() if isinstance(container, int) else len(container)
+
+
+def _shrink(container):
+    """
+    Bitset containers that became sparse go back to sorted arrays; empty ones are dropped.
+    """
+    if isinstance(container, int):
+        if container == 0:
+            return None
+        if container.bit_count() <= ARRAY_MAX:
+            return _to_array(container)
+        return container
+    if not container:
+        return None
+    if len(container) > ARRAY_MAX:
+        return _to_bitset(container)
+    return container
+
+
+def _and(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return _shrink(a & b)
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        return _shrink(array("H", (value for value in a if b >> value & 1)))
+    return _shrink(array("H", intersect(a, b)))
+
+
+def _or(a, b):
+    if isinstance(a, int) or isinstance(b, int):
+        a = a if isinstance(a, int) else _to_bitset(a)
+        b = b if isinstance(b, int) else _to_bitset(b)
+        return _shrink(a | b)
+    return _shrink(array("H", union_many([a, b])))
+
+
+def _and_not(a, b):
+    if isinstance(a, int):
+        return _shrink(a & ~(b if isinstance(b, int) else _to_bitset(b)))
+    if isinstance(b, int):
+        return _shrink(array("H", (value for value in a if not b >> value & 1)))
+    return _shrink(array("H", difference(a, b)))
+
+
+class RoaringBitmap:
+    """
+    Compressed set of doc ids in the style of Roaring bitmaps: ids are grouped by
+    their high 16 bits, and each group (container) holds its low 16 bits either as
+    a sorted array of uint16 (up to 4096 values) or as a 65536-bit bitset stored in
+    a Python int, whichever is smaller. AND, OR and AND NOT work container by
+    container, bitsets with a single big-integer operation.
+    """
+
+    __slots__ = ("containers",)
+
+    def __init__(self, containers=None):
+        self.containers = containers or {}  # high 16 bits -> array("H") or int
+
+    @classmethod
+    def from_sorted(cls, doc_ids):
+        """
+        Builds a bitmap from sorted doc ids (e.g. a postings list).
+        """
+        containers = {}
+        current = None
+        values = None
+        for doc_id in doc_ids:
+            high = doc_id >> 16
+            if high != current:
+                if values:
+                    containers[current] = _shrink(values)
+                current = high
+                values = array("H")
+            values.append(doc_id & 0xFFFF)
+        if values:
+            containers[current] = _shrink(values)
+        return cls(containers)
+
+    def _combine(self, other, operation, keep_left=False, keep_right=False):
+        containers = {}
+        for high, container in self.containers.items():
+            other_container = other.containers.get(high)
+            if other_container is None:
+                if keep_left:
+                    containers[high] = container
+                continue
+            combined = operation(container, other_container)
+            if combined is not None:
+                containers[high] = combined
+        if keep_right:
+            for high, container in other.containers.items():
+                if high not in self.containers:
+                    containers[high] = container
+        return RoaringBitmap(containers)
+
+    def __and__(self, other):
+        return self._combine(other, _and)
+
+    def __or__(self, other):
+        return self._combine(other, _or, keep_left=True, keep_right=True)
+
+    def __sub__(self, other):
+        return self._combine(other, _and_not, keep_left=True)
+
+    def __len__(self):
+        return sum(_cardinality(container) for container in self.containers.values())
+
+    def __bool__(self):
+        return bool(self.containers)
+
+    def __contains__(self, doc_id):
+        container = self.containers.get(doc_id >> 16)
+        if container is None:
+            return False
+        low = doc_id & 0xFFFF
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        i = bisect_left(container, low)
+        return i < len(container) and container[i] == low
+
+    def __iter__(self):
+        for high in sorted(self.containers):
+            container = self.containers[high]
+            base = high << 16
+            for low in (_to_array(container) if isinstance(container, int) else container):
+                yield base + low
+
+    def to_array(self):
+        """
+        Sorted doc ids as a postings list.
+        """
+        return array("I", self)
+
+    def intersection_count(self, other):
+        """
+        Number of doc ids in both bitmaps, without building the intersection of bitsets.
+        """
+        count = 0
+        for high, container in self.containers.items():
+            other_container = other.containers.get(high)
+            if other_container is None:
+                continue
+            if isinstance(container, int) and isinstance(other_container, int):
+                count += (container & other_container).bit_count()
+            else:
+                combined = _and(container, other_container)
+                count += _cardinality(combined) if combined is not None else 0
+        return count
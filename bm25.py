@@ -0,0 +1,51 @@
+import math
+from array import array
+
+
+class FieldStats:
+    """
+    BM25 statistics of one field of a `SegmentSet`, computed once when the index is
+    loaded: the IDF of every term, the average token length of the field and, per
+    doc id, the length norm 1 - b + b * length / average length. Scoring a posting
+    is then a table lookup.
+    """
+
+    def __init__(self, segment_set, name, b=0.75):
+        self.name = name
+        lengths = segment_set.column(f"length_{name}")
+        live = array("I", (doc_id for doc_id, _ in segment_set.live_docs()))
+        self.doc_count = len(live)
+        self.avg_length = (sum(lengths[doc_id] for doc_id in live) / self.doc_count) if self.doc_count else 0.0
+        self.norms = array("d", bytes(8 * segment_set.doc_count))
+        for doc_id in live:
+            if self.avg_length:
+                self.norms[doc_id] = 1 - b + b * lengths[doc_id] / self.avg_length
+            else:
+                self.norms[doc_id] = 1.0
+        self.idf = {term: self.idf_of(frequency)
+                    for term, frequency in segment_set.field(name).doc_frequencies()}
+
+    def idf_of(self, doc_frequency):
+        return math.log((self.doc_count - doc_frequency + 0.5) / (doc_frequency + 0.5) + 1)
+
+
+def bm25f_postings(term, field_postings, k1):
+    """
+    BM25F score of one term in each document of its postings. `field_postings` is
+    a list of (FieldStats, field weight, doc ids, tfs); the weighted, length
+    normalized term frequencies of all fields are summed before saturation, and the
+    IDF is the smallest of the fields where the term occurs (its most common use).
+    :return: (sorted doc ids, scores)
+    """
+    pseudo_tf = {}
+    idf = None
+    for field_stats, weight, doc_ids, tfs in field_postings:
+        norms = field_stats.norms
+        for i, doc_id in enumerate(doc_ids):
+            pseudo_tf[doc_id] = pseudo_tf.get(doc_id, 0.0) + weight * tfs[i] / norms[doc_id]
+        field_idf = field_stats.idf.get(term)
+        if field_idf is not None:
+            idf = field_idf if idf is None else min(idf, field_idf)
+    doc_ids = array("I", sorted(pseudo_tf))
+    scores = array("d", (idf * pseudo_tf[doc_id] * (k1 + 1) / (pseudo_tf[doc_id] + k1) for doc_id in doc_ids))
+    return doc_ids, scores
@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of query responses with a time to live and a memory bound.
+    Entries belong to an index generation: a lookup with another generation empties
+    the cache, so results never outlive the index they were computed on.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (expiry, size, value), least recently used first
+        self.size = 0
+        self.generation = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def sizeof(value):
+        """
+        Approximate memory cost of a value: the length of its JSON encoding.
+        """
+        return len(json.dumps(value))
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.size = 0
+            self.generation = generation
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
+
+    def get(self, key, generation=None):
+        """
+        Cached value of a key, or None (missing, expired or computed on another generation).
+        """
+        with self.lock:
+            self._check_generation(generation)
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < self.clock():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value, generation=None):
+        """
+        Stores a value, evicting the least recently used entries beyond the bounds.
+        A value larger than the whole memory bound is not cached.
+        """
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self._check_generation(generation)
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (self.clock() + self.ttl, size, value)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "generation": self.generation,
+            }
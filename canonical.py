@@ -0,0 +1,59 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+# Paramètres de suivi qui ne changent pas le contenu de la page
+DEFAULT_IGNORED_PARAMS = ("utm_*", "fbclid", "gclid", "msclkid", "ref", "sessionid", "sid", "phpsessid")
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class UrlCanonicalizer:
+    """
+    Ramène les différentes écritures d'une même URL à une forme unique avant
+    leur ajout dans la file : schéma et hôte en minuscules, port par défaut et
+    fragment supprimés, slash final retiré, paramètres de requête filtrés et triés.
+    """
+
+    def __init__(self, ignored_params=DEFAULT_IGNORED_PARAMS, kept_params=None, strip_trailing_slash=True):
+        """
+        :param ignored_params: Paramètres de requête à supprimer ("utm_*" supprime tous les utm_...)
+        :param kept_params: Si renseigné, seuls ces paramètres sont conservés
+        :param strip_trailing_slash: Retirer le "/" final du chemin (hors racine)
+        """
+        self.ignored_exact = {p.lower() for p in ignored_params if not p.endswith("*")}
+        self.ignored_prefixes = tuple(p[:-1].lower() for p in ignored_params if p.endswith("*"))
+        self.kept_params = {p.lower() for p in kept_params} if kept_params is not None else None
+        self.strip_trailing_slash = strip_trailing_slash
+
+    def keep_param(self, name):
+        """Indique si un paramètre de requête fait partie de l'URL canonique."""
+        name = name.lower()
+        if self.kept_params is not None:
+            return name in self.kept_params
+        return name not in self.ignored_exact and not name.startswith(self.ignored_prefixes)
+
+    def canonicalize(self, url):
+        """Retourne la forme canonique d'une URL absolue."""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").lower()
+        if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+            host = f"{host}:{parts.port}"
+        if parts.username:
+            credentials = parts.username + (f":{parts.password}" if parts.password else "")
+            host = f"{credentials}@{host}"
+
+        path = parts.path or "/"
+        if self.strip_trailing_slash and len(path) > 1 and path.endswith("/"):
+            path = path.rstrip("/") or "/"
+
+        params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if self.keep_param(k)]
+        query = urlencode(sorted(params))
+        return urlunsplit((scheme, host, path, query, ""))
+
+    __call__ = canonicalize
+
+
+def canonicalize_url(url):
+    """Forme canonique d'une URL avec les règles par défaut."""
+    return UrlCanonicalizer().canonicalize(url)
@@ -1,11 +1,87 @@
 import time
+import threading
 import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-from urllib.robotparser import RobotFileParser
 from queue import PriorityQueue
 from itertools import count
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from parser import parse_page, PARSER_BACKENDS
+from fetcher import HttpFetcher, NOT_MODIFIED
+from frontier import CrawlState
+from canonical import UrlCanonicalizer
+from robots import RobotsCache
+from simhash import simhash, SimHashIndex
+
+# URL gardées en mémoire par hôte en attente de son robots.txt ; au-delà, elles restent dans la file
+ROBOTS_WAITING_LIMIT = 100
+
+
+class TokenBucket:
+    """
+    Seau à jetons thread-safe : autorise `capacity` requêtes en rafale puis
+    une requête toutes les `1 / rate` secondes.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Réserve un jeton et retourne le temps d'attente (en secondes) avant de l'utiliser."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """Bloque jusqu'à ce qu'un jeton soit disponible."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class HostThrottle:
+    """
+    Politesse par hôte : un seau à jetons par nom d'hôte, de sorte que `delay`
+    s'applique à chaque serveur et non à l'ensemble du crawl.
+    """
+
+    def __init__(self, delay, burst=1):
+        self.delay = delay
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, url):
+        """Retourne (en le créant au besoin) le seau à jetons de l'hôte de l'URL, ou None sans délai."""
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(1 / self.delay, self.burst) if self.delay > 0 else None
+            return self.buckets[host]
+
+    def set_delay(self, url, delay):
+        """Fixe un délai propre à l'hôte de l'URL (par exemple le Crawl-delay de son robots.txt)."""
+        host = urlparse(url).netloc
+        with self.lock:
+            if delay > 0:
+                self.buckets[host] = TokenBucket(1 / delay, self.burst)
+            else:
+                self.buckets[host] = None
+
+    def wait(self, url):
+        """Attend le créneau autorisé pour l'hôte de l'URL."""
+        bucket = self.bucket_for(url)
+        if bucket is not None:
+            bucket.acquire()
 
 
 
@@ -23,139 +99,349 @@ class WebCrawler:
         base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
         return base_url
 
-    def __init__(self, base_url, max_depth=2, max_pages=50, delay=1):
+    def __init__(self, base_url, max_depth=2, max_pages=50, delay=1, concurrency=1,
+                 parser_backend="bs4", validators_path=None, state_path=None, resume=False,
+                 checkpoint_every=100, sink=None, canonicalizer=None, dedup_distance=None,
+                 robots_ttl=3600):
         """
         Initialise le crawler web.
         :param base_url: URL de base pour le crawling
         :param max_depth: Profondeur maximale de crawling
         :param max_pages: Nombre maximal de pages à visiter
-        :param delay: Temps (en secondes) entre chaque requête pour respecter les serveurs (politesse)
+        :param delay: Temps (en secondes) entre deux requêtes vers un même hôte (politesse)
+        :param concurrency: Nombre de requêtes HTTP en vol simultanément
+        :param parser_backend: Analyseur HTML utilisé ("bs4", "lxml" ou "stream")
+        :param validators_path: Base SQLite où conserver ETag/Last-Modified, liens et pages
+                                extraites entre deux crawls
+        :param state_path: Base SQLite où stocker la file, les URL visitées et les pages ;
+                           sans ce paramètre l'état du crawl reste en mémoire
+        :param resume: Reprendre le crawl enregistré dans `state_path` au lieu de repartir de zéro
+        :param checkpoint_every: Nombre de pages traitées entre deux checkpoints sur disque
+        :param sink: Sortie en flux des pages (par exemple un `JsonlSink`) ; sans sink,
+                     les pages sont accumulées dans `self.results`
+        :param canonicalizer: Règles de canonicalisation des URL (`UrlCanonicalizer` par défaut)
+        :param dedup_distance: Distance de Hamming maximale entre empreintes SimHash du
+                               contenu principal (titre et premier paragraphe) pour considérer
+                               deux pages comme quasi identiques (None, par défaut : désactivé)
+        :param robots_ttl: Durée de validité (en secondes) d'un robots.txt en cache
         """
+        if parser_backend not in PARSER_BACKENDS:
+            raise ValueError(f"Backend d'analyse inconnu : {parser_backend}")
+        self.canonicalizer = canonicalizer or UrlCanonicalizer()
+        base_url = self.canonicalizer(base_url)
         self.base_url = base_url
         self.base_base_url = self.get_base_url(base_url)
         self.max_depth = max_depth
         self.max_pages = max_pages
         self.delay = delay
-        self.visited = set()
+        self.concurrency = max(1, concurrency)
+        self.host_throttle = HostThrottle(delay)
+        self.parser_backend = parser_backend
+        self.fetcher = HttpFetcher(timeout=5, pool_size=self.concurrency, validators_path=validators_path)
+        self.not_modified_count = 0  # Pages inchangées (304) depuis le dernier crawl
+        self.fingerprints = SimHashIndex(dedup_distance) if dedup_distance is not None else None
+        self.duplicate_count = 0  # Pages quasi identiques à une page déjà extraite
         self.results = []
+        self.sink = sink
         self.pages_visited_count = 0  # Compteur du nombre total de pages visitées
-        self.counter = count()
+        self.checkpoint_every = checkpoint_every
+        self._pages_since_checkpoint = 0
 
-        # Initialisation du parser pour robots.txt
-        self.robot_parser = RobotFileParser()
-        self.robot_parser.set_url(urljoin(self.base_url, "/robots.txt"))
-        self.robot_parser.read()
+        # Cache des robots.txt par hôte, récupérés à la demande sans bloquer le crawl
+        self.robots = RobotsCache(self.fetcher, ttl=robots_ttl)
+        self.waiting_for_robots = {}  # hôte -> [(url, profondeur)] en attente de son robots.txt
 
         # File de priorité pour stocker les URL à visiter
-        self.queue = PriorityQueue()
-        self.queue.put((0, next(self.counter),base_url, 0))
-
+        self.state = None
+        if state_path is None:
+            self.visited = set()
+            self.queue = PriorityQueue()
+            self.counter = count()
+            self.queue.put((0, next(self.counter), base_url, 0))
+        else:
+            self._init_persistent_state(state_path, resume)
 
+    def _init_persistent_state(self, state_path, resume):
+        """Ouvre (ou reprend) l'état du crawl stocké sur disque."""
+        self.state = CrawlState(state_path, resume=resume)
+        self.visited = self.state.visited
+        self.queue = self.state.frontier
+        self.counter = count(self.state.next_seq())
+        if self.state.is_empty():
+            self.queue.put((0, next(self.counter), self.base_url, 0))
+        else:
+            self.pages_visited_count = self.state.get_meta("pages_visited_count")
+            if self.sink is not None and self.state.get_meta("sink_file", None) is not None:
+                # les pages écrites dans le sink après le dernier checkpoint vont être
+                # retéléchargées : elles sont retirées du sink pour ne pas être émises deux fois
+                self.sink.truncate((self.state.get_meta("sink_file"), self.state.get_meta("sink_offset")))
+            # Les pages en cours de téléchargement lors de l'arrêt sont remises dans la file
+            for url, depth in self.visited.pop_in_flight():
+                self.pages_visited_count -= 1
+                self._requeue(url, depth)
+            print(f"Reprise du crawl : {self.pages_visited_count} pages déjà visitées.")
+        self.state.checkpoint()
 
     def fetch_url(self, url):
-        """Récupère le contenu HTML d'une URL donnée."""
+        """
+        Récupère le contenu HTML d'une URL donnée.
+        Retourne `NOT_MODIFIED` si la page n'a pas changé depuis le dernier crawl.
+        """
         try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
+            response = self.fetcher.fetch(url)
+            if response.status_code == 304:
+                return NOT_MODIFIED
             return response.text
         except requests.exceptions.RequestException as e:
             print(f"Erreur lors de la récupération de l'URL {url}: {e}")
             return None
 
     def check_robots_permission(self, url):
-        """Vérifie si le crawling est autorisé pour une URL donnée selon robots.txt."""
-        if not self.robot_parser.can_fetch("*", url):
+        """Vérifie si le crawling est autorisé pour une URL donnée selon robots.txt (bloquant)."""
+        if not self.robots.allowed(url):
             print(f"Le crawling de l'URL {url} est interdit par robots.txt.")
             return False
         return True
 
     def extract_links(self, html, current_url):
         """Extrait tous les liens d'une page HTML."""
-        soup = BeautifulSoup(html, 'html.parser')
+        return self.filter_links(parse_page(html, self.parser_backend).hrefs, current_url)
+
+    def filter_links(self, hrefs, current_url):
+        """Résout les href relatifs, canonicalise les URL et ne garde que les liens à suivre."""
         links = set()
-        for anchor in soup.find_all('a', href=True):
-            link = urljoin(current_url, anchor['href'])
+        for href in hrefs:
+            link = urljoin(current_url, href)
+            if not link.startswith(("http://", "https://")):
+                continue
+            link = self.canonicalizer(link)
             if link.startswith(self.base_base_url) or "product" in link:  # Filtre les liens hors domaine
                 links.add(link)
         return links
 
     def crawl(self):
-        """Explore récursivement les pages web à l'aide de la file de priorité."""
-        while not self.queue.empty():
+        """
+        Explore les pages web à l'aide de la file de priorité.
+        Jusqu'à `concurrency` téléchargements sont en vol ; l'ordre de départ suit
+        la file de priorité et le délai de politesse est appliqué par hôte.
+        L'analyse des pages et la mise à jour de la file restent dans le thread principal.
+        """
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                self._dispatch(executor, in_flight)
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, target, depth = in_flight.pop(future)
+                    if kind == "robots":
+                        self._handle_robots(target, future.result())
+                    else:
+                        self._handle_response(target, depth, future.result())
+
+        self.checkpoint()
+        if self._has_reached_max_pages():
+            print("Nombre maximal de pages atteint. Arrêt du crawling.")
+
+    def _handle_response(self, url, depth, html):
+        """Traite le résultat d'un téléchargement (thread principal)."""
+        if html is NOT_MODIFIED:
+            # Page inchangée : pas d'analyse, la page et les liens mémorisés sont réémis,
+            # pour que la sortie d'un re-crawl reste un instantané complet du site
+            self.not_modified_count += 1
+            links, record = self.fetcher.validators.page(url)
+            if record is not None:
+                self._emit(record)
+            self._process_links(links, url, depth)
+        elif html is not None:
+            links, record = self.process_page(html, url)
+            self.fetcher.validators.set_page(url, links, record)
+            self._process_links(links, url, depth)
+
+        if self.state is not None:
+            self.visited.mark_done(url)
+            self._pages_since_checkpoint += 1
+            if self._pages_since_checkpoint >= self.checkpoint_every:
+                self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Sauvegarde l'avancement : pages extraites, compteurs, file et URL visitées
+        (si l'état est persistant), ainsi que les validateurs HTTP.
+        """
+        self.fetcher.save()
+        if self.sink is not None:
+            self.sink.flush()
+        if self.state is None:
+            return
+        # les URL en attente d'un robots.txt ont quitté la file : elles y sont remises
+        # avant la validation, pour qu'un arrêt brutal ne les perde pas
+        for host in list(self.waiting_for_robots):
+            for url, depth in self.waiting_for_robots.pop(host):
+                self._requeue(url, depth)
+        self.state.save_pages(self.results)
+        self.results.clear()
+        self.state.set_meta("pages_visited_count", self.pages_visited_count)
+        self.state.set_meta("next_seq", next(self.counter))
+        if self.sink is not None:
+            # position du sink validée avec l'état : une reprise repart de là
+            sink_file, sink_offset = self.sink.position()
+            self.state.set_meta("sink_file", sink_file)
+            self.state.set_meta("sink_offset", sink_offset)
+        self.state.checkpoint()
+        self._pages_since_checkpoint = 0
+
+    def iter_results(self):
+        """
+        Parcourt toutes les pages extraites, y compris celles déjà sauvegardées sur disque.
+        Avec un sink, les pages sont dans les fichiers du sink et ne sont pas reparcourues ici.
+        """
+        if self.state is not None:
+            yield from self.state.iter_pages()
+        yield from self.results
+
+    def _is_near_duplicate(self, page, url):
+        """
+        Vérifie, via une empreinte SimHash du contenu principal (titre et premier
+        paragraphe, sans le gabarit commun aux pages du site), si la page est quasi
+        identique à une page déjà extraite. Ses liens sont tout de même suivis.
+        """
+        content = f"{page.title} {page.first_paragraph}".strip()
+        if self.fingerprints is None or not content:
+            return False
+        fingerprint = simhash(content)
+        original = self.fingerprints.find_near(fingerprint)
+        if original is not None:
+            print(f"Page quasi identique à {original}, ignorée : {url}")
+            self.duplicate_count += 1
+            return True
+        self.fingerprints.add(fingerprint, url)
+        return False
+
+    def _dispatch(self, executor, in_flight):
+        """
+        Lance de nouveaux téléchargements tant qu'il reste des places libres.
+        Une URL dont l'hôte attend son robots.txt est mise de côté en mémoire, dans
+        la limite de `ROBOTS_WAITING_LIMIT` par hôte ; les suivantes sont remises dans
+        la file, et l'examen de la file s'arrête après autant d'URL remises.
+        """
+        deferred = []
+        while len(in_flight) < self.concurrency and not self.queue.empty():
             if self._has_reached_max_pages():
                 break
 
-            _, _,url, depth = self.queue.get()
+            _, _, url, depth = self.queue.get()
 
             if not self._should_crawl_url(url, depth):
                 continue
 
-            self._update_state_for_url(url)
-
-            html = self._fetch_and_process_url(url)
-            if html is None:
+            if self.robots.needs_fetch(url):
+                self._schedule_robots(executor, in_flight, url)
+            allowed = self.robots.can_fetch(url)
+            if allowed is None:
+                # robots.txt de l'hôte pas encore connu : l'URL attend sa récupération
+                waiting = self.waiting_for_robots.setdefault(self.robots.host_key(url), [])
+                if len(waiting) < ROBOTS_WAITING_LIMIT:
+                    waiting.append((url, depth))
+                else:
+                    deferred.append((url, depth))
+                    if len(deferred) >= ROBOTS_WAITING_LIMIT:
+                        break
+                continue
+            if not allowed:
+                print(f"Le crawling de l'URL {url} est interdit par robots.txt.")
                 continue
 
-            self._process_links(html, url, depth)
+            self._update_state_for_url(url, depth)
+            future = executor.submit(self._polite_fetch, url)
+            in_flight[future] = ("page", url, depth)
+        for url, depth in deferred:
+            self._requeue(url, depth)
+
+    def _requeue(self, url, depth):
+        """Remet une URL dans la file de priorité."""
+        self.queue.put((self._link_priority(url), next(self.counter), url, depth))
 
-            time.sleep(self.delay)  # Pause entre les requêtes HTTP (politesse)
+    def _schedule_robots(self, executor, in_flight, url):
+        """Lance la récupération du robots.txt de l'hôte de l'URL dans le pool."""
+        host = self.robots.host_key(url)
+        self.robots.mark_pending(url)
+        in_flight[executor.submit(self.robots.fetch, host)] = ("robots", host, None)
+
+    def _handle_robots(self, host, parser):
+        """
+        Enregistre un robots.txt, applique son Crawl-delay / Request-rate à l'hôte
+        et remet dans la file les URL qui l'attendaient.
+        """
+        self.robots.store(host, parser)
+        host_delay = self.robots.min_delay(host)
+        if host_delay > self.delay:
+            print(f"Délai de {host_delay}s appliqué à {host} (robots.txt).")
+            self.host_throttle.set_delay(host, host_delay)
+        for url, depth in self.waiting_for_robots.pop(host, []):
+            self._requeue(url, depth)
+
+    def _polite_fetch(self, url):
+        """Attend le créneau de l'hôte puis récupère l'URL (exécuté dans un thread du pool)."""
+        self.host_throttle.wait(url)
+        return self.fetch_url(url)
 
     def _has_reached_max_pages(self):
         """Vérifie si le nombre maximal de pages a été atteint."""
-        if self.pages_visited_count >= self.max_pages:
-            print("Nombre maximal de pages atteint. Arrêt du crawling.")
-            return True
-        return False
+        return self.pages_visited_count >= self.max_pages
 
     def _should_crawl_url(self, url, depth):
-        """Vérifie si l'URL doit être crawlé."""
+        """Vérifie si l'URL doit être crawlé (hors robots.txt, vérifié à part sans bloquer)."""
         if url in self.visited or depth > self.max_depth:
             return False
-        if not self.check_robots_permission(url):
-            return False
         return True
 
-    def _update_state_for_url(self, url):
+    def _update_state_for_url(self, url, depth):
         """Mise à jour de l'état après le crawling d'une URL."""
         print(f"Crawling: {url}")
-        self.visited.add(url)
+        if self.state is not None:
+            self.visited.add(url, depth)
+        else:
+            self.visited.add(url)
         self.pages_visited_count += 1
 
-    def _fetch_and_process_url(self, url):
-        """Récupère le contenu HTML de l'URL et traite la page."""
-        html = self.fetch_url(url)
-        if html is not None:
-            self.process_page(html, url)
-        return html
+    @staticmethod
+    def _link_priority(link):
+        """Priorité d'un lien dans la file : les pages produit passent en premier."""
+        return -1 if "product" in link else 1
 
-    def _process_links(self, html, url, depth):
-        """Analyse et ajoute les liens à la file de priorité."""
-        links = self.extract_links(html, url)
+    def _process_links(self, links, url, depth):
+        """Ajoute les liens extraits de la page à la file de priorité."""
         for link in links:
             if link not in self.visited:
-                priority = -1 if "product" in link else 1
-                self.queue.put((priority, next(self.counter), link, depth + 1))
+                self.queue.put((self._link_priority(link), next(self.counter), link, depth + 1))
 
     def process_page(self, html, url):
-        """Analyse une page et sauvegarde les résultats."""
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Récupère le titre
-        title = soup.find('title').text if soup.find('title') else "Pas de titre"
-
-        # Récupère le premier paragraphe
-        first_paragraph = ""
-        first_p = soup.find('p')
-        if first_p:
-            first_paragraph = first_p.text.strip()
+        """
+        Analyse une page (une seule passe), sauvegarde les résultats et retourne
+        (liens à ajouter à la file, page émise ou None si elle est ignorée).
+        """
+        page = parse_page(html, self.parser_backend)
+        links = self.filter_links(page.hrefs, url)
 
-        # Récupère les liens pertinents
-        links = list(self.extract_links(html, url))
+        if self._is_near_duplicate(page, url):
+            return links, None
 
         # Sauvegarde les résultats
-        self.results.append({
+        record = {
             "url": url,
-            "title": title,
-            "first_paragraph": first_paragraph,
-            "links": links,
-        })
+            "title": page.title,
+            "first_paragraph": page.first_paragraph,
+            "links": list(links),
+        }
+        self._emit(record)
+        return links, record
+
+    def _emit(self, record):
+        """Écrit une page extraite dans le sink, ou l'accumule dans `self.results`."""
+        if self.sink is not None:
+            self.sink.write(record)
+        else:
+            self.results.append(record)
@@ -0,0 +1,91 @@
+import threading
+from bitmap import RoaringBitmap
+from tokenizer import get_tokenizer
+
+
+FEATURE_PREFIX = "feature:"
+
+
+class FacetIndex:
+    """
+    Facets over the `product_features` fields of a `SegmentSet`: one compressed
+    bitmap (bitmap.RoaringBitmap) of global doc ids per feature value, built from the
+    feature postings the first time a feature is used and kept for the lifetime of
+    the loaded index. Deleted documents are excluded, as in the postings.
+    Filtering is bitmap algebra: OR between the values of a feature, AND between
+    features.
+    """
+
+    def __init__(self, segment_set, tokenizer=None):
+        self.segment_set = segment_set
+        self.tokenizer = tokenizer or get_tokenizer()
+        self._facets = {}
+        self._lock = threading.Lock()
+
+    def keys(self):
+        return [name[len(FEATURE_PREFIX):] for name in self.segment_set.field_names()
+                if name.startswith(FEATURE_PREFIX)]
+
+    def facet(self, key):
+        """
+        {value: bitmap} of a feature (empty if the feature is unknown).
+        """
+        with self._lock:
+            if key not in self._facets:
+                name = FEATURE_PREFIX + key
+                bitmaps = {}
+                if self.segment_set.has_field(name):
+                    field = self.segment_set.field(name)
+                    for value in field.terms():
+                        doc_ids = field.doc_ids(value)
+                        if doc_ids:
+                            bitmaps[value] = RoaringBitmap.from_sorted(doc_ids)
+                self._facets[key] = bitmaps
+            return self._facets[key]
+
+    def bitmap(self, key, value):
+        """
+        Documents having a value of a feature. The value goes through the tokenizer,
+        as feature values did at indexing time; a value of several tokens requires
+        all of them. Unknown features or values give an empty bitmap.
+        """
+        facet = self.facet(key)
+        result = None
+        for token in self.tokenizer.tokenize(value):
+            bitmap = facet.get(token)
+            if bitmap is None:
+                return RoaringBitmap()
+            result = bitmap if result is None else result & bitmap
+        return result if result is not None else RoaringBitmap()
+
+    def select(self, filters):
+        """
+        Documents matching facet filters {feature: [values]}: any of the values of
+        each feature, all the features. Returns None when there is no filter.
+        """
+        result = None
+        for key, values in filters:
+            selected = RoaringBitmap()
+            for value in values:
+                selected = selected | self.bitmap(key, value)
+            result = selected if result is None else result & selected
+            if not result:
+                break
+        return result
+
+    def counts(self, documents, keys, limit=20):
+        """
+        Facet counts of a result set (bitmap): {feature: {value: count}} with the
+        `limit` most frequent values of each feature, values absent from the result
+        set left out.
+        """
+        counts = {}
+        for key in keys:
+            value_counts = []
+            for value, bitmap in self.facet(key).items():
+                count = bitmap.intersection_count(documents)
+                if count:
+                    value_counts.append((count, value))
+            value_counts.sort(key=lambda item: (-item[0], item[1]))
+            counts[key] = {value: count for count, value in value_counts[:limit]}
+        return counts
@@ -0,0 +1,132 @@
+import json
+import sqlite3
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+
+
+# Valeur retournée par `WebCrawler.fetch_url` quand le serveur répond 304 Not Modified
+NOT_MODIFIED = object()
+
+
+class ValidatorStore:
+    """
+    Mémorise, par URL, les validateurs HTTP (ETag, Last-Modified), les liens et la
+    page extraite lors du dernier crawl, afin qu'un re-crawl envoie des requêtes
+    conditionnelles et, pour une page inchangée, réémette sa page et alimente la
+    file sans la ré-analyser. Les entrées sont dans une base SQLite : seules les
+    entrées modifiées sont écrites et rien n'est gardé en mémoire.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS validators (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,
+                                               links TEXT, record TEXT);
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: Base SQLite des validateurs (None : en mémoire, perdus à la fin du crawl)
+        """
+        self.path = path
+        # partagée par les threads de téléchargement, protégée par le verrou
+        self.connection = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self.connection.executescript(self.SCHEMA)
+        self.lock = threading.Lock()
+
+    def _entry(self, url):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT etag, last_modified, links, record FROM validators WHERE url = ?", (url,)
+            ).fetchone()
+
+    def conditional_headers(self, url):
+        """Retourne les en-têtes If-None-Match / If-Modified-Since pour l'URL."""
+        entry = self._entry(url)
+        headers = {}
+        if entry:
+            etag, last_modified, _, _ = entry
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def record(self, url, response):
+        """Enregistre les validateurs d'une réponse 200."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self.lock:
+            if etag or last_modified:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO validators (url, etag, last_modified, links, record) "
+                    "VALUES (?, ?, ?, '[]', NULL)", (url, etag, last_modified))
+            else:
+                self.connection.execute("DELETE FROM validators WHERE url = ?", (url,))
+
+    def set_page(self, url, links, record=None):
+        """Associe à ses validateurs les liens extraits de la page et la page émise (None : page ignorée)."""
+        with self.lock:
+            self.connection.execute(
+                "UPDATE validators SET links = ?, record = ? WHERE url = ?",
+                (json.dumps(sorted(links), ensure_ascii=False),
+                 json.dumps(record, ensure_ascii=False) if record is not None else None, url))
+
+    def page(self, url):
+        """Retourne (liens, page émise ou None) mémorisés pour une page non modifiée."""
+        entry = self._entry(url)
+        if entry is None:
+            return set(), None
+        _, _, links, record = entry
+        return set(json.loads(links or "[]")), json.loads(record) if record else None
+
+    def save(self):
+        """Valide sur disque les entrées modifiées depuis la dernière sauvegarde."""
+        with self.lock:
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+
+class HttpFetcher:
+    """
+    Couche HTTP du crawler : une `requests.Session` partagée avec un pool de
+    connexions keep-alive, la négociation de compression (gzip/deflate, et br
+    si brotli est installé) et les requêtes conditionnelles.
+    """
+
+    def __init__(self, timeout=5, pool_size=10, validators_path=None, user_agent=None):
+        self.timeout = timeout
+        self.validators = ValidatorStore(validators_path)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = DEFAULT_ACCEPT_ENCODING
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+
+    def fetch(self, url):
+        """
+        Exécute un GET conditionnel. Retourne la réponse (200 ou 304),
+        ou lève `requests.exceptions.RequestException`.
+        """
+        headers = self.validators.conditional_headers(url)
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return response
+        response.raise_for_status()
+        self.validators.record(url, response)
+        return response
+
+    def save(self):
+        """Sauvegarde les validateurs pour le prochain crawl."""
+        self.validators.save()
+
+    def close(self):
+        """Ferme les connexions du pool et la base des validateurs."""
+        self.session.close()
+        self.validators.close()
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+
+def url_key(url):
+    """Empreinte 64 bits d'une URL, utilisée comme clé compacte de l'ensemble des URL visitées."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+class SqliteFrontier:
+    """
+    File de priorité stockée sur disque, avec la même interface que `queue.PriorityQueue`
+    pour les éléments (priorité, numéro d'ordre, url, profondeur).
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def put(self, item):
+        priority, seq, url, depth = item
+        self.connection.execute(
+            "INSERT INTO frontier (priority, seq, url, depth) VALUES (?, ?, ?, ?)",
+            (priority, seq, url, depth),
+        )
+
+    def get(self):
+        row = self.connection.execute(
+            "SELECT rowid, priority, seq, url, depth FROM frontier ORDER BY priority, seq LIMIT 1"
+        ).fetchone()
+        if row is None:
+            raise IndexError("La file est vide.")
+        self.connection.execute("DELETE FROM frontier WHERE rowid = ?", (row[0],))
+        return row[1:]
+
+    def empty(self):
+        return self.connection.execute("SELECT 1 FROM frontier LIMIT 1").fetchone() is None
+
+    def qsize(self):
+        return self.connection.execute("SELECT COUNT(*) FROM frontier").fetchone()[0]
+
+
+class SqliteVisitedSet:
+    """
+    Ensemble des URL visitées stocké sur disque, indexé par une empreinte 64 bits.
+    Une URL est d'abord enregistrée « en cours » puis marquée terminée une fois
+    la page traitée, pour pouvoir relancer les téléchargements interrompus.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __contains__(self, url):
+        return self.connection.execute(
+            "SELECT 1 FROM visited WHERE key = ?", (url_key(url),)
+        ).fetchone() is not None
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM visited").fetchone()[0]
+
+    def add(self, url, depth=0):
+        self.connection.execute(
+            "INSERT OR IGNORE INTO visited (key, url, depth, done) VALUES (?, ?, ?, 0)",
+            (url_key(url), url, depth),
+        )
+
+    def mark_done(self, url):
+        self.connection.execute("UPDATE visited SET done = 1 WHERE key = ?", (url_key(url),))
+
+    def pop_in_flight(self):
+        """Retire et retourne les (url, profondeur) dont le traitement n'a pas été terminé."""
+        rows = self.connection.execute("SELECT url, depth FROM visited WHERE done = 0").fetchall()
+        self.connection.execute("DELETE FROM visited WHERE done = 0")
+        return rows
+
+
+class CrawlState:
+    """
+    État persistant d'un crawl dans une base SQLite : file de priorité, URL visitées,
+    pages extraites et compteurs. Les modifications sont validées à chaque
+    `checkpoint`, ce qui permet de reprendre le crawl après un arrêt brutal
+    en ne perdant que le travail effectué depuis le dernier checkpoint.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS frontier (priority INTEGER, seq INTEGER, url TEXT, depth INTEGER);
+        CREATE INDEX IF NOT EXISTS frontier_order ON frontier (priority, seq);
+        CREATE TABLE IF NOT EXISTS visited (key INTEGER PRIMARY KEY, url TEXT, depth INTEGER, done INTEGER);
+        CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+    """
+
+    def __init__(self, path, resume=False):
+        """
+        :param path: Chemin de la base SQLite
+        :param resume: Reprendre l'état existant ; sinon la base est réinitialisée
+        """
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(self.SCHEMA)
+        self.frontier = SqliteFrontier(self.connection)
+        self.visited = SqliteVisitedSet(self.connection)
+
+    def is_empty(self):
+        """Indique si aucun crawl n'a encore été enregistré dans la base."""
+        return self.frontier.empty() and len(self.visited) == 0
+
+    def get_meta(self, key, default=0):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def next_seq(self):
+        """Premier numéro d'ordre libre pour la file de priorité."""
+        row = self.connection.execute("SELECT MAX(seq) FROM frontier").fetchone()
+        return max(self.get_meta("next_seq"), (row[0] or 0) + 1)
+
+    def save_pages(self, pages):
+        self.connection.executemany(
+            "INSERT INTO pages (data) VALUES (?)",
+            ((json.dumps(page, ensure_ascii=False),) for page in pages),
+        )
+
+    def iter_pages(self):
+        for (data,) in self.connection.execute("SELECT data FROM pages ORDER BY id"):
+            yield json.loads(data)
+
+    def checkpoint(self):
+        """Valide sur disque toutes les modifications depuis le dernier checkpoint."""
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
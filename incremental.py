@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import threading
+from index import Index
+from segment import (Segment, merge_segments, read_manifest, write_json_atomic, write_manifest,
+                     read_tombstones, write_tombstones)
+
+
+INDEXED_FIELDS = ("title", "description", "first_paragraph", "product_features", "product_reviews")
+
+
+def content_hash(doc):
+    """
+    Hash of the indexed content of a document (links and crawl metadata are ignored).
+    """
+    content = {key: doc[key] for key in INDEXED_FIELDS if key in doc}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class IndexWriter:
+    """
+    Incremental index stored as a directory of immutable segments:
+    - new or changed documents (URL + content hash) are written to a new small segment,
+    - the previous copy of a changed or deleted document gets a tombstone,
+    - a merge policy compacts small segments and segments with many tombstones.
+    The manifest (segments.json) is replaced atomically, each update publishing a
+    new generation that readers (SegmentSet) pick up on reload. The document
+    registry (docs.json) is written just before it and records the generation it
+    belongs to: after a crash between the two writes, the registry is rebuilt from
+    the segments of the published generation. Files superseded by
+    a generation are kept until the next one is published, so a reader still on the
+    previous generation (or opening it while the manifest is replaced) finds them.
+    """
+
+    DOCS = "docs.json"
+
+    def __init__(self, directory="index", max_segments=8, merge_factor=4, max_deleted_ratio=0.3):
+        """
+        :param directory: Index directory
+        :param max_segments: Above this number of segments, the smallest ones are merged
+        :param merge_factor: Number of segments merged together
+        :param max_deleted_ratio: Segments with a higher share of deleted docs are rewritten
+        """
+        self.directory = directory
+        self.max_segments = max_segments
+        self.merge_factor = merge_factor
+        self.max_deleted_ratio = max_deleted_ratio
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = read_manifest(directory)
+        self.previous_files = self._referenced_files()  # files of the last published generation
+        self.docs = self._load_docs()  # url -> [content hash, segment name]
+
+    def _load_docs(self):
+        """
+        Reads the document registry. If it does not belong to the published
+        generation (crash between the registry and manifest writes), it is rebuilt
+        from the live documents of the manifest's segments; their content hash is
+        unknown, so they are reindexed the next time they are seen.
+        """
+        docs_path = os.path.join(self.directory, self.DOCS)
+        if not os.path.exists(docs_path):
+            return {} if not self.manifest["segments"] else self._rebuild_docs()
+        with open(docs_path, "r", encoding="utf-8") as f:
+            registry = json.load(f)
+        if "generation" not in registry:  # registry written before generations were recorded
+            return registry
+        if registry["generation"] != self.manifest["generation"]:
+            return self._rebuild_docs()
+        return registry["docs"]
+
+    def _rebuild_docs(self):
+        docs = {}
+        for entry in self.manifest["segments"]:
+            deleted = set(read_tombstones(self.directory, entry["tombstones"]))
+            with Segment(os.path.join(self.directory, entry["name"])) as segment:
+                for doc_id, url in enumerate(segment.urls()):
+                    if doc_id not in deleted:
+                        docs[url] = [None, entry["name"]]
+        return docs
+
+    def _next_name(self, extension):
+        self.manifest["next_segment"] = self.manifest.get("next_segment", 0) + 1
+        return f"seg-{self.manifest['next_segment']:06d}.{extension}"
+
+    def _entry(self, name):
+        for entry in self.manifest["segments"]:
+            if entry["name"] == name:
+                return entry
+        return None
+
+    def _tombstone(self, pending, segment_name, url):
+        pending.setdefault(segment_name, set()).add(url)
+
+    def update(self, docs, full_snapshot=False, tokenizer=None):
+        """
+        Indexes only the new and changed documents of an iterable. A URL listed
+        several times counts once: its last copy wins.
+        :param full_snapshot: The iterable is the whole catalog: URLs that are not in it are deleted
+        :return: counts of added, updated, deleted and unchanged documents
+        """
+        with self.lock:
+            index = Index(tokenizer=tokenizer)
+            latest = {}  # url -> (content hash, document if new or changed, else None)
+            for doc in docs:
+                digest = content_hash(doc)
+                previous = self.docs.get(doc["url"])
+                latest[doc["url"]] = (digest, None if previous is not None and previous[0] == digest else doc)
+            deletions = {}  # segment name -> urls to tombstone
+            stats = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+            for url, (digest, doc) in latest.items():
+                previous = self.docs.get(url)
+                if doc is None:
+                    stats["unchanged"] += 1
+                    continue
+                if previous is not None:
+                    self._tombstone(deletions, previous[1], url)
+                    stats["updated"] += 1
+                else:
+                    stats["added"] += 1
+                index.add_document(doc)
+                self.docs[url] = [digest, None]
+
+            if full_snapshot:
+                for url in [url for url in self.docs if url not in latest]:
+                    self._tombstone(deletions, self.docs.pop(url)[1], url)
+                    stats["deleted"] += 1
+
+            new_entry = None
+            if len(index.doc_table):
+                name = self._next_name("seg")
+                index.save_segment(os.path.join(self.directory, name))
+                new_entry = {"name": name, "doc_count": len(index.doc_table), "deleted": 0, "tombstones": None}
+                for url in index.doc_table:
+                    self.docs[url][1] = name
+
+            self._apply_tombstones(deletions)
+            if new_entry is not None:
+                self.manifest["segments"].append(new_entry)
+            self._publish()
+            return stats
+
+    def delete(self, urls):
+        """
+        Deletes documents by URL (tombstones only, the segments are not rewritten).
+        """
+        with self.lock:
+            deletions = {}
+            for url in urls:
+                if url in self.docs:
+                    self._tombstone(deletions, self.docs.pop(url)[1], url)
+            self._apply_tombstones(deletions)
+            self._publish()
+
+    def _apply_tombstones(self, deletions):
+        for segment_name, urls in deletions.items():
+            entry = self._entry(segment_name)
+            if entry is None:
+                continue
+            deleted = set(read_tombstones(self.directory, entry["tombstones"]))
+            with Segment(os.path.join(self.directory, segment_name)) as segment:
+                for url in urls:
+                    doc_id = segment.doc_id(url)
+                    if doc_id is not None:
+                        deleted.add(doc_id)
+            entry["tombstones"] = self._next_name("del")
+            entry["deleted"] = len(deleted)
+            write_tombstones(self.directory, entry["tombstones"], deleted)
+
+    def _publish(self):
+        """
+        Writes the document registry then the manifest (new generation), both
+        atomically, the manifest last, and removes the files referenced by neither
+        this generation nor the previous one.
+        """
+        self.manifest["generation"] += 1
+        write_json_atomic(os.path.join(self.directory, self.DOCS),
+                          {"generation": self.manifest["generation"], "docs": self.docs}, ensure_ascii=False)
+        write_manifest(self.directory, self.manifest)
+        self._remove_unused_files()
+
+    def _referenced_files(self):
+        files = set()
+        for entry in self.manifest["segments"]:
+            files.add(entry["name"])
+            if entry["tombstones"]:
+                files.add(entry["tombstones"])
+        return files
+
+    def _remove_unused_files(self):
+        current_files = self._referenced_files()
+        kept = current_files | self.previous_files
+        for name in os.listdir(self.directory):
+            if name.startswith("seg-") and name not in kept:
+                os.remove(os.path.join(self.directory, name))
+        self.previous_files = current_files
+
+    def merge_candidates(self):
+        """
+        Merge policy: segments whose share of deleted documents exceeds max_deleted_ratio,
+        plus the merge_factor smallest segments when there are more than max_segments.
+        """
+        segments = self.manifest["segments"]
+        candidates = [entry for entry in segments
+                      if entry["doc_count"] and entry["deleted"] / entry["doc_count"] > self.max_deleted_ratio]
+        if len(segments) > self.max_segments:
+            by_size = sorted(segments, key=lambda entry: entry["doc_count"] - entry["deleted"])
+            for entry in by_size[:self.merge_factor]:
+                if entry not in candidates:
+                    candidates.append(entry)
+        return candidates
+
+    def maybe_merge(self):
+        """
+        Applies the merge policy once; returns the name of the merged segment or None.
+        """
+        with self.lock:
+            candidates = self.merge_candidates()
+            if not candidates:
+                return None
+            # Keep the manifest order so that the most recent copy of a URL wins
+            candidates = [entry for entry in self.manifest["segments"] if entry in candidates]
+            segments = [Segment(os.path.join(self.directory, entry["name"])) for entry in candidates]
+            tombstones = [read_tombstones(self.directory, entry["tombstones"]) for entry in candidates]
+            name = self._next_name("seg")
+            try:
+                merge_segments(os.path.join(self.directory, name), segments, tombstones)
+            finally:
+                for segment in segments:
+                    segment.close()
+            with Segment(os.path.join(self.directory, name)) as merged:
+                doc_count = merged.doc_count
+                urls = list(merged.urls())
+            position = self.manifest["segments"].index(candidates[0])
+            remaining = [entry for entry in self.manifest["segments"] if entry not in candidates]
+            remaining.insert(position, {"name": name, "doc_count": doc_count, "deleted": 0, "tombstones": None})
+            self.manifest["segments"] = remaining
+            for url in urls:
+                if url in self.docs:
+                    self.docs[url][1] = name
+            self._publish()
+            return name
+
+    def merge_in_background(self):
+        """
+        Runs the merge policy in a background thread until nothing is left to merge.
+        Updates wait for the running merge step (shared lock); returns the thread.
+        """
+        def run():
+            while self.maybe_merge() is not None:
+                pass
+
+        thread = threading.Thread(target=run, name="index-merge", daemon=True)
+        thread.start()
+        return thread
@@ -1,19 +1,34 @@
+import glob
 import json
-import string
-from collections import defaultdict
-import pandas as pd
+import os
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, islice
+from reviews import ReviewStats
+from tokenizer import get_tokenizer
+from segment import write_segment
+from postings import DocTable, new_postings, add_posting
+
+
+TEXT_FIELDS = ("title", "description")
+INDEXES_MANIFEST = "indexes.json"  # {index name: JSON file}, read lazily by navweb.NavWeb
 
 
 class Index:
 
-    def __init__(self, data):
-        self.data = data
-        self.index_title = defaultdict(set)
-        self.index_description = defaultdict(set)
-        self.index_review = defaultdict(set)
-        self.index_features = defaultdict(lambda: defaultdict(set))
-        self.index_position_title = defaultdict(set)
-        self.index_position_description = defaultdict(set)
+    def __init__(self, data=None, tokenizer=None):
+        self.data = data if data is not None else []
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.doc_table = DocTable()
+        self.index_title = defaultdict(new_postings)
+        self.index_description = defaultdict(new_postings)
+        self.index_review = {}
+        self.review_stats = ReviewStats()
+        self.index_features = defaultdict(lambda: defaultdict(new_postings))
+        self.index_position_title = defaultdict(dict)
+        self.index_position_description = defaultdict(dict)
+        self.field_lengths = {name: array("I") for name in TEXT_FIELDS}
 
     def __str__(self):
         """
@@ -31,11 +46,30 @@ class Index:
         """
         Loads JSON line from a path
         """
-        docs = []
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                docs.append(json.loads(line))
-        return docs
+        return list(Index.iter_jsonl(path))
+
+    @staticmethod
+    def iter_jsonl(*paths):
+        """
+        Lazily yields the records of one or more JSON line files. Each path may be
+        a glob pattern (e.g. "crawl/results-*.jsonl" for the rotating crawl output),
+        matched files are read in sorted order. A last line without a final newline
+        is yielded if it is a complete record and skipped if it does not parse (it is
+        still being written), so a live crawl output can be read.
+        """
+        for pattern in paths:
+            for path in sorted(glob.glob(pattern)) or [pattern]:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        if not line.endswith("\n"):
+                            try:
+                                yield json.loads(line)
+                            except json.JSONDecodeError:
+                                pass
+                            break
+                        yield json.loads(line)
 
     @staticmethod
     def load_json(path):
@@ -43,7 +77,7 @@ class Index:
         Loads JSON line from a path
         """
         docs = []
-        with open("stop_words_english.json", "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             for line in f:
                 docs.append(json.loads(line))
         return docs
@@ -84,67 +118,181 @@ class Index:
         """
         Simple tokenization with stopwords removal.
         """
-        ww = Index.load_json("stop_words_english.json")
-        stopwords = []
-        for word in ww:
-            stopwords.append(word)
-        stopwords = stopwords[0] + list(string.punctuation)
-        stopwords = set(stopwords)
-        tokens = text.lower().translate(str.maketrans("", "", string.punctuation)).split()
-        return [token for token in tokens if token not in stopwords]
+        return self.tokenizer.tokenize(text)
+
+    @staticmethod
+    def doc_description(doc):
+        """
+        Returns the description of a document, falling back to the first paragraph
+        for records produced by the crawler.
+        """
+        return doc.get("description") or doc.get("first_paragraph", "")
+
+    def add_documents(self, docs):
+        """
+        Indexes an iterable of documents (list or generator) in a single pass,
+        building every index without keeping the documents in memory.
+        """
+        for doc in docs:
+            self.add_document(doc)
+
+    def add_document(self, doc):
+        """
+        Adds one document to every index.
+        """
+        self._index_doc_text(doc, positions=True)
+        self._index_doc_features(doc)
+        self._index_doc_review(doc)
+
+    def partial(self):
+        """
+        Compact snapshot of the indexes built so far (local doc ids), as sent back
+        by the workers of `build_parallel`: each field is packed into a few flat
+        arrays (see `_pack_field`), which pickle as raw bytes, instead of one small
+        array per term and one list of positions per posting.
+        """
+        return {
+            "urls": self.doc_table.urls,
+            "fields": {name: _pack_field(getattr(self, f"index_{name}"), getattr(self, f"index_position_{name}"))
+                       for name in TEXT_FIELDS},
+            "features": {key: _pack_field(tokens) for key, tokens in self.index_features.items()},
+            "review": self.index_review,
+            "review_stats": self.review_stats,
+            "field_lengths": self.field_lengths,
+        }
+
+    def merge_partial(self, partial):
+        """
+        Merges the partial indexes of a shard, remapping its local doc ids to this
+        index's doc table. Shards of new URLs merged in order keep every postings
+        list sorted with plain array extends.
+        """
+        mapping = array("I", (self.doc_table.add(url) for url in partial["urls"]))
+        in_order = all(previous < doc_id for previous, doc_id in zip(mapping, mapping[1:]))
+        for name in TEXT_FIELDS:
+            _merge_field(getattr(self, f"index_{name}"), partial["fields"][name], mapping, in_order,
+                         getattr(self, f"index_position_{name}"))
+        for key_feature, packed in partial["features"].items():
+            _merge_field(self.index_features[key_feature], packed, mapping, in_order)
+        self.index_review.update(partial["review"])
+        self.review_stats.merge(partial["review_stats"], mapping)
+        for name, lengths in partial["field_lengths"].items():
+            for local_id, length in enumerate(lengths):
+                self.set_field_length(name, mapping[local_id], length)
+
+    @classmethod
+    def build_parallel(cls, docs, workers=None, shard_size=2000):
+        """
+        Builds every index with a pool of worker processes: documents are split in
+        shards of shard_size, each worker tokenizes each field of its documents once
+        and returns packed partial postings, which are merged here in shard order.
+        At most 2 shards per worker are in flight, so docs can be a generator.
+        With a single worker, the documents are indexed serially in this process.
+        """
+        workers = workers or os.cpu_count() or 1
+        index = cls()
+        if workers <= 1:
+            index.add_documents(docs)
+            return index
+        docs = iter(docs)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            while True:
+                while len(pending) < 2 * workers:
+                    shard = list(islice(docs, shard_size))
+                    if not shard:
+                        break
+                    pending.append(executor.submit(_build_shard, shard))
+                if not pending:
+                    break
+                index.merge_partial(pending.popleft().result())
+        return index
+
+    @staticmethod
+    def positions_by_token(tokens):
+        """
+        Maps each token to the sorted list of its positions in the token sequence
+        (the term frequency is the length of that list).
+        """
+        positions = defaultdict(list)
+        for position, token in enumerate(tokens):
+            positions[token].append(position)
+        return positions
+
+    def set_field_length(self, name, doc_id, length):
+        """
+        Records the number of tokens of a field of a document (BM25 length norm).
+        """
+        lengths = self.field_lengths[name]
+        if len(lengths) <= doc_id:
+            lengths.extend([0] * (doc_id + 1 - len(lengths)))
+        lengths[doc_id] = length
+
+    def _index_doc_text(self, doc, postings=True, positions=False):
+        """
+        Tokenizes title and description once and feeds the inverted indexes
+        and/or the positional indexes, and records the token length of each field.
+        """
+        doc_id = self.doc_table.add(doc["url"])
+        fields = (
+            ("title", self.tokenize(doc["title"]), self.index_title, self.index_position_title),
+            ("description", self.tokenize(self.doc_description(doc)), self.index_description,
+             self.index_position_description),
+        )
+        for name, tokens, inverted_index, position_index in fields:
+            self.set_field_length(name, doc_id, len(tokens))
+            token_positions = self.positions_by_token(tokens)
+            for token, token_position_list in token_positions.items():
+                if postings:
+                    add_posting(inverted_index[token], doc_id)
+                if positions:
+                    position_index[token][doc_id] = token_position_list
 
     def build_index(self):
         """
         Build indexes for title and description.
         """
         for doc in self.data:
-            doc_id = doc["url"]
-            title_tokens = self.tokenize(doc["title"])
-            description_tokens = self.tokenize(doc["description"])
-
-
-            for token in title_tokens:
-                self.index_title[token].add(doc_id)
+            self._index_doc_text(doc)
 
+    def build_index_text(self):
+        """
+        Build the title/description inverted indexes and their positional
+        indexes in a single tokenization pass.
+        """
+        for doc in self.data:
+            self._index_doc_text(doc, positions=True)
 
-            for token in description_tokens:
-                self.index_description[token].add(doc_id)
+    def _index_doc_review(self, doc):
+        doc_id = self.doc_table.add(doc["url"])
+        reviews = doc.get("product_reviews", [])
+        self.review_stats.add(doc_id, reviews)
+        if len(reviews) != 0:
+            stats = self.review_stats.get(doc_id)
+            self.index_review[doc["url"]] = [stats["review_count"], stats["review_mean"], stats["review_last"]]
 
     def build_index_review(self):
         """
-        Build index for reviews.
+        Build index for reviews: [number of reviews, mean rating, last rating] per
+        document, plus the columnar statistics of `review_stats`.
         """
-
         for doc in self.data:
-            doc_id = doc["url"]
-            reviews = doc["product_reviews"]
-            if len(reviews) != 0:
-                nb_reviews = len(reviews)
-                mrating= 0
-                for review in reviews:
-                    mrating += int(review["rating"])
-                if nb_reviews == 0:
-                    mrating = 0
-                else:
-                    mrating = mrating / nb_reviews
-                ratings =  pd.DataFrame(reviews)
-                ratings = ratings.sort_values(by="date")
-                last_rating = ratings.iloc[-1]
-                self.index_review[doc_id].add(nb_reviews)
-                self.index_review[doc_id].add(mrating)
-                self.index_review[doc_id].add(last_rating["rating"])
+            self._index_doc_review(doc)
+
+    def _index_doc_features(self, doc):
+        doc_id = self.doc_table.add(doc["url"])
+        features = doc.get("product_features", {})
+        for key_feature, feature in features.items():
+            feature_tokens = self.tokenize(feature)
+            for token in feature_tokens:
+                add_posting(self.index_features[key_feature][token], doc_id)
 
     def build_index_features(self):
         """
         Build index for features.
         """
         for doc in self.data:
-            doc_id = doc["url"]
-            features = doc["product_features"]
-            for key_feature, feature in features.items():
-                feature_tokens = self.tokenize(feature)
-                for token in feature_tokens:
-                    self.index_features[key_feature][token].add(doc_id)
+            self._index_doc_features(doc)
 
     def create_sub_indices(self):
         """
@@ -155,66 +303,158 @@ class Index:
             setattr(self, sub_index_name, tokens_dict)
 
     def texte(self, text):
-        ww = Index.load_json("stop_words_english.json")
-        stopwords = []
-        for word in ww:
-            stopwords.append(word)
-        stopwords = stopwords[0] + list(string.punctuation)
-        stopwords = set(stopwords)
-        tokens = text.lower().translate(str.maketrans("", "", string.punctuation))
-        return tokens
+        """
+        Lowercased text without punctuation.
+        """
+        return self.tokenizer.normalize(text)
 
     def build_index_position(self):
         """
-        Build index of position for title and description.
+        Build positional indexes for title and description:
+        token -> {doc_id: [token positions]}, positions being offsets in the
+        token sequence (after stopwords removal), so len() is the term frequency.
         """
         for doc in self.data:
-            doc_id = doc["url"]
-            title = doc["title"]
-            description = doc["description"]
+            self._index_doc_text(doc, postings=False, positions=True)
 
-            title_tokens = self.tokenize(title)
-            description_tokens = self.tokenize(description)
-            title = self.texte(title)
-            description = self.texte(description)
-            title_positions = {}
-            current_position = 0
-            for token in title_tokens:
-                current_position = title.lower().find(token, current_position)
+    def postings(self, field, token):
+        """
+        Sorted array of the doc ids whose field ("title" or "description") contains the token.
+        """
+        return getattr(self, f"index_{field}").get(token, new_postings())
 
-                title_positions[token] = current_position
-                current_position += len(token)
+    def positions(self, field, token, url):
+        """
+        Sorted token positions of a token in a field ("title" or "description") of a document.
+        """
+        doc_id = self.doc_table.get(url)
+        return getattr(self, f"index_position_{field}").get(token, {}).get(doc_id, [])
 
-            for token, position in title_positions.items():
-                self.index_position_title[token].add((doc_id, position))
+    def term_frequency(self, field, token, url):
+        """
+        Number of occurrences of a token in a field of a document.
+        """
+        return len(self.positions(field, token, url))
 
-            description_positions = {}
-            current_position = 0
-            for token in description_tokens:
-                current_position = description.lower().find(token, current_position)
+    def with_urls(self, value):
+        """
+        Recursively replaces doc ids by URLs: postings arrays become lists of URLs
+        and doc-id keys (positional indexes) become URL keys.
+        """
+        if isinstance(value, dict):
+            return {self.doc_table.url(key) if isinstance(key, int) else key: self.with_urls(sub_value)
+                    for key, sub_value in value.items()}
+        if isinstance(value, array):
+            return [self.doc_table.url(doc_id) for doc_id in value]
+        return value
 
-                description_positions[token] = current_position
-                current_position += len(token)
+    def jsonable(self, value):
+        """
+        Converts an index to JSON-compatible values, with URLs instead of doc ids.
+        """
+        value = self.with_urls(value)
+        if isinstance(value, dict):
+            return {key: list(sub_value) if isinstance(sub_value, (set, tuple)) else sub_value
+                    for key, sub_value in value.items()}
+        return value
 
-            # Ajout des positions dans l'index pour la description
-            for token, position in description_positions.items():
-                self.index_position_description[token].add((doc_id, position))
+    def save_segment(self, path="index.seg"):
+        """
+        Save the title, description and feature indexes in a compact binary
+        segment (see segment.py): doc ids instead of repeated URLs, varint
+        delta-encoded postings and positions, sorted term dictionary, and the
+        review statistics and field token lengths as per-document columns.
+        """
+        fields = {}
+        for name in TEXT_FIELDS:
+            positions = getattr(self, f"index_position_{name}")
+            if positions:
+                fields[name] = (True, positions)
+            else:
+                fields[name] = (False, getattr(self, f"index_{name}"))
+        for key_feature, tokens_dict in self.index_features.items():
+            fields[f"feature:{key_feature}"] = (False, tokens_dict)
+        self.review_stats.resize(len(self.doc_table))
+        columns = dict(self.review_stats.columns)
+        for name, lengths in self.field_lengths.items():
+            lengths.extend([0] * (len(self.doc_table) - len(lengths)))
+            columns[f"length_{name}"] = lengths
+        write_segment(path, self.doc_table.urls, fields, columns)
 
-    def save_indexes(self):
+    def save_indexes(self, manifest_path=INDEXES_MANIFEST):
         """
-        Save all of the indexes in a json file named after the name of the index.
+        Save all of the indexes in a json file named after the name of the index,
+        and list the written files in a manifest so readers never scan the directory.
         """
+        written = {}
         for attr_name in dir(self):
             try:
                 if attr_name.startswith("index_"):
                     attr_value = getattr(self, attr_name)
-                    if isinstance(attr_value, defaultdict):
-                        attr_value = {key: list(value) for key, value in attr_value.items()}
-                    elif isinstance(attr_value, dict):
-                        attr_value = {key: list(value) if isinstance(value, set) else value for key, value in
-                                      attr_value.items()}
+                    attr_value = self.jsonable(attr_value)
 
                     with open(attr_name + ".json", "w", encoding="utf-8") as f:
                         json.dump(attr_value, f, indent=4)
+                    written[attr_name] = attr_name + ".json"
             except Exception as e:
                 print(e)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(written, f, indent=4)
+
+
+def _build_shard(docs):
+    """
+    Worker of Index.build_parallel: indexes one shard and returns its partial indexes.
+    """
+    index = Index()
+    index.add_documents(docs)
+    return index.partial()
+
+
+def _pack_field(postings, positions=None):
+    """
+    Packs {term: postings array} (and optionally {term: {doc id: [positions]}})
+    into flat arrays: the terms, the postings count of each term, all the doc ids
+    one term after the other and, when positions are given, the number of
+    positions of each posting followed by all the positions.
+    """
+    terms = list(postings)
+    packed = {"terms": terms, "counts": array("I", (len(postings[term]) for term in terms)),
+              "doc_ids": array("I")}
+    for term in terms:
+        packed["doc_ids"].extend(postings[term])
+    if positions:
+        packed["lengths"] = lengths = array("I")
+        packed["positions"] = flat = array("I")
+        for term in terms:
+            term_positions = positions[term]
+            for doc_id in postings[term]:
+                lengths.append(len(term_positions[doc_id]))
+                flat.extend(term_positions[doc_id])
+    return packed
+
+
+def _merge_field(target, packed, mapping, in_order, position_target=None):
+    """
+    Merges a field packed by `_pack_field` into {term: postings array} (and
+    {term: {doc id: [positions]}}), remapping local doc ids with `mapping`.
+    """
+    doc_ids = [mapping[local_id] for local_id in packed["doc_ids"]]
+    if position_target is not None and "lengths" in packed:
+        flat = packed["positions"].tolist()
+        ends = list(accumulate(packed["lengths"]))
+        positions = [flat[end - length:end] for end, length in zip(ends, packed["lengths"])]
+    else:
+        positions = None
+    start = 0
+    for term, count in zip(packed["terms"], packed["counts"]):
+        ids = doc_ids[start:start + count]
+        destination = target[term]
+        if in_order and (not destination or not ids or destination[-1] < ids[0]):
+            destination.extend(ids)
+        else:
+            for doc_id in ids:
+                add_posting(destination, doc_id)
+        if positions is not None:
+            position_target[term].update(zip(ids, positions[start:start + count]))
+        start += count
@@ -0,0 +1,191 @@
+import struct
+from array import array
+from varint import decode_varint, encode_varint
+
+
+LEXICON_HEADER = struct.Struct("<II")
+BLOCK_SIZE = 16  # terms per front-coded block
+
+
+def successor(prefix):
+    """
+    Smallest string greater than every string starting with `prefix`.
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def encode_lexicon(sorted_terms, block_size=BLOCK_SIZE):
+    """
+    Encodes sorted terms as a front-coded dictionary. Layout: term count, block
+    count, block offsets (u32), blocks. Each block stores its first term in full
+    (varint length + UTF-8) and every other term as the length of the prefix shared
+    with the previous term and the remaining suffix.
+    """
+    blob = bytearray()
+    offsets = array("I")
+    previous = b""
+    count = 0
+    for term in sorted_terms:
+        encoded = term.encode("utf-8")
+        if count % block_size == 0:
+            offsets.append(len(blob))
+            encode_varint(len(encoded), blob)
+            blob += encoded
+        else:
+            shared = 0
+            limit = min(len(previous), len(encoded))
+            while shared < limit and previous[shared] == encoded[shared]:
+                shared += 1
+            encode_varint(shared, blob)
+            encode_varint(len(encoded) - shared, blob)
+            blob += encoded[shared:]
+        previous = encoded
+        count += 1
+    offsets.append(len(blob))
+    return LEXICON_HEADER.pack(count, len(offsets) - 1) + offsets.tobytes() + bytes(blob)
+
+
+class Lexicon:
+    """
+    Read-only front-coded term dictionary over a buffer (bytes or a memoryview of a
+    memory-mapped segment). Block heads are binary-searched, then at most one block
+    is decoded: exact lookup, prefix enumeration (autocomplete) and typo-tolerant
+    lookup never build a Python structure of all the terms.
+    """
+
+    def __init__(self, buf, offset=0, block_size=BLOCK_SIZE):
+        self.buf = buf
+        self.block_size = block_size
+        self.term_count, self.block_count = LEXICON_HEADER.unpack_from(buf, offset)
+        base = offset + LEXICON_HEADER.size
+        self.block_offsets = memoryview(buf)[base:base + 4 * (self.block_count + 1)].cast("I")
+        self.blocks_start = base + 4 * (self.block_count + 1)
+
+    @classmethod
+    def from_terms(cls, sorted_terms, block_size=BLOCK_SIZE):
+        return cls(encode_lexicon(sorted_terms, block_size), 0, block_size)
+
+    def __len__(self):
+        return self.term_count
+
+    def _head(self, block):
+        pos = self.blocks_start + self.block_offsets[block]
+        length, pos = decode_varint(self.buf, pos)
+        return bytes(self.buf[pos:pos + length])
+
+    def _block(self, block):
+        """
+        Decoded UTF-8 terms of a block.
+        """
+        buf = self.buf
+        pos = self.blocks_start + self.block_offsets[block]
+        end = self.blocks_start + self.block_offsets[block + 1]
+        length, pos = decode_varint(buf, pos)
+        term = bytes(buf[pos:pos + length])
+        pos += length
+        terms = [term]
+        while pos < end:
+            shared, pos = decode_varint(buf, pos)
+            length, pos = decode_varint(buf, pos)
+            term = term[:shared] + bytes(buf[pos:pos + length])
+            pos += length
+            terms.append(term)
+        return terms
+
+    def _find_block(self, encoded):
+        """
+        Last block whose first term is <= `encoded` (0 if none).
+        """
+        low, high = 0, self.block_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._head(middle) <= encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return max(low - 1, 0)
+
+    def __contains__(self, term):
+        if not self.term_count:
+            return False
+        encoded = term.encode("utf-8")
+        return encoded in self._block(self._find_block(encoded))
+
+    def __iter__(self):
+        return self.iter_from("")
+
+    def iter_from(self, term):
+        """
+        Yields the terms >= `term`, in sorted order.
+        """
+        if not self.term_count:
+            return
+        encoded = term.encode("utf-8")
+        block = self._find_block(encoded)
+        for candidate in self._block(block):
+            if candidate >= encoded:
+                yield candidate.decode("utf-8")
+        for block in range(block + 1, self.block_count):
+            for candidate in self._block(block):
+                yield candidate.decode("utf-8")
+
+    def prefix(self, prefix, limit=None):
+        """
+        Terms starting with `prefix`, in sorted order (at most `limit`).
+        """
+        terms = []
+        for term in self.iter_from(prefix):
+            if not term.startswith(prefix) or (limit is not None and len(terms) >= limit):
+                break
+            terms.append(term)
+        return terms
+
+    def fuzzy(self, term, max_edits=1, prefix_length=0):
+        """
+        Terms within `max_edits` Levenshtein edits of `term`: [(term, distance)],
+        sorted by distance then term. The Levenshtein automaton of `term` is run over
+        the sorted dictionary as over a trie: states (rows of edit distances) are
+        shared by the prefix common with the previous term, and whole ranges of terms
+        are skipped as soon as a prefix can no longer lead to a match. The first
+        `prefix_length` characters must match exactly.
+        """
+        matches = []
+        required = term[:prefix_length]
+        width = len(term) + 1
+        rows = [list(range(width))]
+        previous = ""
+        terms = self.iter_from(required)
+        candidate = next(terms, None)
+        while candidate is not None:
+            if not candidate.startswith(required):
+                break
+            shared = 0
+            limit = min(len(previous), len(candidate), len(rows) - 1)
+            while shared < limit and previous[shared] == candidate[shared]:
+                shared += 1
+            del rows[shared + 1:]
+            dead = None
+            for depth in range(shared, len(candidate)):
+                char = candidate[depth]
+                above = rows[-1]
+                row = [above[0] + 1]
+                for j in range(1, width):
+                    row.append(min(above[j] + 1, row[j - 1] + 1, above[j - 1] + (term[j - 1] != char)))
+                rows.append(row)
+                if min(row) > max_edits:
+                    dead = depth + 1
+                    break
+            previous = candidate
+            if dead is None:
+                if rows[-1][-1] <= max_edits:
+                    matches.append((candidate, rows[-1][-1]))
+                candidate = next(terms, None)
+            else:
+                # no term starting with this prefix can match: jump past all of them
+                terms = self.iter_from(successor(candidate[:dead]))
+                candidate = next(terms, None)
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
+    def release(self):
+        self.block_offsets.release()
@@ -1,34 +1,48 @@
-import json
-from crawler import WebCrawler
-from index import Index
-from navweb import NavWeb, Ranking
-mode = "nav"
+# Imports faits dans chaque mode : une requête ne charge ni le crawler (requests,
+# BeautifulSoup) ni le serveur, le démarrage reste court (benchmarks/bench_startup.py).
+mode = "nav"  # "WebCrawler", "Index", "nav" (une requête) ou "serve" (serveur de requêtes)
+# Index écrit par le mode Index et lu par les modes nav et serve :
+# "index" : index incrémental (dossier de segments), ne réindexe que les produits nouveaux ou modifiés ;
+# "index.seg" : reconstruction complète dans un seul segment (et les index JSON)
+index_path = "index"
 def main():
     if mode == "WebCrawler":
+        from crawler import WebCrawler
+        from sink import JsonlSink
         base_url = "https://web-scraping.dev/products"
         max_depth = 20
+        state_path = "crawl_state.db"  # Etat du crawl sur disque (file, URL visitées, pages)
+        resume = False  # True pour reprendre un crawl interrompu
 
-        crawler = WebCrawler(base_url, max_depth)
-        crawler.crawl()
+        # Chaque page est écrite au fil du crawl dans crawl/results-00000.jsonl, crawl/results-00001.jsonl...
+        with JsonlSink("crawl/results") as sink:
+            crawler = WebCrawler(base_url, max_depth, state_path=state_path, resume=resume, sink=sink)
+            crawler.crawl()
 
-        with open("results.json", "w", encoding="utf-8") as json_file:
-            json.dump(crawler.results, json_file, indent=4, ensure_ascii=False)
-
-        print("Résultats sauvegardés dans 'results.json'")
+        print("Résultats sauvegardés dans 'crawl/results-*.jsonl'")
 
+    elif mode == "Index" and not index_path.endswith(".seg"):
+        from index import Index
+        from incremental import IndexWriter
+        # Segments dans index/ : produits nouveaux/modifiés dans un nouveau segment, supprimés marqués
+        writer = IndexWriter(index_path)
+        print(writer.update(Index.iter_jsonl("products.jsonl"), full_snapshot=True))
+        writer.merge_in_background().join()
     elif mode == "Index":
-        data = Index.load_jsonl("products.jsonl")
-        index = Index(data)
-        index.build_index()
-        index.build_index_features()
-        index.build_index_position()
-        index.build_index_review()
+        from index import Index
+        # Lecture en flux : "crawl/results-*.jsonl" permet aussi d'indexer un crawl en cours.
+        # Les documents sont répartis sur un pool de processus (un par coeur).
+        index = Index.build_parallel(Index.iter_jsonl("products.jsonl"))
         index.create_sub_indices()
         index.save_indexes()
+        index.save_segment(index_path)
+    elif mode == "serve":
+        from server import serve
+        # Index chargés une fois, requêtes servies en mémoire : GET http://127.0.0.1:8080/search?q=...
+        serve("127.0.0.1", 8080, index_path)
     elif mode == "nav":
-        nav = NavWeb()
-        nav.load_jsons()
-        rank = Ranking()
+        from navweb import Ranking
+        rank = Ranking(index_path=index_path)
         res = rank.requete_title_region("Leather Sneakers versatile for any occasion", "italy", "Leather")
         print(res)
 
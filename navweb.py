@@ -1,20 +1,54 @@
+import contextlib
+import functools
+import heapq
 import json
 import os
-import string
-import nltk
-from charset_normalizer.cli import query_yes_no
-from nltk.corpus import stopwords
-import math
-import pandas as pd
+import threading
+import warnings
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from tokenizer import get_tokenizer
+from synonyms import get_synonyms
+from query import Clause, ParsedQuery, filter_docs, parse_query
+from bitmap import RoaringBitmap
+from facets import FacetIndex
+from segment import Segment, SegmentSet, FieldView, read_manifest
+from postings import contains, gallop, intersect, intersect_many, union_many
+from reviews import MAX_RATING
+from bm25 import FieldStats, bm25f_postings
+from topk import LINEAR_WEIGHTS, LazyTermCursor, TermCursor, wand_top_k
+
+SEGMENT_PATH = "index.seg"
+INDEX_DIR = "index"  # Index incrémental (IndexWriter) : segments + segments.json
+INDEXES_MANIFEST = "indexes.json"  # Index JSON écrits par Index.save_indexes : {nom: fichier}
 
 
-nltk.download('stopwords')
-STOPWORDS = set(stopwords.words('english'))
-
 class NavWeb:
 
-    def __init__(self):
-        self.load_jsons()
+    def __init__(self, index_path=None, segment=None):
+        """
+        :param index_path: Index à ouvrir : dossier d'un index incrémental (INDEX_DIR)
+                           ou segment d'une reconstruction complète (SEGMENT_PATH) ;
+                           None : voir `default_index_path`
+        :param segment: SegmentSet déjà ouvert de `index_path` (rechargement)
+        """
+        self.segment = None
+        self.index_path = index_path
+        self.json_paths = {}  # index JSON déclarés dans le manifeste, chargés au premier accès
+        self.load_jsons(segment)
+
+    def __getattr__(self, name):
+        """
+        Charge un index JSON du manifeste à son premier accès (`self.index_<nom>`).
+        """
+        paths = self.__dict__.get("json_paths", {})
+        if name not in paths:
+            raise AttributeError(name)
+        with open(paths[name], "r", encoding="utf-8") as f:
+            value = json.load(f)
+        setattr(self, name, value)
+        return value
 
     def __str__(self):
         """
@@ -34,88 +68,351 @@ class NavWeb:
         Loads JSON line from a path
         """
         docs = []
-        with open("stop_words_english.json", "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             for line in f:
                 docs.append(json.loads(line))
         return docs
 
 
-    def load_jsons(self):
-        for el in os.listdir():
-            if el.endswith("_index.json"):
-                doc = json.load(open(el))
-                sub_index_name = f"index_{el[:-11]}"
-                setattr(self, sub_index_name, doc)
+    def load_jsons(self, segment=None):
+        """
+        Déclare les index JSON listés dans le manifeste (aucun fichier n'est lu ici)
+        et ouvre les segments binaires (ou expose `segment` s'il est donné), dont les
+        champs priment sur les index JSON.
+        """
+        if os.path.exists(INDEXES_MANIFEST):
+            with open(INDEXES_MANIFEST, "r", encoding="utf-8") as f:
+                self.json_paths = json.load(f)
+        if self.index_path is None:
+            self.index_path = self.default_index_path()
+        if segment is not None:
+            self.load_segment(segment)
+        elif os.path.exists(os.path.join(self.index_path, SegmentSet.MANIFEST)):
+            self.load_segment(SegmentSet.open_directory(self.index_path))
+        elif os.path.isfile(self.index_path):
+            self.load_segment(SegmentSet([Segment(self.index_path)]))
+
+    @staticmethod
+    def default_index_path():
+        """
+        Index ouvert sans `index_path` : l'index incrémental INDEX_DIR s'il existe,
+        sinon SEGMENT_PATH. Si les deux existent, le choix est signalé, car un
+        index.seg reconstruit après coup serait sinon ignoré sans prévenir.
+        """
+        has_directory = os.path.exists(os.path.join(INDEX_DIR, SegmentSet.MANIFEST))
+        if has_directory and os.path.exists(SEGMENT_PATH):
+            warnings.warn(f"{INDEX_DIR}/ et {SEGMENT_PATH} existent : {INDEX_DIR}/ est utilisé "
+                          f"(index_path={SEGMENT_PATH!r} pour lire {SEGMENT_PATH}).", stacklevel=2)
+        return INDEX_DIR if has_directory else SEGMENT_PATH
+
+    def load_segment(self, segment, close_previous=True):
+        """
+        Expose les champs des segments binaires (ouverts en mmap) comme index :
+        les postings ne sont décodés qu'à la première consultation d'un terme.
+        """
+        if self.segment is not None and close_previous:
+            self.segment.close()
+        self.segment = segment
+        for field in self.segment.field_names():
+            name = field[len("feature:"):] if field.startswith("feature:") else field
+            setattr(self, f"index_{name}", FieldView(self.segment, field))
 
     def synonymes(self):
-        syn = NavWeb.load_json("original_synonymes.json")
-        return syn
+        """
+        Table de synonymes du processus (chargée et validée une seule fois).
+        """
+        return get_synonyms()
 
 
     def tokenize(self, text):
         """
         Simple tokenization with stopwords removal.
         """
-
-        stopwords = STOPWORDS
-        tokens = text.lower().translate(str.maketrans("", "", string.punctuation)).split()
-        return [token for token in tokens if token not in stopwords]
+        return get_tokenizer().tokenize(text)
 
 
 class Requete:
 
-    def __init__(self, requete):
+    def __init__(self, requete, synonyms=None):
         self.requete = requete
+        self.synonyms = synonyms if synonyms is not None else get_synonyms()
 
     def tokenise_requete(self):
         """
-                Simple tokenization with stopwords removal.
-                """
-        stopwords = STOPWORDS
-        tokens = self.requete.lower().translate(str.maketrans("", "", string.punctuation)).split()
-        return [token for token in tokens if token not in stopwords]
+        Tokenisation de la requête, avec le même tokenizer que l'indexation.
+        """
+        return get_tokenizer().tokenize(self.requete)
 
     def requete_synonymes(self):
         """
-        Étendre les termes de la requête avec leurs synonymes.
+        Étendre les termes de la requête avec leurs synonymes (sans lecture de fichier).
         """
-        syn_map = NavWeb.load_json("original_synonymes.json")
+        return [term for term, _ in self.requete_ponderee()]
 
-        tokens = self.tokenise_requete()
+    def analyse(self):
+        """
+        Analyse la requête dans le langage de requête (query.py) : phrases entre
+        guillemets, NEAR/n, +terme obligatoire, -terme exclu.
+        """
+        return parse_query(self.requete, get_tokenizer())
 
-        extended_query = []
-        for token in tokens:
-            extended_query.append(token)
-            if token in syn_map:
-                extended_query.extend(syn_map[token])
+    def requete_ponderee(self):
+        """
+        Termes à scorer, pondérés : [(terme, poids)], poids 1 pour les termes saisis
+        (hors termes exclus) et poids réduit pour les synonymes (expressions de
+        plusieurs mots comprises).
+        """
+        return self.synonyms.expand(list(self.analyse().tokens))
 
-        return extended_query
+    def groupes_obligatoires(self):
+        """
+        Un groupe par terme de la requête : le terme et ses synonymes, dont au moins
+        un doit être présent dans le document.
+        """
+        return [(token,) + self.synonyms.expansions.get((token,), ()) for token in self.tokenise_requete()]
+
+    @staticmethod
+    def docs_with_all_groups(groups, index):
+        """
+        Doc ids contenant au moins un terme de chaque groupe.
+        """
+        return intersect_many([union_many([index.doc_ids(term) for term in group]) for group in groups])
 
 
     def all_token_no_st_w(self, doc_id, token_req, index):
+        """
+        Vérifie que le document (doc id entier) contient tous les tokens,
+        par recherche dichotomique dans les postings triés.
+        """
         for token in token_req:
-            if doc_id not in index[token]:
+            if not contains(index.doc_ids(token), doc_id):
                 return False
         return True
 
     def at_least_one_token(self, doc_id, token_req, index):
+        """
+        Vérifie que le document (doc id entier) contient au moins un des tokens.
+        """
         for token in token_req:
-            if doc_id not in index[token]:
+            if contains(index.doc_ids(token), doc_id):
                 return True
         return False
 
+    def docs_with_all_tokens(self, token_req, index):
+        """
+        Doc ids contenant tous les tokens : intersection des postings, du plus court au plus long.
+        """
+        return intersect_many([index.doc_ids(token) for token in token_req])
+
+    def docs_with_any_token(self, token_req, index):
+        """
+        Doc ids contenant au moins un des tokens : union des postings.
+        """
+        return union_many([index.doc_ids(token) for token in token_req])
+
+
+def term_weights(tokens):
+    """
+    Poids de chaque terme d'une requête : les tokens sont des termes (poids 1) ou des
+    paires (terme, poids) ; un terme répété cumule ses poids.
+    """
+    weights = Counter()
+    for token in tokens:
+        term, weight = token if isinstance(token, tuple) else (token, 1)
+        weights[term] += weight
+    return weights
+
+
+# Requête compilée par Ranking.plan : termes pondérés ((terme, poids), ...), champs
+# pondérés ((nom, poids), ...), modèle de score ("linear" ou "bm25"), k, filtres de
+# facettes ((caractéristique, valeurs), ...), groupes de mots obligatoires (terme et
+# synonymes), clauses obligatoires / exclues du langage de requête (query.Clause) et
+# caractéristiques dont compter les valeurs. Immuable et hachable : partagée entre threads et clé du cache.
+QueryPlan = namedtuple("QueryPlan", ["tokens", "fields", "scoring", "k", "facets", "must_have", "required", "excluded",
+                                     "facet_counts"])
+
+TITLE = (("title", 1),)
+DESCRIPTION = (("description", 1),)
+TITLE_DESCRIPTION = (("title", 2), ("description", 0.5))
+
+
+class IndexState:
+    """
+    Structures de requête d'une génération de l'index : NavWeb et ses segments,
+    facettes, synonymes réduits au dictionnaire, notes des avis, statistiques BM25 et
+    table des documents (ces deux dernières construites au premier besoin). Préparée
+    entièrement avant d'être publiée, elle compte les requêtes qui la lisent et
+    ferme ses segments quand elle a été remplacée et que la dernière est terminée.
+    """
+
+    def __init__(self, navweb):
+        segment = navweb.segment
+        self.navweb = navweb
+        self.segment = segment
+        # nombre de documents lu dans le segment ; la table des documents n'est construite
+        # qu'au premier besoin (Ranking.all_docs), les résultats lisent l'URL dans le segment
+        self.doc_count = segment.live_count
+        self.all_docs = None
+        self.index_title = navweb.index_title
+        self.index_description = navweb.index_description
+        self.field_views = {"title": self.index_title, "description": self.index_description}
+        self.field_stats = {}
+        self.field_stats_lock = threading.Lock()
+        self.facets = FacetIndex(segment)
+        # synonymes réduits aux termes présents dans le dictionnaire du titre ou de la description
+        fields = [segment.field(name) for name in self.field_views if segment.has_field(name)]
+        self.synonyms = get_synonyms().compile(lambda term: any(field.has_term(term) for field in fields))
+        # note moyenne des avis par doc id (colonne du segment, 0 sans avis)
+        self.review_means = segment.column("review_mean") if segment.has_column("review_mean") else None
+        self.in_flight = 0
+        self.retired = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Compte une requête de plus ; False si la génération a déjà été remplacée.
+        """
+        with self._lock:
+            if self.retired:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            closing = self.retired and not self.in_flight
+        if closing:
+            self.close()
+
+    def retire(self):
+        """
+        Marque la génération comme remplacée : elle est fermée tout de suite si aucune
+        requête ne la lit, sinon à la fin de la dernière.
+        """
+        with self._lock:
+            self.retired = True
+            closing = not self.in_flight
+        if closing:
+            self.close()
+
+    def close(self):
+        # les colonnes lues gardent le mmap ouvert : elles sont libérées d'abord
+        self.review_means = None
+        self.segment.close()
+
+
+def pinned_state(method):
+    """
+    Exécute une méthode de Ranking sur une seule génération de l'index (Ranking.pinned).
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.pinned():
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class Ranking:
 
-    def __init__(self, k1=1.5, b=0.75):
+    # poids du score linéaire : position dans le champ, avis, fréquence des termes
+    ALPHA, BETA, GAMMA = LINEAR_WEIGHTS
+    # termes inconnus : corrections et complétions (préfixe) retenues par terme
+    MAX_EXPANSIONS = 5
+    MIN_PREFIX_LENGTH = 3
+
+    def __init__(self, k1=1.5, b=0.75, region_feature="made in", cache=None, index_path=None):
         self.k1 = k1
         self.b = b
-        self.navweb = NavWeb()
-        self.index_title = self.navweb.index_title
-        self.index_description = self.navweb.index_description
-        self.avg_doc_length = 0
-        self.docs = Ranking.load_json("rearranged_products.jsonl")
-        self.doc_lengths = {doc["url"] :len(doc) for doc in self.docs}
+        self.region_feature = region_feature
+        self.cache = cache  # ResultCache optionnel (cache.py), vidé à chaque nouvelle génération d'index
+        navweb = NavWeb(index_path)  # index_path : INDEX_DIR, SEGMENT_PATH ou None (NavWeb.default_index_path)
+        if navweb.segment is None:
+            raise FileNotFoundError(f"Index {navweb.index_path} introuvable : construisez l'index "
+                                    f"(mode 'Index' de main.py).")
+        # génération servie, remplacée d'un bloc par `reload` ; une requête lit celle
+        # qu'elle a fixée en commençant (`pinned`)
+        self.state = IndexState(navweb)
+        self._local = threading.local()
+        self._reload_lock = threading.Lock()
+
+    @property
+    def current(self):
+        """
+        Génération lue par le thread : celle fixée par la requête en cours, sinon la dernière publiée.
+        """
+        return getattr(self._local, "state", None) or self.state
+
+    @contextlib.contextmanager
+    def pinned(self):
+        """
+        Fixe pour le thread, le temps d'une requête, la génération publiée : toutes
+        les lectures de la requête voient le même index, et cette génération n'est pas
+        fermée avant la fin de la requête même si une autre est publiée entre-temps.
+        """
+        state = getattr(self._local, "state", None)
+        if state is not None:  # appel imbriqué (search -> execute)
+            yield state
+            return
+        state = self.state
+        while not state.acquire():  # remplacée entre la lecture et l'acquisition
+            state = self.state
+        self._local.state = state
+        try:
+            yield state
+        finally:
+            self._local.state = None
+            state.release()
+
+    # structures de requête de la génération lue par le thread (voir IndexState)
+    navweb = property(lambda self: self.current.navweb)
+    doc_count = property(lambda self: self.current.doc_count)
+    index_title = property(lambda self: self.current.index_title)
+    index_description = property(lambda self: self.current.index_description)
+    field_views = property(lambda self: self.current.field_views)
+    facets = property(lambda self: self.current.facets)
+    synonyms = property(lambda self: self.current.synonyms)
+    review_means = property(lambda self: self.current.review_means)
+
+    @property
+    def all_docs(self):
+        """
+        all_docs[i] est le document de doc id i (documents supprimés exclus), construit
+        au premier accès : une requête top-k n'en a pas besoin.
+        """
+        state = self.current
+        if state.all_docs is None:
+            state.all_docs = {doc_id: {"id": doc_id, "url": url} for doc_id, url in state.segment.live_docs()}
+        return state.all_docs
+
+    @property
+    def docs(self):
+        return list(self.all_docs.values())
+
+    def reload(self):
+        """
+        Recharge l'index incrémental ouvert si une nouvelle génération a été publiée
+        (IndexWriter). La nouvelle génération est préparée à part puis publiée par une
+        seule affectation : les requêtes en cours finissent sur l'ancienne, fermée
+        quand la dernière se termine.
+        :return: True si l'index a été rechargé
+        """
+        with self._reload_lock:
+            previous = self.state
+            directory = previous.navweb.index_path
+            if not os.path.exists(os.path.join(directory, SegmentSet.MANIFEST)):
+                return False
+            if read_manifest(directory)["generation"] == previous.segment.generation:
+                return False
+            self.state = IndexState(NavWeb(directory, SegmentSet.open_directory(directory)))
+            previous.retire()
+            return True
+
+    def close(self):
+        """
+        Ferme la génération servie (après la fin des requêtes en cours).
+        """
+        self.state.retire()
 
     @staticmethod
     def load_json(path):
@@ -128,36 +425,88 @@ class Ranking:
                 docs.append(json.loads(line))
         return docs
 
-    def index_to_work(self, md):
-        if md == "title":
-            self.index = self.index_title
-        else:
-            self.index = self.index_description
-
-    def set_index_and_docs(self, index, doc_lengths):
+    def field_stats(self, name):
         """
-        Configure l'index inversé et les longueurs des documents.
+        Statistiques BM25 du champ (IDF, longueur moyenne, normes par doc id),
+        calculées une seule fois par chargement de l'index.
         """
-        self.doc_lengths = doc_lengths
-        self.avg_doc_length = sum(doc_lengths.values()) / len(doc_lengths)
-        print(self.avg_doc_length)
+        state = self.current
+        with state.field_stats_lock:
+            if name not in state.field_stats:
+                state.field_stats[name] = FieldStats(state.segment, name, self.b)
+            return state.field_stats[name]
 
-    def bm25(self, query, doc_id):
+    def bm25(self, query, doc_id, field_weights=(("title", 1),)):
         """
-        Calcule le score BM25 pour un document donné par rapport à une requête.
+        Score BM25F d'un document (doc id entier) pour les tokens d'une requête :
+        les fréquences des termes (stockées à l'indexation) sont normalisées par la
+        longueur de chaque champ, pondérées puis additionnées avant saturation.
         """
         score = 0
-        for term in query:
-            if term in self.index:
-                f = sum(len(n) for n in self.index[term])# Fréquence du terme
-                N = len(self.doc_lengths)  # Nombre total de documents
-                df = len(self.index[term])  # Nombre de docs contenant le terme
-                idf = math.log((N - df + 0.5) / (df + 0.5) + 1)
-                numerator = f * (self.k1 + 1)
-                denominator = f + self.k1 * (1 - self.b + self.b * (self.doc_lengths[doc_id] / self.avg_doc_length))
-                score += idf * numerator / denominator
+        for term, count in term_weights(query).items():
+            pseudo_tf = 0.0
+            idf = None
+            for name, weight in field_weights:
+                stats = self.field_stats(name)
+                if term not in stats.idf:
+                    continue
+                doc_ids, tfs, _ = self.navweb.segment.field(name).lookup(term, with_positions=False)
+                i = bisect_left(doc_ids, doc_id)
+                if i < len(doc_ids) and doc_ids[i] == doc_id:
+                    pseudo_tf += weight * tfs[i] / stats.norms[doc_id]
+                idf = stats.idf[term] if idf is None else min(idf, stats.idf[term])
+            if pseudo_tf:
+                score += count * idf * pseudo_tf * (self.k1 + 1) / (pseudo_tf + self.k1)
         return score
 
+    def bm25_cursors(self, query_tokens, field_weights, candidates=None):
+        """
+        Un curseur WAND par terme de la requête, portant son score BM25F dans chaque
+        document où il apparaît (titre et description en une seule passe).
+        """
+        cursors = []
+        for term, count in term_weights(query_tokens).items():
+            field_postings = []
+            for name, weight in field_weights:
+                decoded = self.navweb.segment.field(name).lookup(term, with_positions=False)
+                if decoded is not None:
+                    field_postings.append((self.field_stats(name), weight, decoded[0], decoded[1]))
+            if not field_postings:
+                continue
+            doc_ids, scores = bm25f_postings(term, field_postings, self.k1)
+            kept_ids = array("I")
+            kept_scores = array("d")
+            for i in self.kept_postings(doc_ids, candidates):
+                kept_ids.append(doc_ids[i])
+                kept_scores.append(count * scores[i])
+            cursors.append(TermCursor(kept_ids, kept_scores))
+        return cursors
+
+    @pinned_state
+    def bm25_top_k(self, query_tokens, field_weights=TITLE_DESCRIPTION, k=5, candidates=None):
+        """
+        Les k meilleurs documents au sens de BM25F (WAND).
+        :return: liste de {"url", "score"}, du meilleur au moins bon
+        """
+        results = wand_top_k(self.bm25_cursors(query_tokens, field_weights, candidates), k)
+        url = self.navweb.segment.url
+        return [{"url": url(doc_id), "score": score} for doc_id, score in results]
+
+    @staticmethod
+    def kept_postings(doc_ids, candidates):
+        """
+        Indices des postings dont le doc id est dans `candidates` (tous si None).
+        """
+        if candidates is None:
+            yield from range(len(doc_ids))
+            return
+        j = 0
+        for i, doc_id in enumerate(doc_ids):
+            j = gallop(candidates, doc_id, j)
+            if j == len(candidates):
+                return
+            if candidates[j] == doc_id:
+                yield i
 
     def exact_match(self, query, doc_id, index):
         """
@@ -168,254 +517,394 @@ class Ranking:
         return query.all_token_no_st_w(doc_id, query_tokens, index)
 
 
+    def review_score(self, doc):
+        """
+        Note moyenne des avis du document, lue dans les colonnes du segment.
+        """
+        if self.review_means is None:
+            return 0
+        return self.review_means[doc["id"]]
+
     def linear_score(self, query, doc, title_score, review_score, frequency_score):
         """
         Combine différents signaux de pertinence en un score linéaire.
         """
-        alpha = 0.4  # Poids pour les termes dans le titre
-        beta = 0.3  # Poids pour les avis
-        gamma = 0.3  # Poids pour la fréquence des termes
-
-        return alpha * title_score + beta * review_score + gamma * frequency_score
+        return self.ALPHA * title_score + self.BETA * review_score + self.GAMMA * frequency_score
 
     def position_score(self, query, doc_id, index):
         """
         Calcule un score de position basé sur la proximité au début du document.
         """
         position_score = 0
-        for term in query:
+        for term, weight in term_weights(query).items():
             if term in index and doc_id in index[term]:
-                position_score += 1 / (
+                position_score += weight / (
                             index[term][doc_id][0] + 1)  # Plus c'est proche du début, meilleur est le score
         return position_score
 
     def freq_score(self, query, doc_id, index):
-        position_score = 0
         freq = 0
-        for term in query:
+        for term, weight in term_weights(query).items():
             if term in index and doc_id in index[term]:
-                freq += len(index[term][doc_id])
+                freq += weight * len(index[term][doc_id])
         return freq
 
-    def requete_title(self, requete):
-        """
-        Génère un classement des documents en fonction d'une requête donnée.
-        """
-        self.index_to_work("title")
-        query = Requete(requete)
-        query_tokens = query.requete_synonymes()
-
-        position_score = {}
-        self.set_index_and_docs(index=self.index_title, doc_lengths=self.doc_lengths)
-        for doc in self.docs:
-            title_score = self.position_score(query_tokens, doc["url"], self.index_title)
-            review_score = self.navweb.index_reviews[doc["url"]]["mean_mark"]
-            frequency_score = self.freq_score(query_tokens, doc["url"], self.index_title)
-            score = self.linear_score(query_tokens, doc, title_score, review_score, frequency_score)
-            position_score[doc["url"]] = score
-
-        position_score_df = pd.DataFrame(list(position_score.items()), columns=["url", "score"])
-        position_score_df = position_score_df.sort_values(by="score", ascending=False)
-
-        filtered_results = position_score_df
-        total_elements = len(self.docs)
+    def term_cursors(self, query_tokens, field_weights, candidates=None):
+        """
+        Un curseur WAND par (champ, terme) : pour chaque document du posting, la
+        contribution du terme au score linéaire (position du premier mot et
+        fréquence), multipliée par le poids du champ. Un terme répété dans la
+        requête compte autant de fois qu'il apparaît, comme dans le parcours complet.
+        Les postings sont décodés au fil de l'avancée du curseur (sans les positions
+        au-delà de la première) et les bornes viennent des bornes par terme du
+        segment : contribution maximale, et borne du signal d'avis des documents du
+        terme tirée du maximum de (contribution + avis) et de la note moyenne maximale.
+        """
+        total_weight = sum(weight for _, weight in field_weights)
+        doc_upper_bound = self.BETA * total_weight * MAX_RATING if self.review_means is not None else 0.0
+        stored_weights = (self.ALPHA, self.BETA, self.GAMMA) == LINEAR_WEIGHTS
+        cursors = []
+        for name, weight in field_weights:
+            field = self.navweb.segment.field(name)
+            for term, count in term_weights(query_tokens).items():
+                found = field.cursor(term)
+                if found is None:
+                    continue
+                postings, (max_tf, first_position, score_bounds) = found
+                factor = count * weight
+
+                def score(posting, factor=factor):
+                    return factor * (self.ALPHA / (posting.first_position + 1) + self.GAMMA * posting.tf)
+
+                max_contribution = self.ALPHA / (first_position + 1) + self.GAMMA * max_tf
+                doc_bound = None
+                if score_bounds is not None and stored_weights:
+                    # count * contribution + avis <= (count - 1) * max_contribution + max_score,
+                    # l'avis des autres champs étant borné par la note maximale du terme
+                    max_score, max_review = score_bounds
+                    doc_bound = min(doc_upper_bound, weight * (max_score - max_contribution)
+                                    + self.BETA * (total_weight - weight) * max_review)
+                cursors.append(LazyTermCursor(postings, score, factor * max_contribution, candidates, doc_bound))
+        return cursors
+
+    @pinned_state
+    def top_k(self, query_tokens, field_weights, k=5, candidates=None):
+        """
+        Les k meilleurs documents (WAND) parmi ceux contenant au moins un terme de la
+        requête, sans parcourir tout le corpus.
+        :param field_weights: liste de (nom du champ positionnel, poids du champ)
+        :param candidates: doc ids triés autorisés (filtres région / mots obligatoires)
+        :return: liste de {"url", "score"}, du meilleur au moins bon
+        """
+        cursors = self.term_cursors(query_tokens, field_weights, candidates)
+        review_weight = self.BETA * sum(weight for _, weight in field_weights)
+        if self.review_means is None:
+            doc_score, doc_upper_bound = None, 0.0
+        else:
+            def doc_score(doc_id):
+                return review_weight * self.review_means[doc_id]
+            doc_upper_bound = review_weight * MAX_RATING
+        results = wand_top_k(cursors, k, doc_score, doc_upper_bound)
+        url = self.navweb.segment.url
+        return [{"url": url(doc_id), "score": score} for doc_id, score in results]
+
+    @pinned_state
+    def exhaustive_top_k(self, query_tokens, field_weights, k=5, candidates=None):
+        """
+        Référence exhaustive de `top_k`, même score et même ordre : les postings de
+        chaque terme sont décodés une seule fois et leurs contributions accumulées
+        dans un tableau de scores indexé par doc id, puis les k meilleurs documents
+        sont extraits (sert de point de comparaison à WAND).
+        """
+        scores = array("d", bytes(8 * self.navweb.segment.doc_count))
+        matched = set()
+        for name, weight in field_weights:
+            field = self.navweb.segment.field(name)
+            for term, count in term_weights(query_tokens).items():
+                decoded = field.lookup(term)
+                if decoded is None:
+                    continue
+                doc_ids, tfs, positions = decoded
+                factor = count * weight
+                for i in self.kept_postings(doc_ids, candidates):
+                    doc_id = doc_ids[i]
+                    scores[doc_id] += factor * (self.ALPHA / (positions[i][0] + 1) + self.GAMMA * tfs[i])
+                    matched.add(doc_id)
+        review_weight = self.BETA * sum(weight for _, weight in field_weights)
+        if self.review_means is not None:
+            for doc_id in matched:
+                scores[doc_id] += review_weight * self.review_means[doc_id]
+        best = heapq.nlargest(k, ((scores[doc_id], -doc_id) for doc_id in matched))
+        url = self.navweb.segment.url
+        return [{"url": url(-neg_doc), "score": score} for score, neg_doc in best]
+
+    @pinned_state
+    def full_scan(self, query_tokens, field_weights, docs):
+        """
+        Parcours complet de référence : score linéaire de chaque document de `docs`,
+        trié par score décroissant (sert de point de comparaison à `top_k`).
+        """
+        scores = []
+        for doc in docs:
+            score = 0
+            for name, weight in field_weights:
+                index = self.field_views[name]
+                field_score = self.position_score(query_tokens, doc["url"], index)
+                frequency_score = self.freq_score(query_tokens, doc["url"], index)
+                score += weight * self.linear_score(query_tokens, doc, field_score, self.review_score(doc), frequency_score)
+            scores.append({"url": doc["url"], "score": score})
+        scores.sort(key=lambda result: result["score"], reverse=True)
+        return scores
 
+    @staticmethod
+    def max_edits(token):
+        """
+        Fautes de frappe tolérées selon la longueur du terme : aucune jusqu'à 2
+        caractères, 1 édition jusqu'à 5, 2 au-delà.
+        """
+        return 0 if len(token) < 3 else 1 if len(token) < 6 else 2
+
+    def expand_unknown(self, token, field_names):
+        """
+        Remplace un terme absent des champs de la requête : termes les plus proches
+        (distance de Levenshtein bornée, première lettre identique), puis termes qui
+        le complètent (« choc » -> « chocolate »). Un terme connu est gardé tel quel.
+        """
+        readers = [self.navweb.segment.field(name) for name in field_names
+                   if self.navweb.segment.has_field(name)]
+        if not readers or any(reader.has_term(token) for reader in readers):
+            return [token]
+        expansions = []
+        max_edits = self.max_edits(token)
+        if max_edits:
+            matches = sorted(match for reader in readers for match in reader.fuzzy(token, max_edits, prefix_length=1))
+            best = min((distance for _, distance in matches), default=None)
+            expansions = [term for term, distance in matches if distance == best]
+        if len(token) >= self.MIN_PREFIX_LENGTH:
+            completions = {term for reader in readers for term in reader.prefix(token, limit=64)}
+            expansions += sorted(completions - set(expansions), key=lambda term: (len(term), term))
+        return list(dict.fromkeys(expansions))[:self.MAX_EXPANSIONS] or [token]
+
+    def correct_clause(self, clause, field_names):
+        """
+        Applique `expand_unknown` à une clause obligatoire ou exclue, comme aux termes
+        scorés : un terme seul devient l'alternative de ses corrections (clause "any"),
+        une phrase ou un NEAR garde la meilleure correction de chacun de ses termes.
+        """
+        if clause.kind == "term" and len(clause.tokens) == 1:
+            expansions = self.expand_unknown(clause.tokens[0], field_names)
+            return clause if expansions == [clause.tokens[0]] else Clause("any", tuple(expansions), 0)
+        return clause._replace(tokens=tuple(self.expand_unknown(token, field_names)[0] for token in clause.tokens))
+
+    @pinned_state
+    def complete(self, prefix, fields=TITLE, limit=10):
+        """
+        Autocomplétion : termes des champs commençant par le dernier mot de `prefix`
+        (les plus courts d'abord).
+        """
+        tokens = get_tokenizer().tokenize(prefix)
+        if not tokens:
+            return []
+        terms = {term for name, _ in fields if self.navweb.segment.has_field(name)
+                 for term in self.navweb.segment.field(name).prefix(tokens[-1], limit=64)}
+        return sorted(terms, key=lambda term: (len(term), term))[:limit]
+
+    @pinned_state
+    def plan(self, requete, fields=TITLE, region=None, must_have_terms=None, k=5, scoring="linear",
+             facets=None, facet_counts=(), fuzzy=True):
+        """
+        Compile une requête en QueryPlan normalisé : tokens (avec synonymes), champs
+        pondérés, filtres de facettes (la région est un filtre sur `region_feature`),
+        tokens des mots obligatoires (cherchés dans le premier champ), clauses du
+        langage de requête (phrases, NEAR/n, +/-) et facettes à compter. Deux requêtes
+        équivalentes donnent le même plan, qui sert de clé au cache de résultats.
+        Rien n'est modifié sur `self`.
+        :param facets: {caractéristique: [valeurs]} : une des valeurs de chaque caractéristique
+        :param facet_counts: caractéristiques dont compter les valeurs dans les résultats
+        :param fuzzy: remplacer les termes inconnus par leurs corrections / complétions
+        """
+        query = Requete(requete, self.synonyms)
+        parsed = query.analyse()
+        tokens = list(parsed.tokens)
+        required, excluded = parsed.required, parsed.excluded
+        if fuzzy:
+            field_names = [name for name, _ in fields]
+            tokens = [term for token in tokens for term in self.expand_unknown(token, field_names)]
+            required = tuple(self.correct_clause(clause, field_names) for clause in required)
+            excluded = tuple(self.correct_clause(clause, field_names) for clause in excluded)
+        query_tokens = tuple(self.synonyms.expand(tokens))
+        must_have = tuple(Requete(must_have_terms, self.synonyms).groupes_obligatoires()) if must_have_terms else ()
+        facet_filters = [(key, values) for key, values in (facets or {}).items()]
+        if region:
+            facet_filters.append((self.region_feature, [region]))
+        facet_filters = tuple(sorted((key, tuple(sorted({value.lower() for value in values})))
+                                     for key, values in facet_filters))
+        return QueryPlan(query_tokens, tuple(fields), scoring, k, facet_filters, must_have,
+                         required, excluded, tuple(facet_counts))
+
+    def candidates(self, plan):
+        """
+        Doc ids triés autorisés par les filtres du plan, ou None sans filtre.
+        """
+        candidates = None
+        if plan.facets:
+            candidates = self.facets.select(plan.facets).to_array()
+        if plan.must_have:
+            index = self.field_views[plan.fields[0][0]]
+            must_have = Requete.docs_with_all_groups(plan.must_have, index)
+            candidates = must_have if candidates is None else intersect(candidates, must_have)
+        if plan.required or plan.excluded:
+            # postings intersectés d'abord, positions vérifiées ensuite sur les survivants
+            fields = [self.navweb.segment.field(name) for name, _ in plan.fields]
+            parsed = ParsedQuery(tuple(term for term, _ in plan.tokens), plan.required, plan.excluded)
+            candidates = filter_docs(fields, parsed, candidates)
+        return candidates
+
+    @pinned_state
+    def execute(self, plan):
+        """
+        Exécute un QueryPlan et renvoie la réponse JSON (dict). Fonction pure : une
+        même instance de Ranking peut servir plusieurs requêtes en parallèle.
+        """
+        candidates = self.candidates(plan)
+        if plan.scoring == "bm25":
+            results = self.bm25_top_k(plan.tokens, plan.fields, plan.k, candidates)
+        else:
+            results = self.top_k(plan.tokens, plan.fields, plan.k, candidates)
+        nb_filtered = self.doc_count if candidates is None else len(candidates)
+        response_json = self.response(results, nb_filtered, self.doc_count)
+        if plan.facet_counts:
+            response_json["facets"] = self.facets.counts(self.matching_docs(plan, candidates), plan.facet_counts)
+        return response_json
+
+    def matching_docs(self, plan, candidates):
+        """
+        Ensemble des résultats (bitmap) : documents candidats contenant au moins un
+        terme de la requête dans l'un de ses champs.
+        """
+        terms = {term for term, _ in plan.tokens}
+        matched = union_many([self.navweb.segment.field(name).doc_ids(term)
+                              for name, _ in plan.fields for term in terms])
+        if candidates is not None:
+            matched = intersect(matched, candidates)
+        return RoaringBitmap.from_sorted(matched)
+
+    @pinned_state
+    def search(self, requete, fields=TITLE, region=None, must_have_terms=None, k=5,
+               scoring="linear", save=False, facets=None, facet_counts=(), fuzzy=True):
+        """
+        Compile et exécute une requête, en passant par le cache de résultats s'il y en
+        a un ; la réponse est écrite dans response.json si `save`. Une réponse venant
+        du cache est partagée : elle ne doit pas être modifiée.
+        """
+        plan = self.plan(requete, fields, region, must_have_terms, k, scoring, facets, facet_counts, fuzzy)
+        response_json = None
+        if self.cache is not None:
+            generation = self.navweb.segment.generation
+            response_json = self.cache.get(plan, generation)
+        if response_json is None:
+            response_json = self.execute(plan)
+            if self.cache is not None:
+                self.cache.put(plan, response_json, generation)
+        if save:
+            with open("response.json", "w") as outfile:
+                json.dump(response_json, outfile)
+        return response_json
 
-        response_json = {
+    @staticmethod
+    def response(results, nb_filtered, nb_total):
+        """
+        Réponse JSON d'une requête.
+        """
+        return {
             "metadata": {
-                "nb_elements_apres_filtrage": len(filtered_results),
-                "nb_elements_total": total_elements
+                "nb_elements_apres_filtrage": nb_filtered,
+                "nb_elements_total": nb_total
             },
-            "result": filtered_results.to_dict(orient="records")
+            "result": results
         }
 
-
-        with open("response.json", "w") as outfile:
-            json.dump(response_json, outfile)
-
-    def requete_description(self, requete):
+    def requete_title(self, requete, k=5, save=True):
         """
         Génère un classement des documents en fonction d'une requête donnée.
         """
-        self.index_to_work("description")
-        query = Requete(requete)
-        query_tokens = query.requete_synonymes()
-
-        position_score = {}
-        self.set_index_and_docs(index=self.index_description, doc_lengths=self.doc_lengths)
-        for doc in self.docs:
-            description_score = self.position_score(query_tokens, doc["url"], self.index_description)
-            review_score = self.navweb.index_reviews[doc["url"]]["mean_mark"]
-            frequency_score = self.freq_score(query_tokens, doc["url"], self.index_description)
-            score = self.linear_score(query_tokens, doc, description_score, review_score, frequency_score)
-            position_score[doc["url"]] = score
-
-        position_score_df = pd.DataFrame(list(position_score.items()), columns=["url", "score"])
-        position_score_df = position_score_df.sort_values(by="score", ascending=False)
-
-        filtered_results = position_score_df
-        total_elements = len(self.docs)
-
-        response_json = {
-            "metadata": {
-                "nb_elements_apres_filtrage": len(filtered_results),
-                "nb_elements_total": total_elements
-            },
-            "result": filtered_results.to_dict(orient="records")
-        }
-
-        with open("response.json", "w") as outfile:
-            json.dump(response_json, outfile)
-
-
-    def requete_title_description(self, requete):
-        self.index_to_work("title")
-        query = Requete(requete)
-        query_tokens = query.requete_synonymes()
-
-        position_score = {}
-        self.set_index_and_docs(index=self.index_title, doc_lengths=self.doc_lengths)
-        for doc in self.docs:
-            title_score = self.position_score(query_tokens, doc["url"], self.index_title)
-            review_score = self.navweb.index_reviews[doc["url"]]["mean_mark"]
-            frequency_score = self.freq_score(query_tokens, doc["url"], self.index_title)
-            score_title = self.linear_score(query_tokens, doc, title_score, review_score, frequency_score)
-            print(score_title)
-
-            self.index_to_work("description")
-            description_score = self.position_score(query_tokens, doc["url"], self.index_description)
-            review_score = self.navweb.index_reviews[doc["url"]]["mean_mark"]
-            frequency_score = self.freq_score(query_tokens, doc["url"], self.index_description)
-            description_score = self.linear_score(query_tokens, doc, description_score, review_score, frequency_score)
+        return self.search(requete, TITLE, k=k, save=save)
 
+    def requete_description(self, requete, k=5, save=True):
+        """
+        Génère un classement des documents en fonction d'une requête donnée.
+        """
+        return self.search(requete, DESCRIPTION, k=k, save=save)
 
-            score = 2 * score_title + 0.5 * description_score
-            position_score[doc["url"]] = score
+    def requete_title_description(self, requete, k=5, save=True):
+        """
+        Classement sur le titre et la description en une seule passe :
+        2 x score du titre + 0.5 x score de la description.
+        """
+        return self.search(requete, TITLE_DESCRIPTION, k=k, save=save)
 
-        position_score_df = pd.DataFrame(list(position_score.items()), columns=["url", "score"])
-        position_score_df = position_score_df.sort_values(by="score", ascending=False)
+    def requete_bm25(self, requete, k=5, save=True):
+        """
+        Classement BM25F sur le titre (x2) et la description (x0.5).
+        """
+        return self.search(requete, TITLE_DESCRIPTION, k=k, scoring="bm25", save=save)
 
-        filtered_results = position_score_df
-        total_elements = len(self.docs)
+    def docs_from_ids(self, doc_ids):
+        """
+        Documents correspondant à un tableau trié de doc ids.
+        """
+        return [self.all_docs[doc_id] for doc_id in doc_ids]
 
-        response_json = {
-            "metadata": {
-                "nb_elements_apres_filtrage": len(filtered_results),
-                "nb_elements_total": total_elements
-            },
-            "result": filtered_results.to_dict(orient="records")
-        }
+    @staticmethod
+    def doc_ids_of(docs):
+        """
+        Tableau trié des doc ids d'une liste de documents (triée par doc id).
+        """
+        return array("I", (doc["id"] for doc in docs))
 
-        with open("response.json", "w") as outfile:
-            json.dump(response_json, outfile)
+    def region_doc_ids(self, region):
+        """
+        Doc ids triés des documents de la région spécifiée (bitmap de la facette
+        `region_feature` ; aucun document si la région est inconnue).
+        """
+        return self.facets.bitmap(self.region_feature, region).to_array()
 
-    def filter_by_region(self, docs, region, origin_index):
+    def must_have_doc_ids(self, terms, index):
         """
-        Filtre les documents selon la région spécifiée.
+        Doc ids triés des documents contenant chacun des termes spécifiés (ou l'un de ses synonymes).
         """
-        if region not in origin_index:
-            raise ValueError(f"La région '{region}' est introuvable dans l'index d'origine.")
+        query = Requete(terms, self.synonyms)
+        groups = query.groupes_obligatoires()
+        if not groups:
+            return None
+        return query.docs_with_all_groups(groups, index)
 
-        region_docs = set(origin_index[region])
-        return [doc for doc in docs if doc["url"] in region_docs]
+    def filter_by_region(self, docs, region):
+        """
+        Filtre les documents selon la région spécifiée (intersection avec la facette).
+        """
+        return self.docs_from_ids(intersect(self.doc_ids_of(docs), self.region_doc_ids(region)))
 
     def filter_by_must_have_terms(self, docs, terms, index):
         """
         Filtre les documents pour inclure seulement ceux contenant tous les termes spécifiés
-        dans le titre ou la description.
+        dans le titre ou la description (intersection de postings).
         """
-        filtered_docs = []
-        terms = Requete(terms)
-        terms = terms.requete_synonymes()
-        for doc in docs:
-            doc_id = doc["url"]
-            if Requete.all_token_no_st_w(self, doc_id, terms, index):
-                filtered_docs.append(doc)
-        return filtered_docs
+        must_have = self.must_have_doc_ids(terms, index)
+        if must_have is None:
+            return docs
+        return self.docs_from_ids(intersect(self.doc_ids_of(docs), must_have))
 
-    def requete_title_region(self, requete, region=None, must_have_terms=None):
+    def requete_title_region(self, requete, region=None, must_have_terms=None, k=5, save=True):
         """
         Génère un classement des documents pour une requête donnée dans une région spécifique
         et avec des mots obligatoires dans le titre.
         """
-        self.index_to_work("title")
-        query = Requete(requete)
-        query_tokens = query.requete_synonymes()
-        total_elements = len(self.docs)
-        if region:
-            origin_index = self.navweb.index_origin
-            self.docs = self.filter_by_region(self.docs, region, origin_index)
-
-        if must_have_terms:
-            self.docs = self.filter_by_must_have_terms(self.docs, must_have_terms, self.index_title)
-
-        position_score = {}
-        self.set_index_and_docs(index=self.index_title, doc_lengths=self.doc_lengths)
-
-        for doc in self.docs:
-            title_score = self.position_score(query_tokens, doc["url"], self.index_title)
-            review_score = self.navweb.index_reviews[doc["url"]]["mean_mark"]
-            frequency_score = self.freq_score(query_tokens, doc["url"], self.index_title)
-            score = self.linear_score(query_tokens, doc, title_score, review_score, frequency_score)
-            position_score[doc["url"]] = score
-
-        position_score_df = pd.DataFrame(list(position_score.items()), columns=["url", "score"])
-        position_score_df = position_score_df.sort_values(by="score", ascending=False)
-
-        filtered_results = position_score_df
-
-
-        response_json = {
-            "metadata": {
-                "nb_elements_apres_filtrage": len(filtered_results),
-                "nb_elements_total": total_elements
-            },
-            "result": filtered_results.to_dict(orient="records")
-        }
-
-        with open("response.json", "w") as outfile:
-            json.dump(response_json, outfile)
+        return self.search(requete, TITLE, region, must_have_terms, k, save=save)
 
-    def requete_description_region(self, requete, region=None, must_have_terms=None):
+    def requete_description_region(self, requete, region=None, must_have_terms=None, k=5, save=True):
         """
         Génère un classement des documents pour une requête donnée dans une région spécifique
         et avec des mots obligatoires dans la description.
         """
-        self.index_to_work("description")
-        query = Requete(requete)
-        query_tokens = query.requete_synonymes()
-        total_elements = len(self.docs)
-        if region:
-
-            origin_index = self.navweb.index_origin
-            self.docs = self.filter_by_region(self.docs, region, origin_index)
-
-        if must_have_terms:
-            self.docs = self.filter_by_must_have_terms(self.docs, must_have_terms, self.index_description)
-
-        position_score = {}
-        self.set_index_and_docs(index=self.index_description, doc_lengths=self.doc_lengths)
-
-        for doc in self.docs:
-            description_score = self.position_score(query_tokens, doc["url"], self.index_description)
-            review_score = self.navweb.index_reviews[doc["url"]]["mean_mark"]
-            frequency_score = self.freq_score(query_tokens, doc["url"], self.index_description)
-            score = self.linear_score(query_tokens, doc, description_score, review_score, frequency_score)
-            position_score[doc["url"]] = score
-
-        position_score_df = pd.DataFrame(list(position_score.items()), columns=["url", "score"])
-        position_score_df = position_score_df.sort_values(by="score", ascending=False)
-
-        filtered_results = position_score_df
-
-
-        response_json = {
-            "metadata": {
-                "nb_elements_apres_filtrage": len(filtered_results),
-                "nb_elements_total": total_elements
-            },
-            "result": filtered_results.to_dict(orient="records")
-        }
-
-        with open("response.json", "w") as outfile:
-            json.dump(response_json, outfile)
+        return self.search(requete, DESCRIPTION, region, must_have_terms, k, save=save)
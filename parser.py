@@ -1,5 +1,18 @@
+from collections import namedtuple
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup
 
+try:
+    import lxml.html
+except ImportError:  # lxml est optionnel
+    lxml = None
+
+
+ParsedPage = namedtuple("ParsedPage", ["title", "first_paragraph", "hrefs", "text"])
+
+PARSER_BACKENDS = ("bs4", "lxml", "stream")
+
+
 class WebParser:
     def __init__(self, html):
         self.soup = BeautifulSoup(html, 'html.parser')
@@ -17,3 +30,117 @@ class WebParser:
     def get_text_content(self):
         """Retourne le texte brut de la page."""
         return self.soup.get_text()
+
+    def get_hrefs(self):
+        """Retourne les attributs href de tous les liens, dans l'ordre du document."""
+        return [anchor['href'] for anchor in self.soup.find_all('a', href=True)]
+
+    def parse(self):
+        """Retourne le titre, le premier paragraphe, les liens et le texte en une seule analyse."""
+        first_p = self.soup.find('p')
+        first_paragraph = first_p.text.strip() if first_p else ""
+        return ParsedPage(self.get_title(), first_paragraph, self.get_hrefs(), self.soup.get_text(" "))
+
+
+class StreamingPageParser(HTMLParser):
+    """
+    Analyseur en flux basé sur `html.parser.HTMLParser` : ne construit pas d'arbre,
+    il ne retient que le titre, le texte du premier paragraphe, les href et le texte
+    visible (hors script et style).
+    """
+
+    SKIPPED_TEXT_TAGS = ("script", "style")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.first_paragraph = None
+        self.hrefs = []
+        self._title_parts = None
+        self._paragraph_parts = None
+        self._paragraph_depth = 0
+        self._text_parts = []
+        self._skip_text = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TEXT_TAGS:
+            self._skip_text += 1
+        elif tag == "a":
+            for name, value in attrs:
+                if name == "href":
+                    self.hrefs.append(value or "")
+                    break
+        elif tag == "title" and self.title is None and self._title_parts is None:
+            self._title_parts = []
+        elif tag == "p":
+            if self._paragraph_parts is not None:
+                self._paragraph_depth += 1
+            elif self.first_paragraph is None:
+                self._paragraph_parts = []
+                self._paragraph_depth = 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TEXT_TAGS and self._skip_text:
+            self._skip_text -= 1
+        elif tag == "title" and self._title_parts is not None:
+            self.title = "".join(self._title_parts)
+            self._title_parts = None
+        elif tag == "p" and self._paragraph_parts is not None:
+            self._paragraph_depth -= 1
+            if self._paragraph_depth == 0:
+                self.first_paragraph = "".join(self._paragraph_parts)
+                self._paragraph_parts = None
+
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if self._paragraph_parts is not None:
+            self._paragraph_parts.append(data)
+        if not self._skip_text:
+            self._text_parts.append(data)
+
+    def close(self):
+        super().close()
+        # Balises non fermées en fin de document
+        if self._title_parts is not None:
+            self.title = "".join(self._title_parts)
+        if self._paragraph_parts is not None:
+            self.first_paragraph = "".join(self._paragraph_parts)
+
+    def parse(self, html):
+        """Analyse le document complet et retourne un `ParsedPage`."""
+        self.feed(html)
+        self.close()
+        title = self.title if self.title is not None else "Pas de titre"
+        first_paragraph = (self.first_paragraph or "").strip()
+        return ParsedPage(title, first_paragraph, self.hrefs, " ".join(self._text_parts))
+
+
+def parse_with_lxml(html):
+    """Analyse une page avec lxml (doit être installé)."""
+    if lxml is None:
+        raise ImportError("Le backend 'lxml' nécessite le module lxml (pip install lxml).")
+    if not html.strip():
+        return ParsedPage("Pas de titre", "", [], "")
+    tree = lxml.html.fromstring(html)
+    title_tag = tree.find('.//title')
+    first_p = tree.find('.//p')
+    title = title_tag.text_content() if title_tag is not None else "Pas de titre"
+    first_paragraph = first_p.text_content().strip() if first_p is not None else ""
+    hrefs = [str(href) for href in tree.xpath('//a/@href')]
+    return ParsedPage(title, first_paragraph, hrefs, tree.text_content())
+
+
+def parse_page(html, backend="bs4"):
+    """
+    Analyse une page une seule fois et retourne son titre, son premier paragraphe,
+    ses href bruts et son texte.
+    :param backend: "bs4" (BeautifulSoup), "lxml" ou "stream" (HTMLParser sans arbre)
+    """
+    if backend == "bs4":
+        return WebParser(html).parse()
+    if backend == "lxml":
+        return parse_with_lxml(html)
+    if backend == "stream":
+        return StreamingPageParser().parse(html)
+    raise ValueError(f"Backend d'analyse inconnu : {backend} (attendu : {', '.join(PARSER_BACKENDS)})")
@@ -0,0 +1,159 @@
+from array import array
+from bisect import bisect_left
+from heapq import merge
+
+
+END = 1 << 32  # greater than every doc id: position of a cursor past its last posting
+
+
+def new_postings():
+    """
+    Empty postings list: sorted, duplicate-free doc ids stored as unsigned ints.
+    """
+    return array("I")
+
+
+def add_posting(postings, doc_id):
+    """
+    Adds a doc id to a sorted postings list. Documents are usually indexed in
+    increasing doc id order, so this is an append in the common case.
+    """
+    if not postings or postings[-1] < doc_id:
+        postings.append(doc_id)
+        return
+    i = bisect_left(postings, doc_id)
+    if i == len(postings) or postings[i] != doc_id:
+        postings.insert(i, doc_id)
+
+
+def contains(postings, doc_id):
+    """
+    Binary search membership test in a sorted postings list.
+    """
+    i = bisect_left(postings, doc_id)
+    return i < len(postings) and postings[i] == doc_id
+
+
+def gallop(postings, target, start=0):
+    """
+    Exponential search: index of the first element >= target, starting at `start`.
+    Cost is logarithmic in the distance skipped, not in the list length.
+    """
+    size = len(postings)
+    if start >= size or postings[start] >= target:
+        return start
+    step = 1
+    low = start
+    high = start + 1
+    while high < size and postings[high] < target:
+        low = high
+        step *= 2
+        high = start + step
+    return bisect_left(postings, target, low + 1, min(high, size))
+
+
+def intersect(a, b):
+    """
+    Intersection of two sorted postings lists: walks the shorter list and gallops
+    in the longer one, so a rare term is cheap to intersect with a frequent one.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    result = new_postings()
+    position = 0
+    size = len(b)
+    for doc_id in a:
+        position = gallop(b, doc_id, position)
+        if position == size:
+            break
+        if b[position] == doc_id:
+            result.append(doc_id)
+            position += 1
+    return result
+
+
+def intersect_many(lists):
+    """
+    Intersection of several postings lists, shortest first, stopping as soon as it is empty.
+    """
+    lists = sorted(lists, key=len)
+    if not lists:
+        return new_postings()
+    result = lists[0]
+    for postings in lists[1:]:
+        if not result:
+            break
+        result = intersect(result, postings)
+    return array("I", result)
+
+
+def union(a, b):
+    """
+    Union of two sorted postings lists (linear merge).
+    """
+    return union_many([a, b])
+
+
+def union_many(lists):
+    """
+    Union of several sorted postings lists (k-way merge).
+    """
+    result = new_postings()
+    last = None
+    for doc_id in merge(*lists):
+        if doc_id != last:
+            result.append(doc_id)
+            last = doc_id
+    return result
+
+
+def difference(a, b):
+    """
+    Doc ids of `a` that are not in `b`.
+    """
+    result = new_postings()
+    position = 0
+    size = len(b)
+    for doc_id in a:
+        position = gallop(b, doc_id, position)
+        if position == size or b[position] != doc_id:
+            result.append(doc_id)
+    return result
+
+
+class DocTable:
+    """
+    Maps document URLs to dense integer doc ids (0, 1, 2...) in insertion order.
+    """
+
+    def __init__(self, urls=()):
+        self.ids = {}
+        self.urls = []
+        for url in urls:
+            self.add(url)
+
+    def add(self, url):
+        """
+        Returns the doc id of a URL, assigning the next free id if it is new.
+        """
+        doc_id = self.ids.get(url)
+        if doc_id is None:
+            doc_id = len(self.urls)
+            self.ids[url] = doc_id
+            self.urls.append(url)
+        return doc_id
+
+    def get(self, url):
+        return self.ids.get(url)
+
+    def url(self, doc_id):
+        return self.urls[doc_id]
+
+    def __contains__(self, url):
+        return url in self.ids
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __iter__(self):
+        return iter(self.urls)
@@ -0,0 +1,146 @@
+import re
+from bisect import bisect_left
+from collections import namedtuple
+from postings import difference, intersect, intersect_many, new_postings, union_many
+from tokenizer import get_tokenizer
+
+
+# A constraint on documents: kind is "term", "any" (one of the tokens, e.g. the
+# corrections of a misspelled term), "phrase" (consecutive tokens) or "near" (two
+# tokens at most `distance` positions apart, in any order).
+Clause = namedtuple("Clause", ["kind", "tokens", "distance"])
+
+# Plain tokens are only scored; required clauses must match and excluded clauses
+# must not. Quoted phrases and NEAR/n expressions are required.
+ParsedQuery = namedtuple("ParsedQuery", ["tokens", "required", "excluded"])
+
+LEXER = re.compile(r'(?P<sign>[+-]?)"(?P<phrase>[^"]*)"?|(?P<near>NEAR/(?P<distance>\d+))|(?P<tsign>[+-]?)(?P<word>[^\s"]+)')
+
+
+def parse_query(text, tokenizer=None):
+    """
+    Parses a query in the small query language:
+        leather sneakers           terms (scored, not required)
+        "leather sneakers"         phrase: consecutive tokens
+        leather NEAR/3 sneakers    both tokens at most 3 positions apart
+        +leather  -suede  -"high heels"   required / excluded term or phrase
+    Text goes through the shared tokenizer, so stopwords inside a phrase are skipped
+    exactly as they were at indexing time.
+    NEAR/n must stand between two unsigned, unquoted terms that are not stopwords;
+    otherwise (missing operand, "+a NEAR/2 b", "a NEAR/2 "b c"", chained NEAR) the
+    query is rejected with a ValueError rather than silently read as plain terms.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    items = []  # (sign, clause) in query order; sign is "", "+" or "-"
+    pending_near = None
+    near_operand = False  # the previous item can be the left operand of NEAR
+    for match in LEXER.finditer(text):
+        if match.group("near"):
+            if not near_operand or pending_near is not None:
+                raise ValueError(f"{match.group('near')} must follow an unsigned term.")
+            pending_near = int(match.group("distance"))
+            near_operand = False
+            continue
+        if match.group("phrase") is not None:
+            sign, tokens = match.group("sign"), tuple(tokenizer.tokenize(match.group("phrase")))
+            clause = Clause("phrase", tokens, 0) if len(tokens) > 1 else Clause("term", tokens, 0)
+        else:
+            sign, tokens = match.group("tsign"), tuple(tokenizer.tokenize(match.group("word")))
+            clause = Clause("term", tokens, 0)
+        if pending_near is not None:
+            if not tokens or clause.kind != "term" or sign:
+                raise ValueError(f"NEAR/{pending_near} must be followed by an unsigned term.")
+            _, previous = items.pop()
+            items.append(("+", Clause("near", (previous.tokens[-1], tokens[0]), pending_near)))
+            pending_near = None
+            continue
+        near_operand = bool(tokens) and clause.kind == "term" and not sign
+        if not tokens:
+            continue
+        if clause.kind == "phrase" and not sign:
+            sign = "+"
+        items.append((sign, clause))
+    if pending_near is not None:
+        raise ValueError(f"NEAR/{pending_near} must be followed by an unsigned term.")
+
+    tokens, required, excluded = [], [], []
+    for sign, clause in items:
+        if sign == "-":
+            excluded.append(clause)
+            continue
+        tokens.extend(clause.tokens)
+        if sign == "+":
+            required.append(clause)
+    return ParsedQuery(tuple(tokens), tuple(required), tuple(excluded))
+
+
+def _positions_of(decoded, doc_id):
+    doc_ids, _, positions = decoded
+    return positions[bisect_left(doc_ids, doc_id)]
+
+
+def _has_phrase(position_lists):
+    following = [set(positions) for positions in position_lists[1:]]
+    return any(all(start + offset + 1 in positions for offset, positions in enumerate(following))
+               for start in position_lists[0])
+
+
+def _has_near(first, second, distance):
+    i = j = 0
+    while i < len(first) and j < len(second):
+        if abs(first[i] - second[j]) <= distance:
+            return True
+        if first[i] < second[j]:
+            i += 1
+        else:
+            j += 1
+    return False
+
+
+def clause_docs(field, clause, candidates=None):
+    """
+    Sorted doc ids of a field (FieldReader / MultiFieldReader) matching a clause,
+    restricted to `candidates` if given. The postings of the clause's tokens are
+    intersected first; positions are only checked on the surviving documents.
+    """
+    if clause.kind in ("term", "any"):
+        docs = field.doc_ids(clause.tokens[0]) if clause.kind == "term" \
+            else union_many([field.doc_ids(token) for token in clause.tokens])
+        return docs if candidates is None else intersect(candidates, docs)
+    decoded = [field.lookup(token) for token in clause.tokens]
+    if any(postings is None for postings in decoded):
+        return new_postings()
+    lists = [postings[0] for postings in decoded]
+    if candidates is not None:
+        lists.append(candidates)
+    result = new_postings()
+    for doc_id in intersect_many(lists):
+        position_lists = [_positions_of(postings, doc_id) for postings in decoded]
+        if clause.kind == "phrase":
+            matched = _has_phrase(position_lists)
+        else:
+            matched = _has_near(position_lists[0], position_lists[1], clause.distance)
+        if matched:
+            result.append(doc_id)
+    return result
+
+
+def filter_docs(fields, parsed, candidates=None):
+    """
+    Applies the required and excluded clauses of a parsed query: a clause matches a
+    document if it matches in any of the fields. Required clauses are evaluated
+    cheapest first (single terms before positional checks), each one on the
+    survivors of the previous ones. Returns sorted doc ids, or `candidates`
+    unchanged (None: every document) when the query has no clause.
+    """
+    for clause in sorted(parsed.required, key=lambda clause: clause.kind not in ("term", "any")):
+        candidates = union_many([clause_docs(field, clause, candidates) for field in fields])
+        if not candidates:
+            return candidates
+    if parsed.excluded:
+        if candidates is None:
+            # only documents containing a query token can be ranked
+            candidates = union_many([field.doc_ids(token) for token in set(parsed.tokens) for field in fields])
+        for clause in parsed.excluded:
+            candidates = difference(candidates, union_many([clause_docs(field, clause, candidates) for field in fields]))
+    return candidates
@@ -0,0 +1,91 @@
+from array import array
+from datetime import date
+
+
+RATINGS = range(1, 6)
+MAX_RATING = RATINGS[-1]
+
+
+class ReviewStats:
+    """
+    Columnar store of review statistics, one row per doc id: number of reviews,
+    mean rating, rating of the most recent review, day of the most recent review
+    (proleptic ordinal, 0 if none) and the histogram of ratings 1 to 5.
+    Every statistic is computed in a single streaming pass over the reviews.
+    """
+
+    COLUMNS = {
+        "review_count": "I",
+        "review_mean": "f",
+        "review_last": "f",
+        "review_last_day": "I",
+        **{f"review_hist_{rating}": "I" for rating in RATINGS},
+    }
+
+    def __init__(self):
+        self.columns = {name: array(typecode) for name, typecode in self.COLUMNS.items()}
+
+    def __len__(self):
+        return len(self.columns["review_count"])
+
+    def resize(self, size):
+        """
+        Grows every column to `size` rows (new rows are documents without reviews).
+        """
+        missing = size - len(self)
+        if missing > 0:
+            for values in self.columns.values():
+                values.extend([0] * missing)
+
+    @staticmethod
+    def review_day(review):
+        try:
+            return date.fromisoformat(str(review.get("date", ""))[:10]).toordinal()
+        except ValueError:
+            return 0
+
+    def add(self, doc_id, reviews):
+        """
+        Computes the statistics of a document's reviews in one pass. Among reviews
+        with the same date, the last one listed is the most recent.
+        """
+        self.resize(doc_id + 1)
+        count = 0
+        total = 0
+        last_day = -1
+        last_rating = 0
+        histogram = [0] * len(RATINGS)
+        for review in reviews:
+            rating = int(review["rating"])
+            count += 1
+            total += rating
+            if 1 <= rating <= 5:
+                histogram[rating - 1] += 1
+            day = self.review_day(review)
+            if day >= last_day:
+                last_day = day
+                last_rating = rating
+        columns = self.columns
+        columns["review_count"][doc_id] = count
+        columns["review_mean"][doc_id] = total / count if count else 0
+        columns["review_last"][doc_id] = last_rating
+        columns["review_last_day"][doc_id] = max(last_day, 0)
+        for rating in RATINGS:
+            columns[f"review_hist_{rating}"][doc_id] = histogram[rating - 1]
+
+    def get(self, doc_id):
+        """
+        Statistics of one document as a dict (column name -> value).
+        """
+        return {name: values[doc_id] for name, values in self.columns.items()}
+
+    def merge(self, other, mapping):
+        """
+        Copies the rows of another store, row i going to doc id mapping[i].
+        """
+        if mapping:
+            self.resize(max(mapping) + 1)
+        for name, values in self.columns.items():
+            source = other.columns[name]
+            for local_id in range(len(other)):
+                values[mapping[local_id]] = source[local_id]
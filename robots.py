@@ -0,0 +1,106 @@
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+import requests
+
+
+class RobotsCache:
+    """
+    Cache des fichiers robots.txt, un par hôte (schéma + nom d'hôte), avec expiration.
+    Les robots.txt sont récupérés à la demande par le crawler, dans son pool de
+    threads, pour ne jamais bloquer la boucle de crawl ; une entrée expirée reste
+    utilisée pendant son rafraîchissement.
+    """
+
+    def __init__(self, fetcher, user_agent="*", ttl=3600):
+        """
+        :param fetcher: `HttpFetcher` dont la session est utilisée pour télécharger les robots.txt
+        :param user_agent: Agent utilisateur pour lequel les règles sont évaluées
+        :param ttl: Durée de validité (en secondes) d'un robots.txt en cache
+        """
+        self.fetcher = fetcher
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.entries = {}  # hôte -> (RobotFileParser, date d'expiration)
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def host_key(url):
+        """Identifiant de l'hôte d'une URL : "schéma://hôte[:port]"."""
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def needs_fetch(self, url):
+        """Indique si le robots.txt de l'hôte est absent ou expiré et n'est pas déjà en cours de récupération."""
+        host = self.host_key(url)
+        with self.lock:
+            if host in self.pending:
+                return False
+            entry = self.entries.get(host)
+            return entry is None or entry[1] <= time.monotonic()
+
+    def mark_pending(self, url):
+        with self.lock:
+            self.pending.add(self.host_key(url))
+
+    def can_fetch(self, url):
+        """
+        Retourne True/False selon robots.txt, ou None si le robots.txt de l'hôte
+        n'a encore jamais été récupéré.
+        """
+        with self.lock:
+            entry = self.entries.get(self.host_key(url))
+        if entry is None:
+            return None
+        return entry[0].can_fetch(self.user_agent, url)
+
+    def fetch(self, host):
+        """
+        Télécharge et analyse le robots.txt d'un hôte (appelé dans un thread du pool).
+        Comme `RobotFileParser.read` : 401/403 interdisent tout, les autres erreurs autorisent tout.
+        """
+        parser = RobotFileParser(host + "/robots.txt")
+        try:
+            response = self.fetcher.session.get(host + "/robots.txt", timeout=self.fetcher.timeout)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except requests.exceptions.RequestException as e:
+            print(f"Erreur lors de la récupération de {host}/robots.txt: {e}")
+            parser.allow_all = True
+        parser.modified()
+        return parser
+
+    def store(self, host, parser):
+        """Enregistre le robots.txt récupéré pour un hôte."""
+        with self.lock:
+            self.entries[host] = (parser, time.monotonic() + self.ttl)
+            self.pending.discard(host)
+
+    def allowed(self, url):
+        """Version bloquante de `can_fetch` : récupère le robots.txt si nécessaire."""
+        if self.needs_fetch(url):
+            host = self.host_key(url)
+            self.store(host, self.fetch(host))
+        return self.can_fetch(url)
+
+    def min_delay(self, host):
+        """
+        Délai minimal (en secondes) entre deux requêtes vers l'hôte, d'après
+        les directives Crawl-delay et Request-rate ; 0 si aucune n'est présente.
+        """
+        with self.lock:
+            entry = self.entries.get(host)
+        if entry is None:
+            return 0
+        parser = entry[0]
+        delay = parser.crawl_delay(self.user_agent) or 0
+        rate = parser.request_rate(self.user_agent)
+        if rate and rate.requests:
+            delay = max(delay, rate.seconds / rate.requests)
+        return float(delay)
@@ -0,0 +1,887 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from postings import END, contains
+from varint import decode_varint, encode_varint, skip_varints
+from lexicon import Lexicon, encode_lexicon
+from topk import linear_score_bound
+
+
+MAGIC = b"IWSEG\x00\x01\x00"
+HEADER = struct.Struct("<8sII")
+SECTION_ENTRY = struct.Struct("<QQ")
+FIELD_HEADER = struct.Struct("<IB")
+
+
+def _offsets_section(chunks, typecode):
+    """
+    Concatenates byte chunks, returns (offsets array bytes, blob).
+    """
+    offsets = array(typecode, [0])
+    blob = bytearray()
+    for chunk in chunks:
+        blob += chunk
+        offsets.append(len(blob))
+    return offsets.tobytes(), bytes(blob)
+
+
+def encode_postings(postings, positional):
+    """
+    Encodes the postings of one term: doc count, then for each doc (sorted by id)
+    the doc id delta, the term frequency and, for positional fields, the deltas
+    between positions.
+    """
+    out = bytearray()
+    encode_varint(len(postings), out)
+    previous_doc = 0
+    for doc_id, tf, positions in postings:
+        encode_varint(doc_id - previous_doc, out)
+        previous_doc = doc_id
+        encode_varint(tf, out)
+        if positional:
+            previous_position = 0
+            for position in positions:
+                encode_varint(position - previous_position, out)
+                previous_position = position
+    return bytes(out)
+
+
+def encode_field(terms, positional):
+    """
+    Encodes a field section from {term: [(doc_id, tf, positions), ...]}.
+    Layout: term count, positional flag, term offsets (u32), postings offsets (u64),
+    terms blob (sorted UTF-8 terms), postings blob.
+    """
+    sorted_terms = sorted(terms)
+    term_offsets, terms_blob = _offsets_section((t.encode("utf-8") for t in sorted_terms), "I")
+    postings_offsets, postings_blob = _offsets_section(
+        (encode_postings(sorted(terms[t]), positional) for t in sorted_terms), "Q")
+    return FIELD_HEADER.pack(len(sorted_terms), int(positional)) + term_offsets + postings_offsets \
+        + terms_blob + postings_blob
+
+
+def encode_bounds(terms, positional, review_means=None):
+    """
+    Encodes the per-term score bounds of a field from {term: [(doc_id, tf, positions), ...]},
+    in sorted term order: the maximum term frequency (u32), for positional fields
+    the smallest first position (u32, 0 otherwise), the maximum over the documents
+    of the term of its linear score plus the review signal (`topk.linear_score_bound`,
+    f64) and the maximum review mean of these documents (f64). Top-k evaluation gets
+    the maximum contribution of a term from them without reading its postings.
+    :param review_means: review mean of each doc id (None: no review signal)
+    """
+    sorted_terms = sorted(terms)
+    max_tfs = array("I")
+    first_positions = array("I")
+    max_scores = array("d")
+    max_reviews = array("d")
+    for term in sorted_terms:
+        max_tf = first_position = None
+        max_score = max_review = 0.0
+        for doc_id, tf, positions in terms[term]:
+            position = positions[0] if positional else 0
+            review = review_means[doc_id] if review_means is not None else 0.0
+            max_tf = tf if max_tf is None else max(max_tf, tf)
+            first_position = position if first_position is None else min(first_position, position)
+            max_score = max(max_score, linear_score_bound(tf, position, review))
+            max_review = max(max_review, review)
+        max_tfs.append(max_tf)
+        first_positions.append(first_position)
+        max_scores.append(max_score)
+        max_reviews.append(max_review)
+    return max_tfs.tobytes() + first_positions.tobytes() + max_scores.tobytes() + max_reviews.tobytes()
+
+
+def write_segment(path, urls, fields, columns=None):
+    """
+    Writes a binary index segment.
+    :param urls: document URLs, indexed by the doc ids used in `fields` (e.g. the
+                 urls of a `DocTable`); in the segment, the doc id of a document is
+                 its rank in sorted URL order
+    :param fields: {field name: (positional, {term: postings})}, postings being
+                   {doc id: [positions]} for positional fields and either {doc id: tf}
+                   or an iterable of doc ids (tf = 1) for the others
+    :param columns: {column name: array} of per-document values, aligned with `urls`
+    """
+    order = sorted(range(len(urls)), key=urls.__getitem__)
+    rank = array("I", bytes(4 * len(urls)))
+    for new_id, old_id in enumerate(order):
+        rank[old_id] = new_id
+    # columns in segment doc id order
+    columns = {name: array(values.typecode, (values[i] for i in order)) for name, values in (columns or {}).items()}
+    doc_offsets, doc_blob = _offsets_section((urls[i].encode("utf-8") for i in order), "Q")
+    sections = [("docs", doc_offsets + doc_blob)]
+
+    for name, (positional, index) in sorted(fields.items()):
+        terms = {}
+        for term, docs in index.items():
+            if positional:
+                terms[term] = [(rank[doc_id], len(positions), positions) for doc_id, positions in docs.items()]
+            elif isinstance(docs, dict):
+                terms[term] = [(rank[doc_id], tf, None) for doc_id, tf in docs.items()]
+            else:
+                terms[term] = [(rank[doc_id], 1, None) for doc_id in docs]
+        sections.append((f"field:{name}", encode_field(terms, positional)))
+        sections.append((f"lexicon:{name}", encode_lexicon(sorted(terms))))
+        sections.append((f"bounds:{name}", encode_bounds(terms, positional, columns.get("review_mean"))))
+
+    for name, values in sorted(columns.items()):
+        sections.append((f"column:{name}", values.typecode.encode("ascii") + values.tobytes()))
+
+    table = bytearray()
+    for name, _ in sections:
+        encoded = name.encode("utf-8")
+        table += struct.pack("<H", len(encoded)) + encoded + bytes(SECTION_ENTRY.size)
+    offset = HEADER.size + len(table)
+    position = 0
+    for name, data in sections:
+        position += 2 + len(name.encode("utf-8"))
+        SECTION_ENTRY.pack_into(table, position, offset, len(data))
+        position += SECTION_ENTRY.size
+        offset += len(data)
+
+    # written aside then renamed: a reader that has the old segment mapped keeps
+    # its inode instead of seeing the file truncated under it
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(urls), len(sections)))
+        f.write(table)
+        for _, data in sections:
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class FieldReader:
+    """
+    Lazy access to one field of a segment: the term dictionary is binary-searched
+    in place and postings are decoded only when a term is requested.
+    """
+
+    def __init__(self, buf, offset, lexicon_offset=None, bounds=None):
+        self.buf = buf
+        self.lexicon_offset = lexicon_offset
+        self._lexicon = None
+        self.term_count, positional = FIELD_HEADER.unpack_from(buf, offset)
+        self.positional = bool(positional)
+        base = offset + FIELD_HEADER.size
+        n = self.term_count + 1
+        self.term_offsets = buf[base:base + 4 * n].cast("I")
+        base += 4 * n
+        self.postings_offsets = buf[base:base + 8 * n].cast("Q")
+        base += 8 * n
+        self.terms_start = base
+        self.postings_start = base + self.term_offsets[-1]
+        self.max_tfs = self.first_positions = self.max_scores = self.max_reviews = None
+        if bounds is not None:
+            # (offset, length) of the bounds section; the score bounds are absent
+            # from segments written before they were added
+            bounds_offset, bounds_length = bounds
+            n = self.term_count
+            self.max_tfs = buf[bounds_offset:bounds_offset + 4 * n].cast("I")
+            self.first_positions = buf[bounds_offset + 4 * n:bounds_offset + 8 * n].cast("I")
+            if bounds_length >= 24 * n:
+                self.max_scores = buf[bounds_offset + 8 * n:bounds_offset + 16 * n].cast("d")
+                self.max_reviews = buf[bounds_offset + 16 * n:bounds_offset + 24 * n].cast("d")
+
+    def term(self, term_id):
+        start = self.terms_start + self.term_offsets[term_id]
+        end = self.terms_start + self.term_offsets[term_id + 1]
+        return bytes(self.buf[start:end]).decode("utf-8")
+
+    def terms(self):
+        for term_id in range(self.term_count):
+            yield self.term(term_id)
+
+    @property
+    def lexicon(self):
+        """
+        Front-coded dictionary of the field's terms (lexicon.Lexicon), read from the
+        segment; built in memory for segments written without one.
+        """
+        if self._lexicon is None:
+            if self.lexicon_offset is not None:
+                self._lexicon = Lexicon(self.buf, self.lexicon_offset)
+            else:
+                self._lexicon = Lexicon.from_terms(self.terms())
+        return self._lexicon
+
+    def term_id(self, term):
+        """
+        Id of a term in the sorted term dictionary, or None.
+        """
+        encoded = term.encode("utf-8")
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            start = self.terms_start + self.term_offsets[middle]
+            candidate = bytes(self.buf[start:self.terms_start + self.term_offsets[middle + 1]])
+            if candidate < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.term_count and self.term(low) == term:
+            return low
+        return None
+
+    def decode(self, term_id, with_positions=True):
+        """
+        Decodes the postings of a term: returns (doc ids, term frequencies, positions
+        or None), doc ids being sorted.
+        """
+        pos = self.postings_start + self.postings_offsets[term_id]
+        buf = self.buf
+        count, pos = decode_varint(buf, pos)
+        doc_ids = array("I")
+        tfs = array("I")
+        positions = [] if (with_positions and self.positional) else None
+        doc_id = 0
+        for _ in range(count):
+            delta, pos = decode_varint(buf, pos)
+            doc_id += delta
+            tf, pos = decode_varint(buf, pos)
+            doc_ids.append(doc_id)
+            tfs.append(tf)
+            if self.positional:
+                doc_positions = array("I")
+                position = 0
+                for _ in range(tf):
+                    delta, pos = decode_varint(buf, pos)
+                    position += delta
+                    doc_positions.append(position)
+                if positions is not None:
+                    positions.append(doc_positions)
+        return doc_ids, tfs, positions
+
+    def bounds(self, term_id):
+        """
+        (maximum term frequency, smallest first position) of a term over its
+        documents, read from the segment; computed from the postings for segments
+        written without bounds.
+        """
+        if self.max_tfs is not None:
+            return self.max_tfs[term_id], self.first_positions[term_id]
+        _, tfs, positions = self.decode(term_id)
+        return max(tfs), (min(doc_positions[0] for doc_positions in positions) if positions else 0)
+
+    def score_bounds(self, term_id):
+        """
+        (maximum linear score plus review signal, maximum review mean) of a term
+        over its documents (see `encode_bounds`), or None for segments written
+        without them.
+        """
+        if self.max_scores is None:
+            return None
+        return self.max_scores[term_id], self.max_reviews[term_id]
+
+    def cursor(self, term_id, base=0, deleted=None):
+        """
+        Cursor decoding the postings of a term one at a time (see `PostingsCursor`).
+        """
+        return PostingsCursor(self.buf, self.postings_start + self.postings_offsets[term_id], self.positional,
+                              base, deleted)
+
+    def has_term(self, term):
+        return self.term_id(term) is not None
+
+    def doc_frequency(self, term_id):
+        """
+        Number of documents of a term, read without decoding its postings.
+        """
+        return decode_varint(self.buf, self.postings_start + self.postings_offsets[term_id])[0]
+
+    def doc_frequencies(self):
+        """
+        Yields (term, document frequency) in term order.
+        """
+        for term_id in range(self.term_count):
+            yield self.term(term_id), self.doc_frequency(term_id)
+
+    def lookup(self, term, with_positions=True):
+        """
+        Decoded postings of a term (see `decode`), or None if the term is unknown.
+        """
+        term_id = self.term_id(term)
+        if term_id is None:
+            return None
+        return self.decode(term_id, with_positions)
+
+    def doc_ids(self, term):
+        """
+        Sorted doc ids containing the term (empty array if the term is unknown).
+        """
+        term_id = self.term_id(term)
+        if term_id is None:
+            return array("I")
+        return self.decode(term_id, with_positions=False)[0]
+
+
+class PostingsCursor:
+    """
+    Forward cursor over the postings of one term, decoded one posting at a time:
+    `doc` (shifted by `base`, END after the last posting), `tf` and, for positional
+    fields, `first_position`; the other positions are skipped without being
+    decoded, and so are postings passed over by `advance`. Documents listed in
+    `deleted` (local doc ids) are skipped.
+    """
+
+    def __init__(self, buf, pos, positional, base=0, deleted=None):
+        self.buf = buf
+        self.remaining, self.pos = decode_varint(buf, pos)
+        self.positional = positional
+        self.base = base
+        self.deleted = deleted
+        self.local_doc = 0
+        self.doc = -1
+        self.tf = 0
+        self.first_position = 0
+        self.advance(base)
+
+    def next(self):
+        self.advance(self.doc + 1)
+
+    def advance(self, target):
+        """
+        Moves to the first live posting whose doc id is >= target.
+        """
+        if self.doc >= target:
+            return
+        buf, pos, deleted, positional = self.buf, self.pos, self.deleted, self.positional
+        local_target = target - self.base
+        local_doc = self.local_doc
+        remaining = self.remaining
+        while remaining:
+            remaining -= 1
+            # doc deltas and tfs almost always fit in one byte: decoded inline
+            byte = buf[pos]
+            if byte < 0x80:
+                local_doc += byte
+                pos += 1
+            else:
+                delta, pos = decode_varint(buf, pos)
+                local_doc += delta
+            tf = buf[pos]
+            if tf < 0x80:
+                pos += 1
+            else:
+                tf, pos = decode_varint(buf, pos)
+            if local_doc < local_target or (deleted and contains(deleted, local_doc)):
+                if positional:
+                    pos = skip_varints(buf, pos, tf)
+                continue
+            if positional:
+                self.first_position, pos = decode_varint(buf, pos)
+                pos = skip_varints(buf, pos, tf - 1)
+            self.pos, self.local_doc, self.tf, self.remaining = pos, local_doc, tf, remaining
+            self.doc = self.base + local_doc
+            return
+        self.pos, self.local_doc, self.remaining = pos, local_doc, remaining
+        self.doc = END
+
+
+class ChainedCursor:
+    """
+    Postings cursors of consecutive segments (increasing doc id ranges) read one
+    after the other, with the interface of `PostingsCursor`.
+    """
+
+    def __init__(self, cursors):
+        self.cursors = cursors
+        self.current = 0
+        self._sync()
+
+    def _sync(self):
+        while self.current < len(self.cursors) - 1 and self.cursors[self.current].doc == END:
+            self.current += 1
+        cursor = self.cursors[self.current]
+        self.doc, self.tf, self.first_position = cursor.doc, cursor.tf, cursor.first_position
+
+    def next(self):
+        self.advance(self.doc + 1)
+
+    def advance(self, target):
+        while self.doc < target:
+            self.cursors[self.current].advance(target)
+            self._sync()
+
+
+class Segment:
+    """
+    Read-only, memory-mapped index segment. Only the header and section table are
+    read when opening; documents, terms and postings are decoded on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buf = memoryview(self.mm)
+        magic, self.doc_count, section_count = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an index segment.")
+        self.sections = {}
+        pos = HEADER.size
+        for _ in range(section_count):
+            (name_length,) = struct.unpack_from("<H", self.buf, pos)
+            pos += 2
+            name = bytes(self.buf[pos:pos + name_length]).decode("utf-8")
+            pos += name_length
+            self.sections[name] = SECTION_ENTRY.unpack_from(self.buf, pos)
+            pos += SECTION_ENTRY.size
+        docs_offset, _ = self.sections["docs"]
+        self.doc_offsets = self.buf[docs_offset:docs_offset + 8 * (self.doc_count + 1)].cast("Q")
+        self.docs_start = docs_offset + 8 * (self.doc_count + 1)
+        self._fields = {}
+
+    def url(self, doc_id):
+        start = self.docs_start + self.doc_offsets[doc_id]
+        return bytes(self.buf[start:self.docs_start + self.doc_offsets[doc_id + 1]]).decode("utf-8")
+
+    def urls(self):
+        for doc_id in range(self.doc_count):
+            yield self.url(doc_id)
+
+    def doc_id(self, url):
+        """
+        Doc id of a URL (documents are stored sorted by URL), or None.
+        """
+        doc_id = bisect_left(range(self.doc_count), url, key=self.url)
+        if doc_id < self.doc_count and self.url(doc_id) == url:
+            return doc_id
+        return None
+
+    def field_names(self):
+        return [name[len("field:"):] for name in self.sections if name.startswith("field:")]
+
+    def field(self, name):
+        if name not in self._fields:
+            offset, _ = self.sections[f"field:{name}"]
+            lexicon = self.sections.get(f"lexicon:{name}")
+            bounds = self.sections.get(f"bounds:{name}")
+            self._fields[name] = FieldReader(self.buf, offset, lexicon[0] if lexicon else None, bounds)
+        return self._fields[name]
+
+    def has_field(self, name):
+        return f"field:{name}" in self.sections
+
+    def column(self, name):
+        """
+        Per-document values of a column, as a zero-copy memoryview indexed by doc id.
+        """
+        offset, length = self.sections[f"column:{name}"]
+        typecode = chr(self.buf[offset])
+        return self.buf[offset + 1:offset + length].cast(typecode)
+
+    def has_column(self, name):
+        return f"column:{name}" in self.sections
+
+    def close(self):
+        for field in self._fields.values():
+            field.term_offsets.release()
+            field.postings_offsets.release()
+            if field.max_tfs is not None:
+                field.max_tfs.release()
+                field.first_positions.release()
+            if field.max_scores is not None:
+                field.max_scores.release()
+                field.max_reviews.release()
+            if field._lexicon is not None:
+                field._lexicon.release()
+        self._fields.clear()
+        self.doc_offsets.release()
+        try:
+            self.buf.release()
+            self.mm.close()
+        except BufferError:
+            # Columns are still referenced: the mmap is released along with them
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MultiFieldReader:
+    """
+    One field over all the segments of a `SegmentSet`: postings of each segment are
+    shifted to global doc ids, concatenated and stripped of deleted documents.
+    """
+
+    def __init__(self, segment_set, name):
+        self.segment_set = segment_set
+        self.parts = [(base, segment.field(name), deleted)
+                      for base, segment, deleted in segment_set.parts if segment.has_field(name)]
+        self.positional = any(field.positional for _, field, _ in self.parts)
+        self._term_count = None
+
+    def lookup(self, term, with_positions=True):
+        """
+        Decoded postings (global doc ids, tfs, positions or None), or None if the term is unknown.
+        """
+        found = False
+        doc_ids = array("I")
+        tfs = array("I")
+        positions = [] if (with_positions and self.positional) else None
+        for base, field, deleted in self.parts:
+            decoded = field.lookup(term, with_positions)
+            if decoded is None:
+                continue
+            found = True
+            part_ids, part_tfs, part_positions = decoded
+            for i, doc_id in enumerate(part_ids):
+                if deleted and contains(deleted, doc_id):
+                    continue
+                doc_ids.append(base + doc_id)
+                tfs.append(part_tfs[i])
+                if positions is not None:
+                    positions.append(part_positions[i] if part_positions is not None else array("I"))
+        return (doc_ids, tfs, positions) if found else None
+
+    def has_term(self, term):
+        return any(field.has_term(term) for _, field, _ in self.parts)
+
+    def cursor(self, term):
+        """
+        (postings cursor over global doc ids, bounds) of a term over the segments,
+        or None if the term is unknown. The bounds are (maximum tf, smallest first
+        position, score bounds), the score bounds being (maximum linear score plus
+        review signal, maximum review mean), or None if a segment lacks them.
+        """
+        cursors = []
+        max_tf = first_position = None
+        score_bounds = (0.0, 0.0)
+        for base, field, deleted in self.parts:
+            term_id = field.term_id(term)
+            if term_id is None:
+                continue
+            part_max_tf, part_first_position = field.bounds(term_id)
+            max_tf = part_max_tf if max_tf is None else max(max_tf, part_max_tf)
+            first_position = part_first_position if first_position is None \
+                else min(first_position, part_first_position)
+            part_score_bounds = field.score_bounds(term_id)
+            if part_score_bounds is None or score_bounds is None:
+                score_bounds = None
+            else:
+                score_bounds = (max(score_bounds[0], part_score_bounds[0]),
+                                max(score_bounds[1], part_score_bounds[1]))
+            cursors.append(field.cursor(term_id, base, deleted))
+        if not cursors:
+            return None
+        cursor = cursors[0] if len(cursors) == 1 else ChainedCursor(cursors)
+        return cursor, (max_tf, first_position, score_bounds)
+
+    def doc_ids(self, term):
+        decoded = self.lookup(term, with_positions=False)
+        return decoded[0] if decoded is not None else array("I")
+
+    def terms(self):
+        last = None
+        for term in merge(*(field.terms() for _, field, _ in self.parts)):
+            if term != last:
+                yield term
+                last = term
+
+    def doc_frequencies(self):
+        """
+        Yields (term, document frequency summed over the segments) in term order.
+        Deleted documents are still counted until their segment is merged.
+        """
+        last = None
+        total = 0
+        for term, frequency in merge(*(field.doc_frequencies() for _, field, _ in self.parts)):
+            if term != last:
+                if last is not None:
+                    yield last, total
+                last = term
+                total = 0
+            total += frequency
+        if last is not None:
+            yield last, total
+
+    def prefix(self, prefix, limit=None):
+        """
+        Terms starting with `prefix` in any segment, sorted (at most `limit`).
+        """
+        terms = []
+        for term in merge(*(field.lexicon.prefix(prefix, limit) for _, field, _ in self.parts)):
+            if limit is not None and len(terms) >= limit:
+                break
+            if not terms or terms[-1] != term:
+                terms.append(term)
+        return terms
+
+    def fuzzy(self, term, max_edits=1, prefix_length=0):
+        """
+        Terms within `max_edits` edits of `term` in any segment: [(term, distance)],
+        sorted by distance then term (see `Lexicon.fuzzy`).
+        """
+        matches = {}
+        for _, field, _ in self.parts:
+            matches.update(field.lexicon.fuzzy(term, max_edits, prefix_length))
+        return sorted(matches.items(), key=lambda match: (match[1], match[0]))
+
+    @property
+    def term_count(self):
+        if self._term_count is None:
+            self._term_count = sum(1 for _ in self.terms())
+        return self._term_count
+
+
+class MultiColumn:
+    """
+    A per-document column over all the segments of a `SegmentSet`, indexed by global doc id.
+    """
+
+    def __init__(self, segment_set, name):
+        self.segment_set = segment_set
+        self.columns = [segment.column(name) for _, segment, _ in segment_set.parts]
+
+    def __getitem__(self, doc_id):
+        part = self.segment_set.part_of(doc_id)
+        return self.columns[part][doc_id - self.segment_set.parts[part][0]]
+
+    def __len__(self):
+        return self.segment_set.doc_count
+
+
+class SegmentSet:
+    """
+    Several segments searched as one index. Segment i owns the global doc ids
+    [base_i, base_i + doc_count_i); documents listed in its tombstones are skipped.
+    """
+
+    MANIFEST = "segments.json"
+
+    def __init__(self, segments, tombstones=None, generation=0):
+        self.generation = generation
+        self.parts = []
+        base = 0
+        tombstones = tombstones or [array("I") for _ in segments]
+        for segment, deleted in zip(segments, tombstones):
+            self.parts.append((base, segment, deleted))
+            base += segment.doc_count
+        self.bases = [part[0] for part in self.parts]
+        self.doc_count = base
+        self._fields = {}
+
+    @classmethod
+    def open_directory(cls, directory):
+        """
+        Opens the segments listed in the manifest of an index directory.
+        """
+        manifest = read_manifest(directory)
+        segments = []
+        tombstones = []
+        for entry in manifest["segments"]:
+            segments.append(Segment(os.path.join(directory, entry["name"])))
+            tombstones.append(read_tombstones(directory, entry.get("tombstones")))
+        return cls(segments, tombstones, manifest["generation"])
+
+    def part_of(self, doc_id):
+        return bisect_right(self.bases, doc_id) - 1
+
+    def is_deleted(self, doc_id):
+        base, _, deleted = self.parts[self.part_of(doc_id)]
+        return bool(deleted) and contains(deleted, doc_id - base)
+
+    def url(self, doc_id):
+        base, segment, _ = self.parts[self.part_of(doc_id)]
+        return segment.url(doc_id - base)
+
+    def live_docs(self):
+        """
+        Yields (global doc id, url) for every document that is not deleted.
+        """
+        for base, segment, deleted in self.parts:
+            for doc_id, url in enumerate(segment.urls()):
+                if not (deleted and contains(deleted, doc_id)):
+                    yield base + doc_id, url
+
+    def urls(self):
+        for _, url in self.live_docs():
+            yield url
+
+    @property
+    def live_count(self):
+        return sum(segment.doc_count - len(deleted) for _, segment, deleted in self.parts)
+
+    def doc_id(self, url):
+        """
+        Global doc id of the live copy of a URL, or None.
+        """
+        for base, segment, deleted in reversed(self.parts):
+            doc_id = segment.doc_id(url)
+            if doc_id is not None and not (deleted and contains(deleted, doc_id)):
+                return base + doc_id
+        return None
+
+    def field_names(self):
+        names = set()
+        for _, segment, _ in self.parts:
+            names.update(segment.field_names())
+        return sorted(names)
+
+    def has_field(self, name):
+        return any(segment.has_field(name) for _, segment, _ in self.parts)
+
+    def field(self, name):
+        if name not in self._fields:
+            self._fields[name] = MultiFieldReader(self, name)
+        return self._fields[name]
+
+    def has_column(self, name):
+        return bool(self.parts) and all(segment.has_column(name) for _, segment, _ in self.parts)
+
+    def column(self, name):
+        return MultiColumn(self, name)
+
+    def close(self):
+        self._fields.clear()
+        for _, segment, _ in self.parts:
+            segment.close()
+
+
+def read_manifest(directory):
+    """
+    Reads the manifest of an index directory (empty index if there is none yet).
+    """
+    path = os.path.join(directory, SegmentSet.MANIFEST)
+    if not os.path.exists(path):
+        return {"generation": 0, "next_segment": 0, "segments": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json_atomic(path, value, **dump_options):
+    """
+    Writes a JSON file aside, fsyncs it and renames it into place: readers and a
+    crash see either the old or the new content, never a partial file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f, **dump_options)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_manifest(directory, manifest):
+    """
+    Atomically replaces the manifest, publishing a new index generation.
+    """
+    write_json_atomic(os.path.join(directory, SegmentSet.MANIFEST), manifest, indent=4)
+
+
+def read_tombstones(directory, name):
+    """
+    Sorted array of the deleted doc ids of a segment.
+    """
+    deleted = array("I")
+    if name:
+        with open(os.path.join(directory, name), "rb") as f:
+            deleted.frombytes(f.read())
+    return deleted
+
+
+def write_tombstones(directory, name, deleted):
+    with open(os.path.join(directory, name), "wb") as f:
+        f.write(array("I", sorted(deleted)).tobytes())
+
+
+def merge_segments(path, segments, tombstones):
+    """
+    Writes one segment holding the live documents of several segments
+    (postings, positions and columns are remapped to the new doc ids).
+    When a URL appears in several segments, the copy of the last one wins.
+    """
+    live = {}
+    for part, (segment, deleted) in enumerate(zip(segments, tombstones)):
+        for doc_id, url in enumerate(segment.urls()):
+            if not (deleted and contains(deleted, doc_id)):
+                live[url] = (part, doc_id)
+    urls = sorted(live)
+    kept = {live[url]: new_id for new_id, url in enumerate(urls)}
+
+    fields = {}
+    names = sorted({name for segment in segments for name in segment.field_names()})
+    for name in names:
+        readers = [segment.field(name) if segment.has_field(name) else None for segment in segments]
+        positional = any(reader is not None and reader.positional for reader in readers)
+        terms = {}
+        for part, reader in enumerate(readers):
+            if reader is None:
+                continue
+            for term_id in range(reader.term_count):
+                doc_ids, tfs, positions = reader.decode(term_id)
+                postings = terms.setdefault(reader.term(term_id), {})
+                for i, doc_id in enumerate(doc_ids):
+                    new_id = kept.get((part, doc_id))
+                    if new_id is None:
+                        continue
+                    postings[new_id] = list(positions[i]) if positional and positions else tfs[i]
+        fields[name] = (positional, {term: docs for term, docs in terms.items() if docs})
+
+    columns = {}
+    column_names = [name[len("column:"):] for name in segments[0].sections if name.startswith("column:")] \
+        if segments else []
+    for name in column_names:
+        if not all(segment.has_column(name) for segment in segments):
+            continue
+        values = [segment.column(name) for segment in segments]
+        columns[name] = array(values[0].format, (values[live[url][0]][live[url][1]] for url in urls))
+        for value in values:
+            value.release()
+    write_segment(path, urls, fields, columns)
+
+
+class FieldView:
+    """
+    Dict-like view of a segment field with the same shape as the JSON indexes:
+    positional fields give {url: [positions]}, other fields give a list of URLs.
+    Works on a `Segment` or a `SegmentSet`.
+    """
+
+    def __init__(self, segment, name):
+        self.segment = segment
+        self.field = segment.field(name)
+
+    def __contains__(self, term):
+        return self.field.has_term(term)
+
+    def __getitem__(self, term):
+        decoded = self.field.lookup(term)
+        if decoded is None:
+            raise KeyError(term)
+        doc_ids, _, positions = decoded
+        url = self.segment.url
+        if positions is None:
+            return [url(doc_id) for doc_id in doc_ids]
+        return {url(doc_id): list(doc_positions) for doc_id, doc_positions in zip(doc_ids, positions)}
+
+    def doc_ids(self, term):
+        """
+        Sorted array of the doc ids containing the term (empty if unknown).
+        """
+        return self.field.doc_ids(term)
+
+    def get(self, term, default=None):
+        try:
+            return self[term]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.field.terms()
+
+    __iter__ = keys
+
+    def __len__(self):
+        return self.field.term_count
@@ -0,0 +1,239 @@
+"""
+Serveur de requêtes HTTP (asyncio) : les index sont chargés une seule fois au
+démarrage et restent en mémoire, chaque requête est servie en JSON sans passer
+par le disque.
+
+    GET /search?q=leather+sneakers&field=title&region=italy&must=leather&k=5
+    GET /search?q=sneakers&facet=color:black&facet=color:white&facets=color,material
+    GET /complete?q=choc&field=title&limit=10
+    GET /health
+
+`q` accepte le langage de requête (phrases entre guillemets, NEAR/n, +terme,
+-terme). `field` vaut title (défaut), description, title_description ou bm25 ; les
+mots obligatoires (`must`) sont cherchés dans le premier champ. `facet=clé:valeur`
+(répétable) filtre sur une caractéristique produit (OU entre les valeurs d'une même
+clé, ET entre les clés) ; `facets=clé1,clé2` ajoute le décompte des valeurs de ces
+caractéristiques dans les résultats. Les termes inconnus sont remplacés par leurs
+corrections ou complétions, sauf avec `fuzzy=0`.
+
+Usage :
+    python server.py [--host 127.0.0.1] [--port 8080]
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from cache import ResultCache
+from navweb import DESCRIPTION, TITLE, TITLE_DESCRIPTION, Ranking
+
+MAX_HEADER_BYTES = 64 * 1024
+FIELDS = {
+    "title": (TITLE, "linear"),
+    "description": (DESCRIPTION, "linear"),
+    "title_description": (TITLE_DESCRIPTION, "linear"),
+    "bm25": (TITLE_DESCRIPTION, "bm25"),
+}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def param(params, name, default=None):
+    """
+    Dernière valeur d'un paramètre de requête (`parse_qs`), ou `default`.
+    """
+    return params[name][-1] if name in params else default
+
+
+class QueryServer:
+
+    def __init__(self, ranking=None, host="127.0.0.1", port=8080, workers=4, reload_interval=5):
+        self.ranking = ranking or Ranking(cache=ResultCache())
+        self.host = host
+        self.port = port
+        self.server = None
+        # Ranking est sans état par requête : les recherches tournent en parallèle dans un pool de threads
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.request_count = 0
+        # une nouvelle génération de l'index est publiée au début d'une requête, même sous charge :
+        # les recherches en cours finissent sur l'ancienne (le cache est alors vidé)
+        self.reload_interval = reload_interval
+        self.last_reload_check = time.monotonic()
+
+    def search(self, params):
+        """
+        Exécute une requête de recherche, renvoie la réponse JSON (dict) sans écrire sur le disque.
+        """
+        query = param(params, "q")
+        if not query:
+            raise ValueError("Paramètre 'q' manquant.")
+        field = param(params, "field", "title")
+        k = int(param(params, "k", 5))
+        region = param(params, "region") or None
+        must_have_terms = param(params, "must") or None
+        if field not in FIELDS:
+            raise ValueError(f"Champ '{field}' inconnu.")
+        fields, scoring = FIELDS[field]
+        facets = {}
+        for facet in params.get("facet", []):
+            key, separator, value = facet.partition(":")
+            if not separator or not key or not value:
+                raise ValueError(f"Facette '{facet}' invalide (attendu : clé:valeur).")
+            facets.setdefault(key, []).append(value)
+        facet_counts = [key for key in param(params, "facets", "").split(",") if key]
+        fuzzy = param(params, "fuzzy", "1") != "0"
+        return self.ranking.search(query, fields, region, must_have_terms, k, scoring,
+                                   facets=facets, facet_counts=facet_counts, fuzzy=fuzzy)
+
+    def complete(self, params):
+        """
+        Autocomplétion du dernier mot de `q` (dictionnaire des termes, sans scorer).
+        """
+        field = param(params, "field", "title")
+        if field not in FIELDS:
+            raise ValueError(f"Champ '{field}' inconnu.")
+        limit = int(param(params, "limit", 10))
+        return {"suggestions": self.ranking.complete(param(params, "q", ""), FIELDS[field][0], limit)}
+
+    async def route(self, method, target):
+        """
+        Renvoie (statut, corps JSON) pour une requête HTTP.
+        """
+        url = urlsplit(target)
+        if method != "GET":
+            return 405, {"error": "Seule la méthode GET est acceptée."}
+        if url.path == "/health":
+            state = self.ranking.state
+            cache = self.ranking.cache
+            return 200, {"status": "ok", "documents": state.doc_count,
+                         "generation": state.segment.generation, "requests": self.request_count,
+                         "cache": cache.metrics() if cache is not None else None}
+        params = parse_qs(url.query)  # {nom: [valeurs]} : `facet` est répétable
+        if url.path == "/complete":
+            try:
+                return 200, self.complete(params)
+            except ValueError as error:
+                return 400, {"error": str(error)}
+        if url.path != "/search":
+            return 404, {"error": f"Chemin inconnu : {url.path}"}
+        await self.maybe_reload()
+        try:
+            loop = asyncio.get_running_loop()
+            return 200, await loop.run_in_executor(self.executor, self.search, params)
+        except ValueError as error:
+            return 400, {"error": str(error)}
+
+    async def maybe_reload(self):
+        """
+        Vérifie au plus toutes les `reload_interval` secondes, au début d'une recherche,
+        si une nouvelle génération de l'index a été publiée et la charge (dans le pool,
+        sans bloquer la boucle) : Ranking.reload la publie d'un bloc, les recherches
+        en cours finissent sur l'ancienne, fermée après la dernière.
+        """
+        now = time.monotonic()
+        if now - self.last_reload_check < self.reload_interval:
+            return
+        self.last_reload_check = now
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(self.executor, self.ranking.reload):
+            print(f"Index rechargé : génération {self.ranking.state.segment.generation}")
+
+    async def handle(self, reader, writer):
+        """
+        Sert les requêtes d'une connexion (keep-alive HTTP/1.1).
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                start = time.perf_counter()
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Ligne de requête invalide."}, start, close=True)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0) or 0)
+                if length:
+                    await reader.readexactly(length)
+                close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+                self.request_count += 1
+                try:
+                    status, body = await self.route(method, target)
+                except Exception as error:  # une requête en erreur ne doit pas arrêter le serveur
+                    status, body = 500, {"error": repr(error)}
+                elapsed = await self.respond(writer, status, body, start, close)
+                print(f"{method} {target} {status} {elapsed:.2f} ms")
+                if close:
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def respond(writer, status, body, start, close=False):
+        """
+        Écrit une réponse JSON ; le temps de traitement est ajouté aux métadonnées
+        et à l'en-tête X-Response-Time. Renvoie ce temps en millisecondes.
+        """
+        elapsed = (time.perf_counter() - start) * 1000
+        if isinstance(body.get("metadata"), dict):
+            # copie : la réponse peut venir du cache de résultats
+            body = dict(body, metadata=dict(body["metadata"], temps_ms=round(elapsed, 3)))
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"X-Response-Time: {elapsed:.3f}ms\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+        return elapsed
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_HEADER_BYTES)
+        return self.server
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Serveur de requêtes sur http://{self.host}:{self.port} "
+              f"({self.ranking.doc_count} documents)")
+        async with self.server:
+            await self.server.serve_forever()
+
+
+def serve(host="127.0.0.1", port=8080, index_path=None):
+    """
+    Charge les index une fois puis sert les requêtes jusqu'à l'interruption (Ctrl+C).
+    :param index_path: index servi (voir `navweb.NavWeb`)
+    """
+    server = QueryServer(Ranking(cache=ResultCache(), index_path=index_path), host=host, port=port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown()
+        server.ranking.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8080)
+    arg_parser.add_argument("--index", help="dossier d'un index incrémental (index) ou segment (index.seg)")
+    args = arg_parser.parse_args()
+    serve(args.host, args.port, args.index)
@@ -0,0 +1,64 @@
+import hashlib
+import re
+
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text, bits=64):
+    """
+    Empreinte SimHash d'un texte : deux textes presque identiques ont des
+    empreintes qui ne diffèrent que de quelques bits.
+    """
+    weights = [0] * bits
+    for token in TOKEN_RE.findall(text.lower()):
+        h = _feature_hash(token)
+        for i in range(bits):
+            weights[i] += 1 if h >> i & 1 else -1
+    fingerprint = 0
+    for i, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << i
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    """Nombre de bits différents entre deux empreintes."""
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """
+    Index des empreintes déjà vues, permettant de retrouver une empreinte à
+    distance de Hamming <= `max_distance` sans comparer avec toutes les autres.
+    L'empreinte est découpée en `max_distance + 1` blocs : deux empreintes
+    proches partagent forcément au moins un bloc identique.
+    """
+
+    def __init__(self, max_distance=3, bits=64):
+        self.max_distance = max_distance
+        self.bits = bits
+        nb_blocks = max_distance + 1
+        size = bits // nb_blocks
+        self.blocks = [(i * size, bits if i == nb_blocks - 1 else (i + 1) * size) for i in range(nb_blocks)]
+        self.tables = [{} for _ in self.blocks]
+
+    def _block_values(self, fingerprint):
+        for start, end in self.blocks:
+            yield fingerprint >> start & ((1 << (end - start)) - 1)
+
+    def find_near(self, fingerprint):
+        """Retourne l'identifiant d'un document proche déjà indexé, ou None."""
+        for table, value in zip(self.tables, self._block_values(fingerprint)):
+            for other, doc_id in table.get(value, ()):
+                if hamming_distance(fingerprint, other) <= self.max_distance:
+                    return doc_id
+        return None
+
+    def add(self, fingerprint, doc_id):
+        for table, value in zip(self.tables, self._block_values(fingerprint)):
+            table.setdefault(value, []).append((fingerprint, doc_id))
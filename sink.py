@@ -0,0 +1,108 @@
+import glob
+import json
+import os
+
+
+class JsonlSink:
+    """
+    Sortie en flux des pages crawlées : chaque page est écrite immédiatement comme
+    une ligne JSON, dans des fichiers `<prefix>-00000.jsonl`, `<prefix>-00001.jsonl`...
+    Un nouveau fichier est ouvert dès que `max_records` lignes ou `max_bytes` octets
+    ont été écrits, ce qui permet d'indexer les fichiers terminés pendant le crawl.
+    """
+
+    def __init__(self, prefix, max_records=10000, max_bytes=64 * 1024 * 1024):
+        """
+        :param prefix: Préfixe des fichiers produits (peut contenir un dossier)
+        :param max_records: Nombre maximal de lignes par fichier
+        :param max_bytes: Taille maximale d'un fichier en octets
+        """
+        self.prefix = prefix
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.records_written = 0
+        self.file = None
+        self.file_records = 0
+        self.file_bytes = 0
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # En cas de reprise, on continue après les fichiers existants
+        self.file_number = len(self.paths())
+
+    def paths(self):
+        """Retourne la liste ordonnée des fichiers déjà produits par ce sink."""
+        return sorted(glob.glob(glob.escape(self.prefix) + "-[0-9][0-9][0-9][0-9][0-9].jsonl"))
+
+    def _open_next(self):
+        self.close()
+        path = self._path(self.file_number)
+        self.file_number += 1
+        self.file = open(path, "a", encoding="utf-8")
+        self.file_records = 0
+        self.file_bytes = 0
+
+    def write(self, record):
+        """Ajoute un enregistrement au fichier courant, en changeant de fichier si besoin."""
+        if self.file is None or self.file_records >= self.max_records or self.file_bytes >= self.max_bytes:
+            self._open_next()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self.file.write(line)
+        self.file_records += 1
+        self.file_bytes += len(line.encode("utf-8"))
+        self.records_written += 1
+
+    def _path(self, number):
+        return f"{self.prefix}-{number:05d}.jsonl"
+
+    def position(self):
+        """
+        Position d'écriture : (numéro du fichier courant, octets écrits dans ce
+        fichier), ou (numéro du prochain fichier, 0) si aucun fichier n'est ouvert.
+        À prendre après `flush` pour qu'elle corresponde au contenu sur disque.
+        """
+        if self.file is None:
+            return self.file_number, 0
+        return self.file_number - 1, self.file_bytes
+
+    def truncate(self, position):
+        """
+        Revient à une position obtenue par `position` : les lignes écrites depuis
+        sont supprimées (fichier courant tronqué, fichiers suivants effacés) et
+        l'écriture reprend à la suite. Sert à la reprise d'un crawl après un arrêt
+        brutal, pour ne pas réémettre les pages écrites après le dernier checkpoint.
+        """
+        number, offset = position
+        self.close()
+        for path in self.paths():
+            if int(path[-len("00000.jsonl"):-len(".jsonl")]) > number:  # <prefix>-NNNNN.jsonl
+                os.remove(path)
+        path = self._path(number)
+        self.file_number = number
+        if not os.path.exists(path):
+            return
+        with open(path, "r+b") as f:
+            f.truncate(offset)
+            f.seek(0)
+            records = f.read().count(b"\n")
+        self.file_number = number + 1
+        self.file = open(path, "a", encoding="utf-8")
+        self.file_records = records
+        self.file_bytes = offset
+
+    def flush(self):
+        """Force l'écriture sur disque des lignes en attente."""
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
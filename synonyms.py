@@ -0,0 +1,107 @@
+import json
+import os
+from functools import lru_cache
+from tokenizer import get_tokenizer
+
+
+SYNONYMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "original_synonymes.json")
+SYNONYM_WEIGHT = 0.5
+
+
+class SynonymMap:
+    """
+    Query expansion table: a term or a phrase (several tokens, e.g. "running shoes")
+    maps to synonym terms. Keys and synonyms go through the shared tokenizer, so a
+    multi-word synonym adds each of its tokens. Expanded terms carry a lower weight
+    than the terms typed by the user.
+    """
+
+    def __init__(self, entries=None, weight=SYNONYM_WEIGHT, tokenizer=None):
+        self.weight = weight
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.expansions = {}  # key tokens (tuple) -> synonym terms (tuple)
+        self.max_key_length = 1
+        for key, synonyms in (entries or {}).items():
+            self.add(key, synonyms)
+
+    def add(self, key, synonyms):
+        key_tokens = tuple(self.tokenizer.tokenize(key))
+        if not key_tokens:
+            return
+        terms = list(self.expansions.get(key_tokens, ()))
+        for synonym in synonyms:
+            for term in self.tokenizer.tokenize(synonym):
+                if term not in terms and term not in key_tokens:
+                    terms.append(term)
+        if terms:
+            self.expansions[key_tokens] = tuple(terms)
+            self.max_key_length = max(self.max_key_length, len(key_tokens))
+
+    @staticmethod
+    def validate(entries, path="synonyms"):
+        """
+        Checks the shape of a synonym map: {"term or phrase": ["synonym", ...]}.
+        """
+        if not isinstance(entries, dict):
+            raise ValueError(f"{path}: expected a JSON object mapping terms to lists of synonyms.")
+        for key, synonyms in entries.items():
+            if not isinstance(synonyms, list) or not all(isinstance(synonym, str) for synonym in synonyms):
+                raise ValueError(f"{path}: synonyms of {key!r} must be a list of strings.")
+        return entries
+
+    @classmethod
+    def load(cls, path=SYNONYMS_PATH, weight=SYNONYM_WEIGHT):
+        """
+        Loads and validates a JSON synonym file. A missing file gives an empty map.
+        """
+        if not os.path.exists(path):
+            return cls(weight=weight)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(cls.validate(json.load(f), path), weight)
+
+    def __len__(self):
+        return len(self.expansions)
+
+    def expand(self, tokens):
+        """
+        Weighted query terms: [(term, weight)], the query tokens first (weight 1),
+        then the synonyms of each term or phrase (longest phrase first) with the
+        synonym weight. A synonym that is already a query token is not added again.
+        """
+        weighted = [(token, 1) for token in tokens]
+        seen = set(tokens)
+        i = 0
+        while i < len(tokens):
+            for length in range(min(self.max_key_length, len(tokens) - i), 0, -1):
+                synonyms = self.expansions.get(tuple(tokens[i:i + length]))
+                if synonyms is not None:
+                    for term in synonyms:
+                        if term not in seen:
+                            seen.add(term)
+                            weighted.append((term, self.weight))
+                    i += length
+                    break
+            else:
+                i += 1
+        return weighted
+
+    def compile(self, has_term):
+        """
+        Copy of the map restricted to the synonyms present in an index dictionary
+        (`has_term(term)`), so expanding a query never adds terms without postings.
+        """
+        compiled = SynonymMap(weight=self.weight, tokenizer=self.tokenizer)
+        for key, terms in self.expansions.items():
+            present = tuple(term for term in terms if has_term(term))
+            if present:
+                compiled.expansions[key] = present
+                compiled.max_key_length = max(compiled.max_key_length, len(key))
+        return compiled
+
+
+@lru_cache(maxsize=None)
+def get_synonyms(path=SYNONYMS_PATH):
+    """
+    Returns the process-wide synonym map of a file (loaded and validated on first call).
+    """
+    return SynonymMap.load(path)
@@ -0,0 +1,80 @@
+"""
+Bitmaps compressés : AND, OR et AND NOT comparés aux ensembles Python, conteneurs
+tableau et bitset, y compris autour du seuil de conversion (ARRAY_MAX).
+"""
+import random
+from array import array
+
+import pytest
+
+from bitmap import ARRAY_MAX, RoaringBitmap
+
+
+def sample(rng, high, size):
+    """
+    `size` doc ids tirés dans le conteneur `high` (16 bits de poids fort).
+    """
+    return {(high << 16) | low for low in rng.sample(range(1 << 16), size)}
+
+
+def bitmap(values):
+    return RoaringBitmap.from_sorted(sorted(values))
+
+
+def check(result, expected):
+    assert list(result) == sorted(expected)
+    assert len(result) == len(expected)
+    for high, container in result.containers.items():
+        size = container.bit_count() if isinstance(container, int) else len(container)
+        assert size > 0
+        # bitset au-delà du seuil, tableau trié en deçà
+        assert isinstance(container, int) == (size > ARRAY_MAX)
+        if not isinstance(container, int):
+            assert isinstance(container, array) and list(container) == sorted(container)
+
+
+@pytest.mark.parametrize("size", [ARRAY_MAX, ARRAY_MAX + 1])
+def test_conversion_threshold(size):
+    values = sample(random.Random(size), 3, size)
+    result = bitmap(values)
+    assert isinstance(result.containers[3], int) == (size > ARRAY_MAX)
+    check(result, values)
+    assert all(doc_id in result for doc_id in values)
+    assert (3 << 16) - 1 not in result and (4 << 16) not in result
+
+
+# tailles des deux opérandes par conteneur : tableau/tableau, tableau/bitset,
+# bitset/bitset, et des deux côtés du seuil
+SIZES = [(10, 20), (ARRAY_MAX, ARRAY_MAX), (ARRAY_MAX + 1, 100), (100, ARRAY_MAX + 1),
+         (ARRAY_MAX + 1, ARRAY_MAX + 1), (30000, 30000), (60000, 60000)]
+
+
+@pytest.mark.parametrize("left_size,right_size", SIZES)
+def test_operations_match_sets(left_size, right_size):
+    rng = random.Random(left_size * 7 + right_size)
+    left = set()
+    right = set()
+    for high in (0, 1, 5):
+        left |= sample(rng, high, left_size)
+        right |= sample(rng, high, right_size)
+    left |= sample(rng, 8, 50)  # conteneurs présents d'un seul côté
+    right |= sample(rng, 9, ARRAY_MAX + 10)
+    a, b = bitmap(left), bitmap(right)
+    check(a & b, left & right)
+    check(a | b, left | right)
+    check(a - b, left - right)
+    check(b - a, right - left)
+    assert a.intersection_count(b) == len(left & right)
+
+
+def test_results_shrink_back_to_arrays():
+    rng = random.Random(2)
+    left = sample(rng, 0, 40000)
+    right = set(range(0, 1 << 16, 32))  # 2048 ids : tableau
+    dense = bitmap(left | right)
+    assert isinstance(dense.containers[0], int)
+    check(dense & bitmap(right), right)
+    check(dense - bitmap(left), right - left)
+    check(dense - dense, set())
+    assert not (dense - dense)
+    assert (dense & RoaringBitmap()).containers == {}
@@ -0,0 +1,108 @@
+"""
+Cache de résultats : ordre d'éviction LRU, borne mémoire, expiration (horloge
+injectée) et invalidation à chaque nouvelle génération d'index.
+"""
+from cache import ResultCache
+from incremental import IndexWriter
+from navweb import Ranking
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_order():
+    cache = ResultCache(max_entries=3)
+    for key in "abc":
+        cache.put(key, key.upper())
+    assert cache.get("a") == "A"  # "b" devient le moins récemment utilisé
+    cache.put("d", "D")
+    assert list(cache.entries) == ["c", "a", "d"]
+    cache.put("c", "C2")  # une réécriture compte comme un usage
+    cache.put("e", "E")
+    assert list(cache.entries) == ["d", "c", "e"]
+    assert cache.get("b") is None and cache.get("a") is None
+    assert cache.get("c") == "C2"
+    assert cache.metrics()["evictions"] == 2
+
+
+def payload(size):
+    """
+    Valeur dont l'encodage JSON fait exactement `size` octets.
+    """
+    return "x" * (size - 2)
+
+
+def test_byte_size_bound():
+    size = 100
+    value = payload(size)
+    cache = ResultCache(max_entries=100, max_bytes=3 * size)
+    for key in range(3):
+        cache.put(key, value)
+    assert cache.size == 3 * size and len(cache.entries) == 3
+    cache.get(0)
+    cache.put(3, value)
+    assert list(cache.entries) == [2, 0, 3] and cache.size == 3 * size
+    cache.put(4, payload(2 * size))  # évince plusieurs entrées
+    assert list(cache.entries) == [3, 4]
+    assert cache.size == sum(entry[1] for entry in cache.entries.values()) <= cache.max_bytes
+    cache.put(5, payload(3 * size + 1))  # plus grand que la borne : pas mis en cache
+    assert 5 not in cache.entries and list(cache.entries) == [3, 4]
+
+
+def test_ttl_expiry():
+    clock = Clock()
+    cache = ResultCache(ttl=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 5
+    cache.put("b", 2)
+    clock.now = 10
+    assert cache.get("a") == 1  # expire strictement après son échéance
+    clock.now = 10.5
+    assert cache.get("a") is None and "a" not in cache.entries
+    assert cache.get("b") == 2
+    assert cache.size == ResultCache.sizeof(2)
+    cache.put("a", 3)  # une nouvelle écriture repart pour un ttl complet
+    clock.now = 20
+    assert cache.get("a") == 3 and cache.get("b") is None
+    assert cache.metrics()["hits"] == 3 and cache.metrics()["misses"] == 2
+
+
+def test_generation_change_invalidates():
+    cache = ResultCache()
+    cache.put("a", 1, generation=1)
+    cache.put("b", 2, generation=1)
+    assert cache.get("a", generation=1) == 1
+    assert cache.get("a", generation=2) is None
+    assert not cache.entries and cache.size == 0
+    cache.put("a", 3, generation=2)
+    assert cache.get("a", generation=2) == 3
+    cache.put("b", 4, generation=3)  # une écriture sur une autre génération vide aussi le cache
+    assert list(cache.entries) == ["b"]
+    assert cache.metrics()["invalidations"] == 2 and cache.metrics()["generation"] == 3
+
+
+def test_search_cache_follows_index_generation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    index_dir = str(tmp_path / "index")
+    writer = IndexWriter(index_dir)
+
+    def product(i):
+        return {"url": f"https://shop.test/product/{i}", "title": f"leather sneakers {i}",
+                "description": "Comfortable.", "product_features": {}}
+
+    writer.update([product(i) for i in range(3)])
+    cache = ResultCache()
+    ranking = Ranking(cache=cache, index_path=index_dir)
+    first = ranking.search("sneakers", k=10)
+    assert ranking.search("sneakers", k=10) is first and cache.hits == 1
+    writer.update([product(i) for i in range(3, 5)])
+    assert ranking.reload()
+    response = ranking.search("sneakers", k=10)
+    assert response is not first and response["metadata"]["nb_elements_total"] == 5
+    assert cache.metrics()["invalidations"] == 1
+    ranking.close()
@@ -0,0 +1,152 @@
+"""
+Crawl d'un petit site servi en local par `http.server` : politesse par hôte,
+limites `max_pages` / `max_depth` et reprise après un arrêt brutal.
+"""
+import json
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from crawler import HostThrottle, WebCrawler
+from sink import JsonlSink
+
+# page -> pages liées ; profondeur depuis index.html : a* = 1, b* = 2, c1 = 3
+SITE = {
+    "index.html": ["a1.html", "a2.html", "a3.html"],
+    "a1.html": ["b1.html", "b2.html"],
+    "a2.html": ["b3.html"],
+    "a3.html": [],
+    "b1.html": ["c1.html"],
+    "b2.html": [],
+    "b3.html": [],
+    "c1.html": [],
+}
+
+
+class RecordingHandler(SimpleHTTPRequestHandler):
+    """Sert les fichiers du site et note le chemin et l'heure de chaque requête."""
+
+    def __init__(self, *args, requests, **kwargs):
+        self.requests = requests
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        self.requests.append((self.path, time.monotonic()))
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    """Écrit le site, le sert sur un port libre et retourne (URL de départ, requêtes reçues)."""
+    (tmp_path / "robots.txt").write_text("User-agent: *\nAllow: /\n")
+    for name, links in SITE.items():
+        anchors = "".join(f"<a href='/{link}'>{link}</a>" for link in links)
+        (tmp_path / name).write_text(f"<html><head><title>{name}</title></head>"
+                                     f"<body><p>Page {name}.</p>{anchors}</body></html>")
+    requests = []
+    handler = partial(RecordingHandler, requests=requests, directory=str(tmp_path))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/index.html", requests
+    server.shutdown()
+    server.server_close()
+
+
+def page_requests(requests):
+    return [(path, at) for path, at in requests if path != "/robots.txt"]
+
+
+def crawled(crawler):
+    return {record["url"].rsplit("/", 1)[-1] for record in crawler.results}
+
+
+def test_crawl_whole_site(site):
+    start_url, requests = site
+    crawler = WebCrawler(start_url, max_depth=10, max_pages=100, delay=0, concurrency=4)
+    crawler.crawl()
+    assert crawled(crawler) == set(SITE)
+    assert len(page_requests(requests)) == len(SITE)
+
+
+def test_max_pages(site):
+    start_url, requests = site
+    crawler = WebCrawler(start_url, max_depth=10, max_pages=3, delay=0, concurrency=4)
+    crawler.crawl()
+    assert crawler.pages_visited_count == 3
+    assert len(crawler.results) == 3
+    assert len(page_requests(requests)) == 3
+
+
+@pytest.mark.parametrize("max_depth, expected", [
+    (0, {"index.html"}),
+    (1, {"index.html", "a1.html", "a2.html", "a3.html"}),
+    (2, set(SITE) - {"c1.html"}),
+])
+def test_max_depth(site, max_depth, expected):
+    start_url, requests = site
+    crawler = WebCrawler(start_url, max_depth=max_depth, max_pages=100, delay=0, concurrency=4)
+    crawler.crawl()
+    assert crawled(crawler) == expected
+    assert {path.lstrip("/") for path, _ in page_requests(requests)} == expected
+
+
+def test_per_host_delay(site):
+    start_url, requests = site
+    delay = 0.1
+    crawler = WebCrawler(start_url, max_depth=10, max_pages=100, delay=delay, concurrency=4)
+    crawler.crawl()
+    times = [at for _, at in page_requests(requests)]
+    assert len(times) == len(SITE)
+    # malgré 4 téléchargements en parallèle, un seul par `delay` vers le même hôte
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert min(gaps) >= delay * 0.9
+
+
+def test_delay_is_per_host():
+    throttle = HostThrottle(0.2)
+    start = time.monotonic()
+    for url in ("http://a.test/1", "http://b.test/1", "http://c.test/1"):
+        throttle.wait(url)
+    assert time.monotonic() - start < 0.1
+    throttle.wait("http://a.test/2")
+    assert time.monotonic() - start >= 0.2 * 0.9
+
+
+class Crash(Exception):
+    pass
+
+
+def test_resume_does_not_duplicate_sink_records(site, tmp_path):
+    start_url, _ = site
+    state_path = str(tmp_path / "out" / "state.db")
+    prefix = str(tmp_path / "out" / "results")
+    (tmp_path / "out").mkdir()
+    with JsonlSink(prefix) as sink:
+        crawler = WebCrawler(start_url, max_depth=10, max_pages=100, delay=0, concurrency=1,
+                             state_path=state_path, sink=sink, checkpoint_every=2)
+        handle_response = crawler._handle_response
+
+        def crash_after_five(url, depth, html):
+            handle_response(url, depth, html)
+            if crawler.pages_visited_count == 5:
+                raise Crash()
+
+        crawler._handle_response = crash_after_five
+        with pytest.raises(Crash):
+            crawler.crawl()
+        # arrêt brutal : l'état non validé depuis le dernier checkpoint est perdu,
+        # les lignes déjà écrites dans le sink restent sur disque
+        crawler.state.connection.close()
+    with JsonlSink(prefix) as sink:
+        crawler = WebCrawler(start_url, max_depth=10, max_pages=100, delay=0, concurrency=1,
+                             state_path=state_path, resume=True, sink=sink, checkpoint_every=2)
+        crawler.crawl()
+        crawler.state.close()
+    urls = [json.loads(line)["url"] for path in sink.paths() for line in open(path, encoding="utf-8")]
+    assert sorted(url.rsplit("/", 1)[-1] for url in urls) == sorted(SITE)
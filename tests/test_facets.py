@@ -0,0 +1,91 @@
+"""
+Facettes : comptes et filtres de FacetIndex comparés à un comptage naïf sur le
+catalogue de test (plusieurs segments, documents remplacés).
+"""
+import random
+from collections import Counter
+
+import pytest
+
+from bitmap import RoaringBitmap
+from facets import FacetIndex
+from incremental import IndexWriter
+from segment import SegmentSet
+from tokenizer import get_tokenizer
+
+FEATURES = {"made in": ["Italy", "France", "Portugal", "Spain"],
+            "color": ["dark blue", "light blue", "red", "black"],
+            "material": ["leather", "canvas", "wool"]}
+
+
+def product(i, rng):
+    features = {key: rng.choice(values) for key, values in FEATURES.items() if rng.random() < 0.8}
+    return {"url": f"https://shop.test/product/{i}", "title": f"product {i}",
+            "description": "A product.", "product_features": features}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    rng = random.Random(0)
+    products = {}
+    writer = IndexWriter(str(tmp_path / "index"))
+    for batch in (range(0, 120), range(80, 200)):  # 80..119 remplacés : tombstones
+        docs = [product(i, rng) for i in batch]
+        writer.update(docs)
+        products.update((doc["url"], doc) for doc in docs)
+    segment_set = SegmentSet.open_directory(str(tmp_path / "index"))
+    yield segment_set, products
+    segment_set.close()
+
+
+def naive_counts(products, urls, key):
+    tokenizer = get_tokenizer()
+    counts = Counter()
+    for url in urls:
+        value = products[url]["product_features"].get(key)
+        if value is not None:
+            counts.update(set(tokenizer.tokenize(value)))
+    return counts
+
+
+def test_counts_match_naive_count(catalog):
+    segment_set, products = catalog
+    facets = FacetIndex(segment_set)
+    assert sorted(facets.keys()) == sorted(FEATURES)
+    live = dict(segment_set.live_docs())
+    rng = random.Random(1)
+    for size in (len(live), 50, 5):
+        doc_ids = sorted(rng.sample(sorted(live), size))
+        counts = facets.counts(RoaringBitmap.from_sorted(doc_ids), FEATURES, limit=100)
+        for key in FEATURES:
+            expected = naive_counts(products, [live[doc_id] for doc_id in doc_ids], key)
+            assert counts[key] == dict(expected)
+
+
+def test_counts_limit_keeps_most_frequent(catalog):
+    segment_set, products = catalog
+    facets = FacetIndex(segment_set)
+    live = dict(segment_set.live_docs())
+    counts = facets.counts(RoaringBitmap.from_sorted(sorted(live)), ["color"], limit=2)
+    expected = sorted(naive_counts(products, live.values(), "color").items(), key=lambda item: (-item[1], item[0]))
+    assert list(counts["color"].items()) == expected[:2]
+
+
+def test_select_matches_naive_filter(catalog):
+    segment_set, products = catalog
+    facets = FacetIndex(segment_set)
+    tokenizer = get_tokenizer()
+    filters = [("made in", ["Italy", "France"]), ("color", ["dark blue"])]
+
+    def matches(doc):
+        features = doc["product_features"]
+        return all(any(key in features and set(tokenizer.tokenize(value)) <= set(tokenizer.tokenize(features[key]))
+                       for value in values)
+                   for key, values in filters)
+
+    expected = sorted(doc_id for doc_id, url in segment_set.live_docs() if matches(products[url]))
+    assert expected
+    assert list(facets.select(filters)) == expected
+    assert facets.select([]) is None
+    assert not facets.select([("made in", ["Atlantis"])])
+    assert not facets.select([("unknown", ["Italy"])])
@@ -0,0 +1,142 @@
+"""
+Index incrémental (IndexWriter) : générations publiées, fichiers conservés pour
+les lecteurs de la génération précédente, rechargement par `Ranking`.
+"""
+import asyncio
+import os
+import threading
+
+import pytest
+
+import incremental
+
+from incremental import IndexWriter
+from navweb import Ranking
+from segment import SegmentSet, read_manifest
+from server import QueryServer
+
+
+def product(i, title=None):
+    return {"url": f"https://shop.test/product/{i}", "title": title or f"Leather sneakers model {i}",
+            "description": f"Comfortable shoes number {i}.", "product_features": {"made in": "Italy"}}
+
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("seg-"))
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path / "index")
+
+
+def test_update_only_indexes_changes(index_dir):
+    writer = IndexWriter(index_dir)
+    assert writer.update([product(i) for i in range(5)]) == {"added": 5, "updated": 0, "deleted": 0, "unchanged": 0}
+    stats = writer.update([product(i) for i in range(4)] + [product(4, "Canvas boots")], full_snapshot=True)
+    assert stats == {"added": 0, "updated": 1, "deleted": 0, "unchanged": 4}
+    segment_set = SegmentSet.open_directory(index_dir)
+    assert segment_set.live_count == 5
+    segment_set.close()
+
+
+def test_superseded_files_kept_one_generation(index_dir):
+    writer = IndexWriter(index_dir, max_segments=1, merge_factor=2)
+    writer.update([product(i) for i in range(3)])
+    writer.update([product(i) for i in range(3, 6)])
+    first = segment_files(index_dir)
+    # un lecteur ouvre la génération courante, puis une fusion publie la suivante
+    reader = SegmentSet.open_directory(index_dir)
+    merged = writer.maybe_merge()
+    assert merged is not None
+    assert set(first) <= set(segment_files(index_dir))
+    assert sorted(reader.urls()) == sorted(product(i)["url"] for i in range(6))
+    reader.close()
+    # la publication suivante supprime les fichiers de l'avant-dernière génération
+    writer.update([product(6)])
+    assert not set(first) & set(segment_files(index_dir))
+    assert merged in segment_files(index_dir)
+
+
+def test_ranking_reloads_new_generation(index_dir):
+    writer = IndexWriter(index_dir)
+    writer.update([product(i) for i in range(3)])
+    ranking = Ranking(index_path=index_dir)
+    generation = ranking.navweb.segment.generation
+    assert not ranking.reload()
+    writer.update([product(i) for i in range(3, 5)])
+    assert ranking.reload()
+    assert ranking.navweb.segment.generation == read_manifest(index_dir)["generation"] > generation
+    assert ranking.doc_count == 5
+
+
+def test_ambiguous_index_is_reported_as_warning(index_dir, capsys):
+    IndexWriter(index_dir).update([product(0)])
+    open("index.seg", "wb").close()
+    with pytest.warns(UserWarning, match="index.seg"):
+        ranking = Ranking()
+    assert ranking.doc_count == 1
+    assert capsys.readouterr().out == ""
+    ranking.navweb.segment.close()
+
+
+def test_reload_during_request_keeps_its_generation(index_dir):
+    writer = IndexWriter(index_dir)
+    writer.update([product(i) for i in range(3)])
+    ranking = Ranking(index_path=index_dir)
+    with ranking.pinned() as old:
+        writer.update([product(i) for i in range(3, 5)])
+        assert ranking.reload()
+        # la requête en cours lit toujours sa génération, qui reste ouverte
+        assert ranking.doc_count == 3
+        assert ranking.search("sneakers", k=10)["metadata"]["nb_elements_total"] == 3
+        assert old.retired and old.in_flight == 1
+    assert old.segment.parts[0][1].mm.closed
+    assert ranking.doc_count == 5
+    ranking.close()
+    assert ranking.state.segment.parts[0][1].mm.closed
+
+
+def test_server_reloads_under_load(index_dir):
+    writer = IndexWriter(index_dir)
+    writer.update([product(i) for i in range(3)])
+    server = QueryServer(Ranking(index_path=index_dir), reload_interval=0)
+    # une recherche reste en cours pendant toute la publication de la génération suivante
+    with server.ranking.pinned():
+        writer.update([product(i) for i in range(3, 5)])
+        status, body = asyncio.run(server.route("GET", "/search?q=sneakers&k=10"))
+        assert status == 200 and body["metadata"]["nb_elements_total"] == 5
+    server.executor.shutdown()
+    server.ranking.close()
+
+
+def test_duplicate_url_in_batch_last_copy_wins(index_dir):
+    writer = IndexWriter(index_dir)
+    stats = writer.update([product(0, "Canvas boots"), product(1), product(0, "Wool scarf")])
+    assert stats == {"added": 2, "updated": 0, "deleted": 0, "unchanged": 0}
+    segment_set = SegmentSet.open_directory(index_dir)
+    assert segment_set.live_count == 2
+    title = segment_set.field("title")
+    assert len(title.doc_ids("canvas")) == 0 and len(title.doc_ids("wool")) == 1
+    segment_set.close()
+
+
+def test_registry_rebuilt_after_crash_before_manifest(index_dir, monkeypatch):
+    writer = IndexWriter(index_dir)
+    writer.update([product(i) for i in range(3)])
+
+    def crash(directory, manifest):
+        raise OSError("arrêt brutal")
+
+    # le registre de la génération suivante est écrit, pas le manifeste
+    monkeypatch.setattr(incremental, "write_manifest", crash)
+    with pytest.raises(OSError):
+        writer.update([product(0, "Canvas boots"), product(3)])
+    monkeypatch.undo()
+    writer = IndexWriter(index_dir)
+    assert sorted(writer.docs) == sorted(product(i)["url"] for i in range(3))
+    writer.update([product(0, "Canvas boots"), product(3)])
+    segment_set = SegmentSet.open_directory(index_dir)
+    assert sorted(url for _, url in segment_set.live_docs()) == sorted(product(i)["url"] for i in range(4))
+    segment_set.close()
@@ -0,0 +1,75 @@
+"""
+Dictionnaire front-codé : recherche exacte, complétion par préfixe et recherche
+tolérante aux fautes (distance d'édition 1 et 2) comparées à un parcours
+exhaustif avec une distance de Levenshtein naïve.
+"""
+import random
+
+import pytest
+
+from lexicon import Lexicon
+
+
+def levenshtein(a, b):
+    row = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j in range(1, len(b) + 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (char != b[j - 1]))
+    return row[-1]
+
+
+def small_lexicon():
+    rng = random.Random(0)
+    words = {"boot", "boots", "booty", "bot", "shirt", "shirts", "short", "shorts", "skirt", "scarf",
+             "leather", "lether", "weather", "feather", "canvas", "canvases", "wool", "woollen",
+             "a", "ab", "abc", "été", "étés", "café", "cafés", "naïve"}
+    while len(words) < 300:
+        words.add("".join(rng.choices("abcdeost", k=rng.randint(1, 7))))
+    return sorted(words)
+
+
+WORDS = small_lexicon()
+
+
+@pytest.fixture(params=[1, 4, 16])
+def lexicon(request):
+    return Lexicon.from_terms(WORDS, block_size=request.param)
+
+
+def test_membership_and_order(lexicon):
+    assert len(lexicon) == len(WORDS)
+    assert list(lexicon) == WORDS
+    assert all(word in lexicon for word in WORDS)
+    for missing in ["", "boo", "shirtss", "zzz", "été s", "cafe"]:
+        assert missing not in lexicon
+    assert list(lexicon.iter_from("sh")) == [word for word in WORDS if word >= "sh"]
+
+
+@pytest.mark.parametrize("prefix", ["b", "boot", "sh", "short", "ca", "caf", "é", "a", "leather", "zz", "ot", "de"])
+def test_prefix_matches_brute_force(lexicon, prefix):
+    expected = [word for word in WORDS if word.startswith(prefix)]
+    assert lexicon.prefix(prefix) == expected
+    assert lexicon.prefix(prefix, limit=3) == expected[:3]
+
+
+QUERIES = ["boot", "bots", "shirt", "shrt", "skort", "lather", "wether", "canvs", "wol", "cafe", "ete",
+           "naive", "abcd", "dose", "ost", "x", "stoa", "eedd"]
+
+
+@pytest.mark.parametrize("max_edits", [1, 2])
+@pytest.mark.parametrize("prefix_length", [0, 1])
+def test_fuzzy_matches_brute_force(lexicon, max_edits, prefix_length):
+    for query in QUERIES:
+        expected = sorted(((word, levenshtein(query, word)) for word in WORDS
+                           if word.startswith(query[:prefix_length])),
+                          key=lambda match: (match[1], match[0]))
+        expected = [match for match in expected if match[1] <= max_edits]
+        assert lexicon.fuzzy(query, max_edits, prefix_length) == expected, query
+
+
+def test_empty_lexicon():
+    lexicon = Lexicon.from_terms([])
+    assert len(lexicon) == 0 and list(lexicon) == []
+    assert "a" not in lexicon
+    assert lexicon.prefix("a") == [] and lexicon.fuzzy("a", 2) == []
@@ -0,0 +1,60 @@
+"""
+Langage de requête : analyse (`parse_query`) et clauses appliquées par `Ranking`.
+"""
+import pytest
+
+from index import Index
+from navweb import Ranking
+from query import Clause, parse_query
+
+PRODUCTS = [
+    ("Leather sneakers", "White leather sneakers for everyday wear."),
+    ("Suede sneakers", "Soft suede sneakers with rubber soles."),
+    ("Leather boots", "Waterproof leather boots, sneakers style laces."),
+    ("Canvas shoes", "Light canvas shoes for summer."),
+]
+
+
+@pytest.fixture
+def ranking(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    index = Index()
+    index.add_documents({"url": f"https://shop.test/product/{i}", "title": title, "description": description}
+                        for i, (title, description) in enumerate(PRODUCTS))
+    index.save_segment("index.seg")
+    ranking = Ranking(index_path="index.seg")
+    yield ranking
+    ranking.navweb.segment.close()
+
+
+def result_urls(ranking, text, fields):
+    plan = ranking.plan(text, fields=fields, k=10)
+    return sorted(int(url.rsplit("/", 1)[-1]) for url in map(ranking.navweb.segment.url, ranking.candidates(plan)))
+
+
+def test_operators():
+    parsed = parse_query('leather NEAR/2 sneakers +white -"rubber soles"')
+    assert parsed.tokens == ("leather", "sneakers", "white")
+    assert parsed.required == (Clause("near", ("leather", "sneakers"), 2), Clause("term", ("white",), 0))
+    assert parsed.excluded == (Clause("phrase", ("rubber", "soles"), 0),)
+
+
+@pytest.mark.parametrize("text", [
+    "leather NEAR/2",
+    "NEAR/2 sneakers",
+    "+leather NEAR/2 sneakers",
+    "leather NEAR/2 -sneakers",
+    'leather NEAR/2 "white sneakers"',
+    "leather NEAR/2 sneakers NEAR/2 white",
+])
+def test_incomplete_near_is_rejected(text):
+    with pytest.raises(ValueError):
+        parse_query(text)
+
+
+def test_required_and_excluded_terms_are_corrected(ranking):
+    fields = (("description", 1),)
+    assert result_urls(ranking, "+sneakers", fields) == [0, 1, 2]
+    assert result_urls(ranking, "+sneker", fields) == [0, 1, 2]
+    assert result_urls(ranking, "sneakers -suade", fields) == [0, 2]
+    assert result_urls(ranking, '"rubbr soles"', fields) == [1]
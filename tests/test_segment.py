@@ -0,0 +1,21 @@
+"""
+Segment binaire : réécriture sans perturber un lecteur qui a l'ancien fichier en mmap.
+"""
+import os
+
+from segment import Segment, write_segment
+
+
+def test_rewrite_keeps_mapped_segment_readable(tmp_path):
+    path = str(tmp_path / "index.seg")
+    write_segment(path, ["https://shop.test/b", "https://shop.test/a"],
+                  {"title": (True, {"sneakers": {0: [0], 1: [1]}})})
+    reader = Segment(path)
+    write_segment(path, ["https://shop.test/c"], {"title": (True, {"boots": {0: [0]}})})
+    assert list(reader.urls()) == ["https://shop.test/a", "https://shop.test/b"]
+    assert reader.field("title").lookup("sneakers")[0].tolist() == [0, 1]
+    reader.close()
+    rewritten = Segment(path)
+    assert list(rewritten.urls()) == ["https://shop.test/c"]
+    rewritten.close()
+    assert not os.path.exists(path + ".tmp")
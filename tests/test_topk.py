@@ -0,0 +1,60 @@
+"""
+Top-k WAND : curseurs décodés au fil de l'eau (segments multiples, documents
+supprimés) et résultats identiques au score exhaustif.
+"""
+import random
+
+import pytest
+
+from incremental import IndexWriter
+from navweb import Ranking
+from postings import END
+from topk import linear_score_bound
+
+WORDS = ["leather", "sneakers", "canvas", "boots", "wool", "scarf", "cotton", "shirt", "silk", "tie"]
+
+
+def product(i, rng):
+    return {"url": f"https://shop.test/product/{i}",
+            "title": " ".join(rng.choices(WORDS, k=rng.randint(2, 5))),
+            "description": " ".join(rng.choices(WORDS, k=rng.randint(5, 20))) + ".",
+            "product_features": {"made in": rng.choice(["Italy", "France"])},
+            "product_reviews": [{"rating": rng.randint(1, 5), "text": "ok"} for _ in range(rng.randint(0, 3))]}
+
+
+@pytest.fixture
+def ranking(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rng = random.Random(0)
+    writer = IndexWriter(str(tmp_path / "index"))
+    writer.update([product(i, rng) for i in range(60)])
+    writer.update([product(i, rng) for i in range(40, 90)])  # remplace 40..59 : tombstones
+    ranking = Ranking(index_path=str(tmp_path / "index"))
+    yield ranking
+    ranking.navweb.segment.close()
+
+
+def test_cursor_matches_lookup(ranking):
+    field = ranking.navweb.segment.field("title")
+    for term in WORDS:
+        doc_ids, tfs, positions = field.lookup(term)
+        cursor, (max_tf, first_position, (max_score, max_review)) = field.cursor(term)
+        seen = []
+        while cursor.doc != END:
+            seen.append((cursor.doc, cursor.tf, cursor.first_position))
+            cursor.next()
+        assert seen == [(doc_ids[i], tfs[i], positions[i][0]) for i in range(len(doc_ids))]
+        assert max_tf >= max(tfs) and first_position <= min(p[0] for p in positions)
+        reviews = [ranking.review_means[doc_id] for doc_id in doc_ids]
+        assert max_review >= max(reviews)
+        assert max_score >= max(linear_score_bound(tf, p[0], review) for tf, p, review in zip(tfs, positions, reviews))
+
+
+@pytest.mark.parametrize("fields", [[("title", 1)], [("title", 1), ("description", 0.5)]])
+def test_wand_matches_exhaustive(ranking, fields):
+    rng = random.Random(1)
+    for _ in range(30):
+        tokens = rng.sample(WORDS, rng.randint(1, 3))
+        expected = ranking.exhaustive_top_k(tokens, fields, k=5)
+        results = ranking.top_k(tokens, fields, k=5)
+        assert [round(r["score"], 9) for r in results] == [round(r["score"], 9) for r in expected]
@@ -0,0 +1,51 @@
+import json
+import os
+import string
+from functools import lru_cache
+
+
+STOP_WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stop_words_english.json")
+
+
+class Tokenizer:
+    """
+    Tokenizer shared by the indexing (index.py) and query (navweb.py) sides:
+    lowercasing, punctuation removal and stopwords removal. The stopword set and
+    the translation table are built once, when the tokenizer is created.
+    """
+
+    def __init__(self, stopwords_path=STOP_WORDS_PATH):
+        with open(stopwords_path, "r", encoding="utf-8") as f:
+            words = json.load(f)
+        self.stopwords = frozenset(words) | frozenset(string.punctuation)
+        self.table = str.maketrans("", "", string.punctuation)
+
+    def normalize(self, text):
+        """
+        Lowercases the text and strips punctuation.
+        """
+        return text.lower().translate(self.table)
+
+    def tokenize(self, text):
+        """
+        Simple tokenization with stopwords removal.
+        """
+        stopwords = self.stopwords
+        return [token for token in self.normalize(text).split() if token not in stopwords]
+
+    def tokenize_many(self, texts):
+        """
+        Tokenizes an iterable of texts, returns one token list per text.
+        """
+        stopwords = self.stopwords
+        table = self.table
+        return [[token for token in text.lower().translate(table).split() if token not in stopwords]
+                for text in texts]
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(stopwords_path=STOP_WORDS_PATH):
+    """
+    Returns the process-wide tokenizer for a stopwords file (loaded on first call).
+    """
+    return Tokenizer(stopwords_path)
@@ -0,0 +1,168 @@
+import heapq
+from postings import END, gallop
+
+# (position, review, frequency) weights of the linear score of Ranking.top_k;
+# the per-term score bounds stored in segments are computed with them
+LINEAR_WEIGHTS = (0.4, 0.3, 0.3)
+
+
+def linear_score_bound(tf, first_position, review_mean=0.0, weights=LINEAR_WEIGHTS):
+    """
+    Linear score of a document for one term with a field weight of 1: first
+    position and frequency of the term plus the review signal of the document.
+    """
+    alpha, beta, gamma = weights
+    return alpha / (first_position + 1) + gamma * tf + beta * review_mean
+
+
+class TermCursor:
+    """
+    Cursor over the postings of one query term: sorted doc ids with the score
+    contribution of the term in each document, and the maximum contribution
+    (upper bound) used by WAND to skip documents that cannot enter the top k.
+    """
+
+    def __init__(self, doc_ids, scores):
+        self.doc_ids = doc_ids
+        self.scores = scores
+        self.upper_bound = max(scores) if scores else 0.0
+        self.doc_bound = None
+        self.position = 0
+        self.doc = doc_ids[0] if doc_ids else END
+
+    def next(self):
+        self.position += 1
+        self.doc = self.doc_ids[self.position] if self.position < len(self.doc_ids) else END
+
+    def advance(self, target):
+        """
+        Moves to the first posting >= target (galloping, see postings.gallop).
+        """
+        self.position = gallop(self.doc_ids, target, self.position)
+        self.doc = self.doc_ids[self.position] if self.position < len(self.doc_ids) else END
+
+    def score(self):
+        return self.scores[self.position]
+
+
+class LazyTermCursor:
+    """
+    Cursor over the postings of one query term read on demand from a segment
+    (`segment.PostingsCursor`): the upper bound is known before any posting is
+    decoded (per-term bounds stored at index time), postings skipped by WAND are
+    never scored and the contribution of the term is computed only for the
+    documents actually evaluated, by `score(postings)` on the current posting.
+    `doc_bound` (None: unknown) bounds what the per-document signal of a document
+    of the postings adds to the score beyond `upper_bound` (see `wand_top_k`).
+    Only the doc ids of `candidates` (sorted, None: all) are visited.
+    """
+
+    def __init__(self, postings, score, upper_bound, candidates=None, doc_bound=None):
+        self.postings = postings
+        self.score_posting = score
+        self.upper_bound = upper_bound
+        self.doc_bound = doc_bound
+        self.candidates = candidates
+        self.candidate_position = 0
+        self.doc = END
+        self._restrict()
+
+    def _restrict(self):
+        """
+        Moves the postings forward to the next doc id that is also a candidate.
+        """
+        postings, candidates = self.postings, self.candidates
+        if candidates is not None:
+            while postings.doc != END:
+                self.candidate_position = gallop(candidates, postings.doc, self.candidate_position)
+                if self.candidate_position == len(candidates):
+                    self.doc = END
+                    return
+                candidate = candidates[self.candidate_position]
+                if candidate == postings.doc:
+                    break
+                postings.advance(candidate)
+        self.doc = postings.doc
+
+    def next(self):
+        self.postings.next()
+        if self.candidates is None:
+            self.doc = self.postings.doc
+        else:
+            self._restrict()
+
+    def advance(self, target):
+        self.postings.advance(target)
+        self._restrict()
+
+    def score(self):
+        return self.score_posting(self.postings)
+
+
+def wand_top_k(cursors, k, doc_score=None, doc_upper_bound=0.0):
+    """
+    Top k documents by decreasing score with the WAND algorithm. The score of a
+    document is the sum of the contributions of the cursors positioned on it plus
+    `doc_score(doc_id)` (a per-document signal bounded by `doc_upper_bound`).
+    Only documents of the cursors' postings are visited, and a document is fully
+    scored only when the sum of the upper bounds of the terms it may contain can
+    beat the k-th best score so far: first with a bound of the per-document signal
+    to pick the pivot, then with the exact `doc_score` of the pivot document, which
+    is cheap to read. The per-document bound is the largest `doc_bound` of the
+    cursors the document may be on (`doc_upper_bound` for a cursor without one): a
+    cursor's `doc_bound` bounds the score of a document of its postings minus the
+    sum of the upper bounds of the terms it contains.
+    Documents are visited in doc id order, so a document whose score only ties
+    the k-th best loses the tie and is skipped.
+    :return: list of (doc id, score), best first; ties are broken by doc id
+    """
+    cursors = [cursor for cursor in cursors if cursor.doc != END]
+    heap = []  # min-heap of (score, -doc_id): heap[0] is the k-th best
+    if k <= 0:
+        return []
+    while cursors:
+        cursors.sort(key=lambda cursor: cursor.doc)
+        threshold = heap[0][0] if len(heap) == k else None
+        bound = 0.0
+        doc_bound = None
+        pivot = None
+        for i, cursor in enumerate(cursors):
+            bound += cursor.upper_bound
+            cursor_doc_bound = doc_upper_bound if cursor.doc_bound is None else cursor.doc_bound
+            if doc_bound is None or cursor_doc_bound > doc_bound:
+                doc_bound = cursor_doc_bound
+            if threshold is None or bound + doc_bound > threshold:
+                pivot = i
+                break
+        if pivot is None:
+            break
+        pivot_doc = cursors[pivot].doc
+        # every cursor before the pivot can share its document only if already on it
+        while pivot + 1 < len(cursors) and cursors[pivot + 1].doc == pivot_doc:
+            pivot += 1
+        base_score = doc_score(pivot_doc) if doc_score is not None else 0.0
+        if threshold is not None and doc_score is not None:
+            bound = base_score
+            for cursor in cursors[:pivot + 1]:
+                bound += cursor.upper_bound
+            if bound <= threshold:
+                # neither the pivot document nor any before it can enter the top k
+                for cursor in cursors[:pivot + 1]:
+                    cursor.advance(pivot_doc + 1)
+                cursors = [cursor for cursor in cursors if cursor.doc != END]
+                continue
+        if cursors[0].doc == pivot_doc:
+            score = base_score
+            for cursor in cursors[:pivot + 1]:
+                score += cursor.score()
+                cursor.next()
+            entry = (score, -pivot_doc)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+        else:
+            for cursor in cursors[:pivot]:
+                cursor.advance(pivot_doc)
+        cursors = [cursor for cursor in cursors if cursor.doc != END]
+    return [(-neg_doc, score) for score, neg_doc in sorted(heap, reverse=True)]
@@ -0,0 +1,34 @@
+def encode_varint(value, out):
+    """
+    Appends an unsigned integer to a bytearray as a LEB128 varint.
+    """
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(buf, pos):
+    """
+    Decodes a varint from a buffer at pos, returns (value, next position).
+    """
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def skip_varints(buf, pos, count):
+    """
+    Position after `count` varints starting at pos, without decoding them.
+    """
+    while count:
+        if buf[pos] < 0x80:
+            count -= 1
+        pos += 1
+    return pos